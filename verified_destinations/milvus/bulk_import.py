@@ -0,0 +1,133 @@
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Tuple
+import numpy as np
+from pymilvus import BulkInsertState, CollectionSchema, connections, utility
+from dat_core.loggers import logger
+
+if TYPE_CHECKING:
+    from verified_destinations.milvus.loader import MilvusLoader
+
+FAILED_STATES = (BulkInsertState.ImportFailed, BulkInsertState.ImportFailedAndCleaned)
+
+
+class MilvusBulkImporter:
+    """
+    Stages rows as Parquet/NumPy files in the object store Milvus reads
+    from, then imports them with do_bulk_insert once the sync is done.
+
+    Rows are buffered per namespace until min_rows is reached; namespaces
+    that never get there are streamed through the loader's regular insert
+    path instead, since an import job costs more than it saves for them.
+    The Milvus destination holds back the sync's state messages until
+    finish() returns, so that a failed import is retried by the next sync.
+    """
+
+    def __init__(self, loader: "MilvusLoader"):
+        self.loader = loader
+        self.settings = loader.config.connection_specification.bulk_import
+        self._alias = f"dat_milvus_bulk_{id(self)}"
+        self._connected = False
+        self._pending: Dict[str, List[Tuple[Any, int]]] = {}
+        self._writers: Dict[str, Any] = {}
+
+    def add(self, records: Iterable[Tuple[Any, int]], namespace: str) -> None:
+        writer = self._writers.get(namespace)
+        if writer is not None:
+            for (vectors, metadata), _ in records:
+                writer.append_row({"vector": vectors, **metadata})
+            return
+
+        pending = self._pending.setdefault(namespace, [])
+        for (vectors, metadata), row_bytes in records:
+            # float32 keeps buffered vectors far smaller than lists of Python floats
+            pending.append(((np.asarray(vectors, dtype=np.float32), metadata), row_bytes))
+        if len(pending) >= self.settings.min_rows:
+            logger.info(f"Partition {namespace} reached {len(pending)} rows, "
+                        f"staging it for bulk import")
+            writer = self._writers[namespace] = self._create_writer()
+            for (vectors, metadata), _ in self._pending.pop(namespace):
+                writer.append_row({"vector": vectors, **metadata})
+
+    def finish(self) -> None:
+        for namespace, pending in self._pending.items():
+            logger.info(f"Partition {namespace} has {len(pending)} rows, below the bulk "
+                        f"import threshold of {self.settings.min_rows}; streaming them")
+            self.loader._stream_insert(iter(pending), namespace)
+        self._pending.clear()
+
+        task_ids = []
+        for namespace, writer in self._writers.items():
+            writer.commit()
+            for files in writer.batch_files:
+                task_id = utility.do_bulk_insert(
+                    collection_name=self.loader.config.connection_specification.collection_name,
+                    files=files,
+                    partition_name=self.loader._partition_name(namespace),
+                    using=self._connect()
+                )
+                logger.info(f"Started bulk import task {task_id} for partition {namespace}: {files}")
+                task_ids.append(task_id)
+        self._writers.clear()
+        self._wait(task_ids)
+
+    def close(self) -> None:
+        # Dropping the writers removes their local staging directories
+        self._writers.clear()
+        self._pending.clear()
+        if self._connected:
+            connections.disconnect(self._alias)
+            self._connected = False
+
+    def _create_writer(self):
+        try:
+            from pymilvus.bulk_writer import BulkFileType, RemoteBulkWriter
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError(
+                "Milvus bulk import requires the bulk_writer extra: pip install 'pymilvus[bulk_writer]'"
+            ) from e
+
+        schema = CollectionSchema.construct_from_dict(
+            self.loader.client.describe_collection(
+                self.loader.config.connection_specification.collection_name)
+        )
+        return RemoteBulkWriter(
+            schema=schema,
+            remote_path=self.settings.remote_path,
+            connect_param=RemoteBulkWriter.S3ConnectParam(
+                endpoint=self.settings.endpoint,
+                access_key=self.settings.access_key,
+                secret_key=self.settings.secret_key,
+                bucket_name=self.settings.bucket_name,
+                secure=self.settings.secure,
+            ),
+            file_type=BulkFileType.NUMPY if self.settings.file_type == "numpy" else BulkFileType.PARQUET,
+        )
+
+    def _connect(self) -> str:
+        # do_bulk_insert is only exposed through the ORM connection registry
+        if not self._connected:
+            connections.connect(alias=self._alias, **self.loader._connection_params())
+            self._connected = True
+        return self._alias
+
+    def _wait(self, task_ids: List[int]) -> None:
+        start = time.monotonic()
+        pending = set(task_ids)
+        while pending:
+            for task_id in sorted(pending):
+                state = utility.get_bulk_insert_state(task_id, using=self._alias)
+                if state.state in FAILED_STATES:
+                    raise RuntimeError(f"Bulk import task {task_id} failed: {state.failed_reason}")
+                if state.state == BulkInsertState.ImportCompleted:
+                    pending.discard(task_id)
+                    self.loader.stats["bulk_imported_rows"] += state.row_count
+                    logger.info(f"Bulk import task {task_id} imported {state.row_count} rows "
+                                f"after {time.monotonic() - start:.0f}s")
+                else:
+                    logger.debug(f"Bulk import task {task_id} is {state.state_name} "
+                                 f"({state.infos.get(BulkInsertState.IMPORT_PROGRESS, 0)}%)")
+            if pending:
+                if time.monotonic() - start > self.settings.timeout:
+                    raise TimeoutError(f"Bulk import tasks {sorted(pending)} did not complete "
+                                       f"within {self.settings.timeout}s")
+                time.sleep(self.settings.poll_interval)
@@ -32,4 +32,15 @@ class Milvus(DestinationBase):
     ) -> Iterable[DatMessage]:
         self._init_loader(config)
         processor = DataProcessor(config, self.loader, BATCH_SIZE)
-        yield from processor.processor(configured_catalog, input_messages)
+        try:
+            if self.loader.config.connection_specification.bulk_import is None:
+                yield from processor.processor(configured_catalog, input_messages)
+                self.loader.finish_sync()
+            else:
+                # Bulk-imported rows only reach Milvus in finish_sync(), so the state
+                # messages checkpointing them are held back until the imports succeeded
+                output_messages = list(processor.processor(configured_catalog, input_messages))
+                self.loader.finish_sync()
+                yield from output_messages
+        finally:
+            self.loader.close()
@@ -1,46 +1,239 @@
-from pymilvus import MilvusClient
-from typing import Any, List, Optional, Tuple, Dict
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from pymilvus import CollectionSchema, DataType, MilvusClient
+from pymilvus.milvus_client import IndexParams
+from pymilvus.exceptions import MilvusException
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Dict
 from dat_core.pydantic_models import DatCatalog, StreamMetadata
 from dat_core.pydantic_models.dat_message import DatDocumentMessage
 from dat_core.connectors.destinations.loader import Loader
-from dat_core.connectors.destinations.utils import create_chunks
 from dat_core.pydantic_models import WriteSyncMode
 from dat_core.loggers import logger
+from verified_destinations.milvus.bulk_import import MilvusBulkImporter
+from verified_destinations.record_ids import ChunkIdGenerator
 
-MILVUS_BATCH_SIZE = 100
+# dat_* fields declared as typed columns in the explicit schema mode, with
+# the scalar index used for the REPLACE filters built on them
+SCALAR_INDEXES = {
+    "dat_stream": "INVERTED",
+    "dat_run_id": "INVERTED",
+    "dat_record_id": "Trie",
+}
+
+SCALAR_FIELD_MAX_LENGTH = 65535
+
+# Partition-key field holding the namespace in the partition_key namespace mode
+NAMESPACE_FIELD = "dat_namespace"
 
 
 class MilvusLoader(Loader):
     def __init__(self, config: Any):
         super().__init__(config)
+        self._client = None
+        # Collections and (collection, partition) pairs known to exist server-side
+        self._known_collections = set()
+        self._known_partitions = set()
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._executor = None
+        self._bulk_importer = None
+        self.ids = ChunkIdGenerator(config.connection_specification.id_strategy)
+        # REPLACE streams whose stale rows are deleted after the sync, keyed by stream name
+        self._deferred_replace: Dict[str, Optional[str]] = {}
+
+    @property
+    def client(self) -> MilvusClient:
+        if self._client is None:
+            self._client = self._create_client()
+            self.stats["clients_created"] += 1
+            logger.debug(f"client: {self._client}")
+        return self._client
 
     def load(self, document_chunks: List[DatDocumentMessage], namespace: str, stream: str) -> None:
         self._create_or_use_collection()
-        chunks = create_chunks(document_chunks, batch_size=MILVUS_BATCH_SIZE)
-        data = []
-        for chunk in chunks:
-            for document_chunk in chunk:
-                metadata = document_chunk.data.metadata.model_dump()
-                # metadata = self._normalize_metadata(metadata)
-                vectors = document_chunk.data.vectors
-                data.append({"vector": vectors, **metadata})
-        # if not self.client.has_partition(collection_name=self.config.connection_specification.collection_name,
-        #                                  partition_name=namespace):
-        self.client.create_partition(collection_name=self.config.connection_specification.collection_name,
-                                        partition_name=namespace)
-        self.client.insert(collection_name=self.config.connection_specification.collection_name,
-                           data=data,
-                           partition_name=namespace
-                           )
-
-    def delete(self, filter, namespace=None):
-        client = self._create_client()
-        res = client.delete(
+        if not self._uses_partition_key:
+            self._create_or_use_partition(namespace)
+        records = (self._to_record(document_chunk, namespace) for document_chunk in document_chunks)
+        if self.ids.deterministic:
+            records = self._unique_ids(records)
+        if self.bulk_importer is not None:
+            self.bulk_importer.add(records, namespace)
+            return
+        self._stream_insert(records, namespace)
+
+    def _stream_insert(self, records: Iterable[Tuple[Any, int]], namespace: str) -> None:
+        max_in_flight = self.config.connection_specification.insert_concurrency
+        in_flight = set()
+        try:
+            for sub_batch, sub_batch_bytes in self._sub_batches(records):
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(self.executor.submit(
+                    self._insert_sub_batch, sub_batch, sub_batch_bytes, namespace))
+            for future in as_completed(in_flight):
+                future.result()
+        except Exception:
+            for future in in_flight:
+                future.cancel()
+            # The collection/partition may have been dropped behind our back
+            self.invalidate_cache()
+            raise
+
+    def _to_record(self, document_chunk: DatDocumentMessage,
+                   namespace: str) -> Tuple[Tuple[List[float], Dict[str, Any]], int]:
+        metadata = document_chunk.data.metadata.model_dump()
+        if self.ids.deterministic:
+            metadata["id"] = self.ids.next_int64(metadata, namespace)
+        if self._uses_partition_key:
+            metadata[NAMESPACE_FIELD] = namespace
+        if self.config.connection_specification.schema_mode == "explicit":
+            # Declared VARCHAR fields are not nullable
+            for field_name in SCALAR_INDEXES:
+                if metadata.get(field_name) is None:
+                    metadata[field_name] = ""
+        vectors = document_chunk.data.vectors
+        return (vectors, metadata), self._estimate_row_bytes(vectors, metadata)
+
+    @staticmethod
+    def _unique_ids(records: Iterable[Tuple[Any, int]]) -> Iterator[Tuple[Any, int]]:
+        # Identical chunks of a record share an id, which one upsert must not repeat
+        seen = set()
+        for record in records:
+            (_, metadata), _ = record
+            if metadata["id"] not in seen:
+                seen.add(metadata["id"])
+                yield record
+
+    @staticmethod
+    def _estimate_row_bytes(vectors: List[float], metadata: Dict[str, Any]) -> int:
+        # float32 on the wire, strings as their UTF-8 length, everything else as 8 bytes
+        size = 4 * len(vectors)
+        for key, value in metadata.items():
+            size += len(key)
+            if isinstance(value, str):
+                size += len(value.encode("utf-8"))
+            else:
+                size += 8
+        return size
+
+    def _sub_batches(self, rows: Iterable[Tuple[Any, int]]) -> Iterator[Tuple[List[Any], int]]:
+        """
+        Group rows into sub-batches bounded both by row count and by the
+        estimated payload size, so that no single insert exceeds the
+        server's gRPC message cap.
+        """
+        max_rows = self.config.connection_specification.insert_batch_size
+        max_bytes = self.config.connection_specification.insert_batch_bytes
+        batch, batch_bytes = [], 0
+        for row, row_bytes in rows:
+            if batch and (len(batch) >= max_rows or batch_bytes + row_bytes > max_bytes):
+                yield batch, batch_bytes
+                batch, batch_bytes = [], 0
+            batch.append(row)
+            batch_bytes += row_bytes
+        if batch:
+            yield batch, batch_bytes
+
+    @staticmethod
+    def _assemble_rows(records: List[Tuple[List[float], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return [{"vector": vectors, **metadata} for vectors, metadata in records]
+
+    def _insert_sub_batch(self, records: List[Tuple[List[float], Dict[str, Any]]],
+                          data_bytes: int, namespace: str) -> None:
+        start = time.perf_counter()
+        data = self._assemble_rows(records)
+        # Deterministic ids overwrite the rows of a re-sent batch instead of duplicating them
+        write = self.client.upsert if self.ids.deterministic else self.client.insert
+        write(collection_name=self.config.connection_specification.collection_name,
+              data=data,
+              partition_name=self._partition_name(namespace)
+              )
+        latency = time.perf_counter() - start
+        logger.debug(f"Inserted {len(data)} rows (~{data_bytes} bytes) into "
+                     f"namespace {namespace} in {latency * 1000:.1f}ms")
+        with self._stats_lock:
+            self.stats["insert_batches"] += 1
+            self.stats["insert_rows"] += len(data)
+            self.stats["insert_bytes"] += data_bytes
+            self.stats["insert_seconds"] += latency
+
+    @property
+    def bulk_importer(self) -> Optional[MilvusBulkImporter]:
+        if self._bulk_importer is None and self.config.connection_specification.bulk_import is not None:
+            self._bulk_importer = MilvusBulkImporter(self)
+        return self._bulk_importer
+
+    def finish_sync(self) -> None:
+        """
+        Called once every message of the sync has been handed to load().
+        Runs the staged bulk imports, if any, and waits for them, then
+        deletes the rows of deferred REPLACE streams this sync did not write.
+        """
+        if self._bulk_importer is not None:
+            self._bulk_importer.finish()
+        for stream_name, namespace in self._deferred_replace.items():
+            _filter = self.prepare_metadata_filter(self.ids.stale_filter(stream_name))
+            logger.info(f"Deleting rows of stream {stream_name} not written by this sync "
+                        f"with filter: {_filter}")
+            self.delete(filter=_filter, namespace=namespace)
+        self._deferred_replace.clear()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config.connection_specification.insert_concurrency,
+                thread_name_prefix="milvus-insert",
+            )
+        return self._executor
+
+    def delete(self, filter, namespace=None) -> int:
+        if (namespace is not None and not self._uses_partition_key
+                and not self._partition_exists(namespace)):
+            logger.info(f"Partition {namespace} does not exist, nothing to delete")
+            return 0
+        start = time.perf_counter()
+        deleted = None
+        if self.config.connection_specification.delete_strategy == "expression":
+            try:
+                deleted = self._delete_by_expression(filter, namespace)
+            except MilvusException as e:
+                logger.warning(f"Delete by expression failed, falling back to paginated delete: {e}")
+        if deleted is None:
+            deleted = self._delete_by_ids(filter, namespace)
+        elapsed = time.perf_counter() - start
+        self.stats["deleted_entities"] += deleted
+        logger.info(f"Deleted {deleted} entities matching {filter} in {elapsed:.1f}s "
+                    f"({deleted / elapsed if elapsed else 0:.0f} entities/s)")
+        return deleted
+
+    def _delete_by_expression(self, filter: str, namespace: Optional[str]) -> int:
+        res = self.client.delete(
             collection_name=self.config.connection_specification.collection_name,
-            filter=filter,
-            partition_names=[namespace]
+            filter=self._namespace_filter(filter, namespace),
+            partition_name=self._partition_name(namespace)
         )
-        logger.info(f"Deleted {res['delete_count']} entities")
+        # Servers older than 2.3.2 answer with the deleted primary keys instead
+        return len(res) if isinstance(res, list) else res.get("delete_count", 0)
+
+    def _delete_by_ids(self, filter: str, namespace: Optional[str]) -> int:
+        deleted = 0
+        start = time.perf_counter()
+        for ids in self._get_object_ids(filter, namespace):
+            self.client.delete(
+                collection_name=self.config.connection_specification.collection_name,
+                ids=ids,
+                partition_name=self._partition_name(namespace)
+            )
+            deleted += len(ids)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Deleted {deleted} entities so far "
+                         f"({deleted / elapsed if elapsed else 0:.0f} entities/s)")
+        return deleted
 
 
     def check(self) -> Tuple[bool, Optional[str]]:
@@ -53,7 +246,12 @@ class MilvusLoader(Loader):
             if not collection_info.get("enable_dynamic_field", False):
                 return False, "Dynamic fields are not enabled."
 
-            if not collection_info.get("auto_id", False):
+            if self.ids.deterministic:
+                if collection_info.get("auto_id", False):
+                    return False, "Auto ID is enabled, but the deterministic id strategy sets primary keys."
+                if self.config.connection_specification.bulk_import is not None:
+                    return False, "Bulk import cannot be combined with the deterministic id strategy."
+            elif not collection_info.get("auto_id", False):
                 return False, "Auto ID is not enabled."
 
             # Check if the required fields exist and have the correct properties
@@ -75,6 +273,23 @@ class MilvusLoader(Loader):
             if vector_field.get("params", {}).get("dim", None) != self.config.connection_specification.embedding_dimensions:
                 return False, "Dimension of the embeddings does not match"
 
+            if self.config.connection_specification.schema_mode == "explicit":
+                field_names = {field["name"] for field in collection_info.get("fields", [])}
+                missing = [name for name in SCALAR_INDEXES if name not in field_names]
+                if missing:
+                    return (False,
+                            f"Scalar fields {missing} are missing; the collection was not "
+                            f"created with the explicit schema mode")
+
+            namespace_field = next((field for field in collection_info.get("fields", [])
+                                    if field["name"] == NAMESPACE_FIELD), None)
+            has_partition_key = bool(namespace_field and namespace_field.get("is_partition_key"))
+            if has_partition_key != self._uses_partition_key:
+                return (False,
+                        f"Namespace mode {self.config.connection_specification.namespace_mode} "
+                        f"does not match the collection, which was created "
+                        f"{'with' if has_partition_key else 'without'} a {NAMESPACE_FIELD} partition key")
+
             return True, None
         except Exception as e:
             logger.error(f"Error while checking connection: {e}")
@@ -95,18 +310,39 @@ class MilvusLoader(Loader):
 
         return filter_statement
 
-    def _get_object_ids(self, client, filter: str, namespace: str) -> List[str]:
-        response = client.query(
+    def _get_object_ids(self, filter: str, namespace: Optional[str]) -> Iterator[List[int]]:
+        """
+        Page through the primary keys matching filter, delete_batch_size at
+        a time. The iterator advances on the primary key, so ids may be
+        deleted while iterating.
+        """
+        iterator = self.client.query_iterator(
             collection_name=self.config.connection_specification.collection_name,
-            filter=filter,
-            partition_names=[namespace]
+            batch_size=self.config.connection_specification.delete_batch_size,
+            filter=self._namespace_filter(filter, namespace),
+            output_fields=["id"],
+            partition_names=[namespace] if self._partition_name(namespace) is not None else None
         )
-        return [item["id"] for item in response]
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    return
+                yield [item["id"] for item in batch]
+        finally:
+            iterator.close()
 
     def initiate_sync(self, configured_catalog: DatCatalog) -> None:
         self._create_or_use_collection()
         for stream in configured_catalog.document_streams:
             if stream.write_sync_mode == WriteSyncMode.REPLACE:
+                if self.ids.deterministic:
+                    # Re-sent chunks overwrite themselves, so only the rows this
+                    # sync does not write need deleting, once it is done
+                    logger.info(f"Upsert mode set to 'REPLACE' for stream {stream.name}. "
+                                f"Deferring the delete of stale rows to the end of the sync")
+                    self._deferred_replace[stream.name] = stream.namespace
+                    continue
                 _filter = self.prepare_metadata_filter(
                     {self.METADATA_DAT_STREAM_FIELD: stream.name})
                 logger.info(f"Upsert mode set to 'REPLACE' for stream {stream.name}. "
@@ -114,31 +350,135 @@ class MilvusLoader(Loader):
                 self.delete(filter=_filter, namespace=stream.namespace)
 
     def _create_client(self):
+        return MilvusClient(**self._connection_params())
+
+    def _connection_params(self) -> Dict[str, str]:
         if self.config.connection_specification.authentication.authentication == "basic_authentication":
-            return MilvusClient(
+            return dict(
                 uri=self.config.connection_specification.uri,
-                username=self.config.connection_specification.authentication.username,
+                user=self.config.connection_specification.authentication.username,
                 password=self.config.connection_specification.authentication.password
             )
         elif self.config.connection_specification.authentication.authentication == "token_authentication":
-            return MilvusClient(
+            return dict(
                 uri=self.config.connection_specification.uri,
                 token=self.config.connection_specification.authentication.token
             )
         else:
-            return MilvusClient(
+            return dict(
                 uri=self.config.connection_specification.uri
             )
 
 
     def _create_or_use_collection(self, ):
         collection_name = self.config.connection_specification.collection_name
-        self.client = self._create_client()
-        logger.debug(f"client: {self.client}")
+        if collection_name in self._known_collections:
+            self.stats["collection_cache_hits"] += 1
+            self.stats["round_trips_saved"] += 1
+            return
+        self.stats["collection_cache_misses"] += 1
 
         if not self.client.has_collection(collection_name=collection_name):
+            kwargs = {}
+            if self._uses_partition_key:
+                kwargs["num_partitions"] = self.config.connection_specification.num_partitions
             self.client.create_collection(
                 collection_name,
-                dimension=self.config.connection_specification.embedding_dimensions,
-                auto_id=True
+                schema=self._collection_schema(),
+                index_params=self._index_params(),
+                **kwargs
             )
+        self._known_collections.add(collection_name)
+
+    def _collection_schema(self) -> CollectionSchema:
+        schema = MilvusClient.create_schema(auto_id=not self.ids.deterministic, enable_dynamic_field=True)
+        schema.add_field("id", DataType.INT64, is_primary=True)
+        schema.add_field("vector", DataType.FLOAT_VECTOR,
+                         dim=self.config.connection_specification.embedding_dimensions)
+        if self.config.connection_specification.schema_mode == "explicit":
+            for field_name in SCALAR_INDEXES:
+                schema.add_field(field_name, DataType.VARCHAR, max_length=SCALAR_FIELD_MAX_LENGTH)
+        if self._uses_partition_key:
+            schema.add_field(NAMESPACE_FIELD, DataType.VARCHAR,
+                             max_length=SCALAR_FIELD_MAX_LENGTH, is_partition_key=True)
+        return schema
+
+    def _index_params(self) -> IndexParams:
+        index_params = MilvusClient.prepare_index_params()
+        index_params.add_index(
+            "vector",
+            index_type=self.config.connection_specification.index_type,
+            metric_type=self.config.connection_specification.metric_type,
+            params=self.config.connection_specification.index_params
+        )
+        if self.config.connection_specification.schema_mode == "explicit":
+            for field_name, index_type in SCALAR_INDEXES.items():
+                index_params.add_index(field_name, index_type=index_type)
+        return index_params
+
+    @property
+    def _uses_partition_key(self) -> bool:
+        return self.config.connection_specification.namespace_mode == "partition_key"
+
+    def _partition_name(self, namespace: Optional[str]) -> Optional[str]:
+        # Milvus rejects explicit partition names on partition-key collections
+        return None if self._uses_partition_key else namespace
+
+    def _namespace_filter(self, filter: str, namespace: Optional[str]) -> str:
+        """
+        Scope filter to namespace. In the partition mode the partition name
+        already does that; in the partition_key mode the namespace condition
+        also lets Milvus prune the search to the partition it hashes to.
+        """
+        if namespace is None or not self._uses_partition_key:
+            return filter
+        condition = f"({NAMESPACE_FIELD} == {repr(namespace)})"
+        return f"{condition} and ({filter})" if filter else condition
+
+    def _create_or_use_partition(self, namespace: str) -> None:
+        if self._partition_exists(namespace):
+            return
+        collection_name = self.config.connection_specification.collection_name
+        self.client.create_partition(collection_name=collection_name,
+                                     partition_name=namespace)
+        self._known_partitions.add((collection_name, namespace))
+
+    def _partition_exists(self, namespace: str) -> bool:
+        collection_name = self.config.connection_specification.collection_name
+        if (collection_name, namespace) in self._known_partitions:
+            self.stats["partition_cache_hits"] += 1
+            self.stats["round_trips_saved"] += 1
+            return True
+        self.stats["partition_cache_misses"] += 1
+        if self.client.has_partition(collection_name=collection_name, partition_name=namespace):
+            self._known_partitions.add((collection_name, namespace))
+            return True
+        return False
+
+    def invalidate_cache(self, collection_name: Optional[str] = None) -> None:
+        """
+        Forget cached collection/partition state so that the next call
+        goes back to the server. Drops everything when no collection_name
+        is given.
+        """
+        if collection_name is None:
+            self._known_collections.clear()
+            self._known_partitions.clear()
+            return
+        self._known_collections.discard(collection_name)
+        self._known_partitions = {
+            (c, p) for c, p in self._known_partitions if c != collection_name
+        }
+
+    def close(self) -> None:
+        if self._bulk_importer is not None:
+            self._bulk_importer.close()
+            self._bulk_importer = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        self.invalidate_cache()
+        logger.debug(f"Milvus loader stats: {dict(self.stats)}")
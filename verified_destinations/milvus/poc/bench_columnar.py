@@ -0,0 +1,111 @@
+"""
+Microbenchmark for MilvusLoader insert assembly: one dict per row vs the
+columnar layout (float32 matrix + metadata columns). Each mode builds the
+sub-batches and runs pymilvus' client-side serialization of the insert
+request, so no Milvus server is needed. Every mode runs in its own process
+so that peak RSS is comparable.
+
+MilvusClient has no column-based insert, and pymilvus' ORM one cannot
+carry dynamic fields, so the columns are handed over as rows whose vectors
+are views into the matrix. Protobuf's per-float encoding dominates either
+way: on pymilvus 2.4.15 with 1536 dims, rows reached ~2750 rows/s and
+columnar ~1800 rows/s, with the same peak RSS. MilvusLoader therefore
+only assembles rows.
+
+    python -m verified_destinations.milvus.poc.bench_columnar --rows 20000 --dim 1536
+"""
+import argparse
+import multiprocessing
+import random
+import resource
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from pymilvus import DataType
+from pymilvus.client.prepare import Prepare
+from verified_destinations.milvus.loader import MilvusLoader
+
+MODES = ("rows", "columnar")
+
+
+def _fields_info(dim: int):
+    return [
+        {"name": "id", "type": DataType.INT64, "is_primary": True, "auto_id": True},
+        {"name": "vector", "type": DataType.FLOAT_VECTOR, "params": {"dim": dim}},
+    ]
+
+
+def _assemble_columns(records: List[Tuple[List[float], Dict[str, Any]]]) -> Tuple[np.ndarray, Dict[str, List[Any]]]:
+    # One contiguous float32 matrix for the vectors and one list per metadata field
+    num_rows = len(records)
+    matrix = np.empty((num_rows, len(records[0][0])), dtype=np.float32)
+    columns: Dict[str, List[Any]] = {}
+    for i, (vectors, metadata) in enumerate(records):
+        matrix[i] = vectors
+        for key, value in metadata.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * num_rows
+            column[i] = value
+    return matrix, columns
+
+
+def _columns_to_rows(matrix: np.ndarray, columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"vector": vector, **{name: column[i] for name, column in columns.items()}}
+        for i, vector in enumerate(matrix)
+    ]
+
+
+def _records(num_rows: int, dim: int):
+    rng = random.Random(42)
+    return [
+        ([rng.random() for _ in range(dim)], {
+            "dat_source": "GoogleDrive",
+            "dat_document_chunk": f"chunk {i} " * 20,
+            "dat_stream": "PDF",
+            "dat_document_entity": f"/Apple/{i // 10}.pdf",
+            "dat_record_id": f"/Apple/{i // 10}.pdf",
+            "dat_run_id": "7c3f04fafccc4d6090e5c2ec94bd6c826",
+        })
+        for i in range(num_rows)
+    ]
+
+
+def _run(mode: str, num_rows: int, dim: int, batch_size: int, results) -> None:
+    records = _records(num_rows, dim)
+    fields_info = _fields_info(dim)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for offset in range(0, num_rows, batch_size):
+        batch = records[offset:offset + batch_size]
+        if mode == "columnar":
+            data = _columns_to_rows(*_assemble_columns(batch))
+        else:
+            data = MilvusLoader._assemble_rows(batch)
+        Prepare.row_insert_param("bench", data, "", fields_info, enable_dynamic=True)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((mode, num_rows / elapsed, peak_kb, peak_kb - baseline_kb))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    print(f"{'mode':<10}{'rows/sec':>12}{'peak RSS MB':>14}{'RSS growth MB':>16}")
+    for mode in MODES:
+        proc = ctx.Process(target=_run, args=(mode, args.rows, args.dim, args.batch_size, results))
+        proc.start()
+        mode, rows_per_sec, peak_kb, growth_kb = results.get()
+        proc.join()
+        print(f"{mode:<10}{rows_per_sec:>12.0f}{peak_kb / 1024:>14.1f}{growth_kb / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark for MilvusLoader namespace modes: one partition per namespace vs a
+dat_namespace partition-key field. For every namespace count a fresh
+collection is loaded with --rows rows spread evenly over the namespaces,
+then a REPLACE-style filtered delete is timed on a sample of namespaces.
+Needs a running Milvus; the partition mode is expected to fail once the
+namespace count exceeds the server's partition cap (1024 by default).
+
+    python -m verified_destinations.milvus.poc.bench_namespaces --uri http://localhost:19530
+"""
+import argparse
+import random
+import statistics
+import time
+from pymilvus.exceptions import MilvusException
+from verified_destinations.milvus.loader import MilvusLoader, NAMESPACE_FIELD
+from verified_destinations.milvus.specs import MilvusSpecification
+
+MODES = ("partition", "partition_key")
+
+
+def _loader(uri: str, collection_name: str, mode: str, dim: int) -> MilvusLoader:
+    return MilvusLoader(MilvusSpecification(
+        name='Milvus',
+        connection_specification={
+            "uri": uri,
+            "collection_name": collection_name,
+            "authentication": {"authentication": "no_authentication"},
+            "embedding_dimensions": dim,
+            "namespace_mode": mode,
+        },
+        module_name='milvus',
+    ))
+
+
+def _records(loader: MilvusLoader, namespace: str, num_rows: int, dim: int, rng: random.Random):
+    for i in range(num_rows):
+        metadata = {
+            "dat_source": "GoogleDrive",
+            "dat_document_chunk": f"chunk {i} " * 20,
+            "dat_stream": "PDF",
+            "dat_document_entity": f"/{namespace}/{i // 10}.pdf",
+            "dat_record_id": f"/{namespace}/{i // 10}.pdf",
+            "dat_run_id": "7c3f04fafccc4d6090e5c2ec94bd6c826",
+        }
+        if loader._uses_partition_key:
+            metadata[NAMESPACE_FIELD] = namespace
+        vectors = [rng.random() for _ in range(dim)]
+        yield (vectors, metadata), loader._estimate_row_bytes(vectors, metadata)
+
+
+def _percentile(samples, pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def _run(args, mode: str, num_namespaces: int) -> str:
+    collection_name = f"bench_ns_{mode}_{num_namespaces}"
+    loader = _loader(args.uri, collection_name, mode, args.dim)
+    if loader.client.has_collection(collection_name):
+        loader.client.drop_collection(collection_name)
+    rng = random.Random(42)
+    namespaces = [f"ns_{i}" for i in range(num_namespaces)]
+    rows_per_namespace = max(1, args.rows // num_namespaces)
+    try:
+        loader._create_or_use_collection()
+        insert_latencies = []
+        start = time.perf_counter()
+        for namespace in namespaces:
+            ns_start = time.perf_counter()
+            if not loader._uses_partition_key:
+                loader._create_or_use_partition(namespace)
+            loader._stream_insert(_records(loader, namespace, rows_per_namespace, args.dim, rng), namespace)
+            insert_latencies.append(time.perf_counter() - ns_start)
+        insert_elapsed = time.perf_counter() - start
+        loader.client.flush(collection_name)
+
+        delete_latencies = []
+        for namespace in rng.sample(namespaces, min(args.delete_samples, num_namespaces)):
+            del_start = time.perf_counter()
+            loader.delete(filter="(dat_stream == 'PDF')", namespace=namespace)
+            delete_latencies.append(time.perf_counter() - del_start)
+    except MilvusException as e:
+        return f"{mode:<15}{num_namespaces:>12}  failed: {e.message}"
+    finally:
+        if not args.keep:
+            loader.client.drop_collection(collection_name)
+        loader.close()
+
+    total_rows = rows_per_namespace * num_namespaces
+    return (f"{mode:<15}{num_namespaces:>12}{total_rows / insert_elapsed:>12.0f}"
+            f"{statistics.median(insert_latencies) * 1000:>14.1f}"
+            f"{statistics.median(delete_latencies) * 1000:>14.1f}"
+            f"{_percentile(delete_latencies, 0.95) * 1000:>14.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uri", default="http://localhost:19530")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--namespaces", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--delete-samples", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    args = parser.parse_args()
+
+    print(f"{'mode':<15}{'namespaces':>12}{'rows/sec':>12}{'insert p50 ms':>14}"
+          f"{'delete p50 ms':>14}{'delete p95 ms':>14}")
+    for num_namespaces in args.namespaces:
+        for mode in MODES:
+            print(_run(args, mode, num_namespaces), flush=True)
+
+
+if __name__ == "__main__":
+    main()
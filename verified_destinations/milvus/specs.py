@@ -4,7 +4,7 @@
 
 from __future__ import annotations
 
-from typing import Optional, Union, Literal
+from typing import Any, Dict, Optional, Union, Literal
 
 from pydantic import BaseModel, Field
 from dat_core.pydantic_models import ConnectionSpecification
@@ -53,6 +53,47 @@ class APITokenAuthentication(BaseModel):
         ..., description='API Token for the Milvus Database', title='API Token'
     )
 
+class MilvusBulkImport(BaseModel):
+    endpoint: str = Field(
+        ..., description='Endpoint of the S3/MinIO storage Milvus imports from, e.g. localhost:9000',
+        title='Storage Endpoint'
+    )
+    access_key: str = Field(
+        ..., description='Access key of the S3/MinIO storage', title='Access Key'
+    )
+    secret_key: str = Field(
+        ..., description='Secret key of the S3/MinIO storage', title='Secret Key',
+        json_schema_extra={
+            'ui-opts': {
+                'masked': True,
+            }
+        }
+    )
+    bucket_name: str = Field(
+        'a-bucket', description='Bucket configured as Milvus\' object storage', title='Bucket Name'
+    )
+    remote_path: str = Field(
+        'dat_bulk_import', description='Path inside the bucket where files are staged',
+        title='Remote Path'
+    )
+    secure: bool = Field(
+        False, description='Use TLS to talk to the storage', title='Secure'
+    )
+    file_type: Literal['parquet', 'numpy'] = Field(
+        'parquet', description='Format of the staged files', title='File Type'
+    )
+    min_rows: int = Field(
+        10000, description='Namespaces with fewer rows in a sync are inserted directly instead',
+        title='Minimum Rows', gt=0
+    )
+    poll_interval: float = Field(
+        5, description='Seconds between import progress checks', title='Poll Interval', gt=0
+    )
+    timeout: int = Field(
+        3600, description='Seconds to wait for the import to complete', title='Timeout', gt=0
+    )
+
+
 class MilvusConnection(ConnectionSpecification):
     uri: str = Field(...,
                      description='URI to connect to the Database', title='URI')
@@ -75,6 +116,78 @@ class MilvusConnection(ConnectionSpecification):
                   }
               }
     )
+    insert_batch_size: int = Field(
+        100, description='Maximum number of rows sent in a single insert request',
+        title='Insert Batch Size', gt=0
+    )
+    insert_batch_bytes: int = Field(
+        16 * 1024 * 1024,  # well below the server's default 64MB gRPC message cap
+        description='Maximum estimated payload size (bytes) of a single insert request',
+        title='Insert Batch Bytes', gt=0
+    )
+    insert_concurrency: int = Field(
+        4, description='Maximum number of insert requests in flight at once',
+        title='Insert Concurrency', gt=0
+    )
+    delete_strategy: Literal['expression', 'iterator'] = Field(
+        'expression',
+        description=('How REPLACE deletes are executed: server-side by filter expression '
+                     '(falling back to paging when the server rejects it), or always by '
+                     'paging through matching primary keys'),
+        title='Delete Strategy'
+    )
+    delete_batch_size: int = Field(
+        1000, description='Number of primary keys fetched and deleted per page when paging',
+        title='Delete Batch Size', gt=0, le=16384
+    )
+    schema_mode: Literal['dynamic', 'explicit'] = Field(
+        'dynamic',
+        description=('dynamic keeps every metadata field in the dynamic JSON field; explicit '
+                     'declares dat_stream, dat_run_id and dat_record_id as indexed VARCHAR '
+                     'fields so that REPLACE deletes can use scalar indexes. Only applied '
+                     'when the collection is created'),
+        title='Schema Mode'
+    )
+    namespace_mode: Literal['partition', 'partition_key'] = Field(
+        'partition',
+        description=('partition creates one Milvus partition per namespace, up to the server\'s '
+                     'partition cap (1024 by default); partition_key stores the namespace in a '
+                     'dat_namespace partition-key field, which has no such cap. Only applied when '
+                     'the collection is created'),
+        title='Namespace Mode'
+    )
+    num_partitions: int = Field(
+        16, description='Number of physical partitions the partition_key namespace mode hashes into',
+        title='Number of Partitions', gt=0, le=1024
+    )
+    index_type: Literal['AUTOINDEX', 'HNSW', 'IVF_FLAT', 'DISKANN'] = Field(
+        'AUTOINDEX', description='Index type of the vector field, applied when the collection is created',
+        title='Vector Index Type'
+    )
+    metric_type: Literal['COSINE', 'IP', 'L2'] = Field(
+        'COSINE', description='Metric type of the vector index', title='Metric Type'
+    )
+    index_params: Dict[str, Any] = Field(
+        {},
+        description=('Build parameters of the vector index, e.g. {"M": 16, "efConstruction": 200} '
+                     'for HNSW or {"nlist": 1024} for IVF_FLAT'),
+        title='Vector Index Parameters'
+    )
+    id_strategy: Literal['random', 'deterministic'] = Field(
+        'random',
+        description=('random lets Milvus assign primary keys; deterministic derives them from '
+                     'dat_record_id and the chunk\'s text and upserts, so re-sent chunks '
+                     'overwrite themselves and REPLACE streams only delete the rows a sync did '
+                     'not write, after the sync. Only applied when the collection is created'),
+        title='ID Strategy'
+    )
+    bulk_import: Optional[MilvusBulkImport] = Field(
+        None,
+        description=('Stage large loads as files in object storage and import them with '
+                     'Milvus bulk import at the end of the sync, whose state is only '
+                     'emitted once the imports succeeded'),
+        title='Bulk Import'
+    )
 
 
 class MilvusSpecification(BaseModel):
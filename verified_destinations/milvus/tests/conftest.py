@@ -19,6 +19,16 @@ def valid_connection_object(request):
     }
 
 
+@pytest.fixture(scope="class")
+def offline_connection_object(request):
+    yield {
+        "uri": "http://localhost:19530",
+        "collection_name": "pytest_collection",
+        "authentication": {"authentication": "no_authentication"},
+        "embedding_dimensions": 1536,
+    }
+
+
 @pytest.fixture(scope="class")
 def conf_catalog(request):
     conf_catalog = DatCatalog(
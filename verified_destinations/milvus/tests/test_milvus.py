@@ -1,13 +1,19 @@
+import pytest
 from typing import List
+from unittest.mock import MagicMock, create_autospec, patch
+from pymilvus import MilvusClient
+from pymilvus.exceptions import MilvusException
 from dat_core.pydantic_models import (
     DatMessage, DatDocumentMessage,
     Data, DatStateMessage,
     StreamState, StreamStatus,
     DatDocumentStream, Type,
     DatCatalog, DatConnectionStatus,
+    ReadSyncMode, WriteSyncMode,
 )
 from verified_destinations.milvus.destination import Milvus
 from verified_destinations.milvus.specs import MilvusSpecification
+from verified_destinations.milvus.loader import MilvusLoader
 
 
 class TestMilvus:
@@ -22,6 +28,321 @@ class TestMilvus:
         assert isinstance(check_connection_tpl, DatConnectionStatus)
         assert check_connection_tpl.status.name == 'SUCCEEDED'
 
+    def test_collection_cache(self, offline_connection_object):
+        """
+        GIVEN a MilvusLoader whose collection and partition already exist
+        WHEN the existence checks run repeatedly
+        THEN the server is asked only once until the cache is invalidated
+        """
+        loader = MilvusLoader(MilvusSpecification(
+            name='Milvus',
+            connection_specification=offline_connection_object,
+            module_name='milvus',
+        ))
+        loader._client = MagicMock()
+        loader._client.has_collection.return_value = True
+        loader._client.has_partition.return_value = True
+        for _ in range(3):
+            loader._create_or_use_collection()
+            loader._create_or_use_partition("pytest_namespace")
+        assert loader._client.has_collection.call_count == 1
+        assert loader._client.has_partition.call_count == 1
+        assert loader._client.create_partition.call_count == 0
+        assert loader.stats["round_trips_saved"] == 4
+
+        loader.invalidate_cache()
+        loader._create_or_use_collection()
+        assert loader._client.has_collection.call_count == 2
+
+    def test_sub_batches(self, offline_connection_object):
+        """
+        GIVEN row and byte limits on insert requests
+        WHEN rows are grouped into sub-batches
+        THEN every sub-batch respects both limits
+        """
+        loader = MilvusLoader(MilvusSpecification(
+            name='Milvus',
+            connection_specification={
+                **offline_connection_object,
+                "insert_batch_size": 3,
+                "insert_batch_bytes": 100,
+            },
+            module_name='milvus',
+        ))
+        rows = [({"id": i}, 40) for i in range(7)]
+        sub_batches = list(loader._sub_batches(iter(rows)))
+        assert [len(batch) for batch, _ in sub_batches] == [2, 2, 2, 1]
+        assert all(batch_bytes <= 100 for _, batch_bytes in sub_batches)
+
+        rows = [({"id": i}, 1) for i in range(7)]
+        assert [len(batch) for batch, _ in loader._sub_batches(iter(rows))] == [3, 3, 1]
+
+    def test_paginated_delete(self, offline_connection_object):
+        """
+        GIVEN the iterator delete strategy
+        WHEN delete() is called for a namespace
+        THEN matching ids are paged through and deleted batch by batch
+        """
+        loader = MilvusLoader(MilvusSpecification(
+            name='Milvus',
+            connection_specification={
+                **offline_connection_object,
+                "delete_strategy": "iterator",
+                "delete_batch_size": 2,
+            },
+            module_name='milvus',
+        ))
+        loader._client = create_autospec(MilvusClient, instance=True)
+        loader._client.has_partition.return_value = True
+        pages = [[{"id": 1}, {"id": 2}], [{"id": 3}], []]
+        loader._client.query_iterator.return_value.next.side_effect = pages
+
+        assert loader.delete(filter="(dat_stream == 'PDF')", namespace="pytest_namespace") == 3
+        deleted_ids = [call.kwargs["ids"] for call in loader._client.delete.call_args_list]
+        assert deleted_ids == [[1, 2], [3]]
+        loader._client.query_iterator.return_value.close.assert_called_once()
+
+    def test_expression_delete_falls_back(self, offline_connection_object):
+        """
+        GIVEN the expression delete strategy and a server that rejects the delete expression
+        WHEN delete() is called
+        THEN the matching ids are paged through with the client's query iterator and deleted
+        """
+        loader = MilvusLoader(MilvusSpecification(
+            name='Milvus',
+            connection_specification=offline_connection_object,
+            module_name='milvus',
+        ))
+        loader._client = create_autospec(MilvusClient, instance=True)
+        loader._client.delete.side_effect = [MilvusException(message="expression not supported"), None]
+        loader._client.query_iterator.return_value.next.side_effect = [[{"id": 1}], []]
+
+        assert loader.delete(filter="(dat_stream == 'PDF')") == 1
+        assert loader._client.delete.call_args.kwargs["ids"] == [1]
+
+    def test_bulk_import_small_sync_falls_back(self, offline_connection_object):
+        """
+        GIVEN bulk import with a minimum of 10 rows per namespace
+        WHEN a sync only loads 3 rows
+        THEN nothing is staged and the rows are streamed through insert
+        """
+        loader = MilvusLoader(MilvusSpecification(
+            name='Milvus',
+            connection_specification={
+                **offline_connection_object,
+                "bulk_import": {
+                    "endpoint": "localhost:9000",
+                    "access_key": "minioadmin",
+                    "secret_key": "minioadmin",
+                    "min_rows": 10,
+                },
+            },
+            module_name='milvus',
+        ))
+        loader._stream_insert = MagicMock()
+        loader.bulk_importer._create_writer = MagicMock()
+        records = [(([0.1] * 4, {"dat_stream": "PDF"}), 40) for _ in range(3)]
+        loader.bulk_importer.add(iter(records), "pytest_namespace")
+        loader.finish_sync()
+
+        loader.bulk_importer._create_writer.assert_not_called()
+        streamed, namespace = loader._stream_insert.call_args.args
+        assert namespace == "pytest_namespace"
+        assert len(list(streamed)) == 3
+
+    def test_bulk_import_holds_state(self, offline_connection_object):
+        """
+        GIVEN bulk import and a sync whose import times out in finish_sync()
+        WHEN write() is consumed
+        THEN the state messages of the sync are not emitted
+        """
+        config = MilvusSpecification(
+            name='Milvus',
+            connection_specification={
+                **offline_connection_object,
+                "bulk_import": {
+                    "endpoint": "localhost:9000",
+                    "access_key": "minioadmin",
+                    "secret_key": "minioadmin",
+                },
+            },
+            module_name='milvus',
+        )
+        emitted = []
+        with patch("verified_destinations.milvus.destination.DataProcessor") as processor, \
+                patch.object(MilvusLoader, "finish_sync", side_effect=TimeoutError("import timed out")), \
+                patch.object(MilvusLoader, "close") as close:
+            processor.return_value.processor.return_value = iter([MagicMock(type=Type.STATE)])
+            with pytest.raises(TimeoutError):
+                for message in Milvus().write(config, DatCatalog(document_streams=[]), iter([])):
+                    emitted.append(message)
+        assert emitted == []
+        close.assert_called_once()
+
+    def test_explicit_schema(self, offline_connection_object):
+        """
+        GIVEN the explicit schema mode with an HNSW vector index
+        WHEN the collection schema and index params are built
+        THEN the dat_* fields are typed VARCHAR columns with scalar indexes
+        """
+        loader = MilvusLoader(MilvusSpecification(
+            name='Milvus',
+            connection_specification={
+                **offline_connection_object,
+                "schema_mode": "explicit",
+                "index_type": "HNSW",
+                "index_params": {"M": 16, "efConstruction": 200},
+            },
+            module_name='milvus',
+        ))
+        schema = loader._collection_schema()
+        schema.verify()
+        assert [field.name for field in schema.fields] == [
+            "id", "vector", "dat_stream", "dat_run_id", "dat_record_id"]
+        indexes = {index["field_name"]: index for index in loader._index_params()}
+        assert indexes["vector"]["index_type"] == "HNSW"
+        assert indexes["vector"]["params"] == {"M": 16, "efConstruction": 200}
+        assert indexes["dat_stream"]["index_type"] == "INVERTED"
+        assert indexes["dat_record_id"]["index_type"] == "Trie"
+
+    def test_partition_key_namespaces(self, offline_connection_object):
+        """
+        GIVEN the partition_key namespace mode
+        WHEN rows are inserted and deleted for a namespace
+        THEN no partitions are created and the namespace is carried by dat_namespace
+        """
+        loader = MilvusLoader(MilvusSpecification(
+            name='Milvus',
+            connection_specification={
+                **offline_connection_object,
+                "namespace_mode": "partition_key",
+                "num_partitions": 64,
+            },
+            module_name='milvus',
+        ))
+        schema = loader._collection_schema()
+        schema.verify()
+        assert schema.partition_key_field.name == "dat_namespace"
+
+        loader._client = MagicMock()
+        loader._client.has_collection.return_value = False
+        loader._client.delete.return_value = {"delete_count": 2}
+        loader._create_or_use_collection()
+        assert loader._client.create_collection.call_args.kwargs["num_partitions"] == 64
+
+        records = [(([0.1] * 4, {"dat_stream": "PDF", "dat_namespace": "tenant_a"}), 40)]
+        loader._stream_insert(iter(records), "tenant_a")
+        insert = loader._client.insert.call_args.kwargs
+        assert insert["partition_name"] is None
+        assert insert["data"][0]["dat_namespace"] == "tenant_a"
+
+        assert loader.delete(filter="(dat_stream == 'PDF')", namespace="tenant_a") == 2
+        loader._client.has_partition.assert_not_called()
+        loader._client.create_partition.assert_not_called()
+        delete = loader._client.delete.call_args.kwargs
+        assert delete["filter"] == "(dat_namespace == 'tenant_a') and ((dat_stream == 'PDF'))"
+        assert delete["partition_name"] is None
+
+    def test_deterministic_ids(self, offline_connection_object, records):
+        """
+        GIVEN the deterministic id strategy and a REPLACE stream
+        WHEN the same chunks are loaded by two syncs
+        THEN they get the same primary keys, are upserted, and only rows of
+            other runs are deleted, after the sync
+        """
+        config = MilvusSpecification(
+            name='Milvus',
+            connection_specification={
+                **offline_connection_object,
+                "id_strategy": "deterministic",
+            },
+            module_name='milvus',
+        )
+        stream = DatDocumentStream(
+            name="PDF",
+            namespace="pytest_namespace",
+            read_sync_mode=ReadSyncMode.INCREMENTAL,
+            write_sync_mode=WriteSyncMode.REPLACE,
+        )
+        chunks = [
+            DatDocumentMessage(
+                data=Data(
+                    document_chunk=record["document_chunk"],
+                    vectors=record["vectors"],
+                    metadata=record["metadata"],
+                ),
+                namespace=stream.namespace,
+                stream=stream
+            )
+            for record in records["PDF"]
+        ]
+        ids = []
+        for _ in range(2):
+            loader = MilvusLoader(config)
+            ids.append([loader._to_record(chunk, stream.namespace)[0][1]["id"] for chunk in chunks])
+        assert ids[0] == ids[1]
+        # Three chunks of Orange.pdf and one of Banana.pdf
+        assert len(set(ids[0])) == 4
+
+        loader = MilvusLoader(config)
+        assert loader._collection_schema().auto_id is False
+        loader._client = MagicMock()
+        loader._client.delete.return_value = {"delete_count": 1}
+        loader.initiate_sync(DatCatalog(document_streams=[stream]))
+        loader._client.delete.assert_not_called()
+
+        loader._stream_insert(iter([loader._to_record(chunk, stream.namespace) for chunk in chunks]),
+                              stream.namespace)
+        loader._client.insert.assert_not_called()
+        assert [row["id"] for row in loader._client.upsert.call_args.kwargs["data"]] == ids[0]
+
+        loader.finish_sync()
+        assert loader._client.delete.call_args.kwargs["filter"] == (
+            "(dat_stream == 'PDF') and (dat_run_id != '7c3f04fafccc4d6090e5c2ec94bd6c826')")
+
+    def test_unkeyed_chunks_survive_replace(self, offline_connection_object, records):
+        """
+        GIVEN the deterministic id strategy and a REPLACE stream whose chunks have no dat_record_id
+        WHEN the chunks are loaded and the sync finishes
+        THEN the deferred delete only matches rows of other runs, so the new rows survive
+        """
+        loader = MilvusLoader(MilvusSpecification(
+            name='Milvus',
+            connection_specification={
+                **offline_connection_object,
+                "id_strategy": "deterministic",
+            },
+            module_name='milvus',
+        ))
+        stream = DatDocumentStream(
+            name="PDF",
+            namespace="pytest_namespace",
+            read_sync_mode=ReadSyncMode.INCREMENTAL,
+            write_sync_mode=WriteSyncMode.REPLACE,
+        )
+        chunks = [
+            DatDocumentMessage(
+                data=Data(
+                    document_chunk=record["document_chunk"],
+                    vectors=record["vectors"],
+                    metadata={k: v for k, v in record["metadata"].items() if k != "dat_record_id"},
+                ),
+                namespace=stream.namespace,
+                stream=stream
+            )
+            for record in records["PDF"]
+        ]
+        loader._client = MagicMock()
+        loader._client.delete.return_value = {"delete_count": 0}
+        loader.initiate_sync(DatCatalog(document_streams=[stream]))
+        loader._stream_insert(iter([loader._to_record(chunk, stream.namespace) for chunk in chunks]),
+                              stream.namespace)
+
+        loader.finish_sync()
+        loader._client.delete.assert_called_once()
+        assert loader._client.delete.call_args.kwargs["filter"] == (
+            "(dat_stream == 'PDF') and (dat_run_id != '7c3f04fafccc4d6090e5c2ec94bd6c826')")
+
     def test_write(self, valid_connection_object, conf_catalog, records):
         """
         GIVEN a valid connectionSpecification JSON config
@@ -1,7 +1,10 @@
+import json
 import time
-import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from pinecone import Pinecone
-from typing import Any, List, Optional, Dict
+from pinecone.core.client.models import SparseValues
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Dict, Tuple
 from dat_core.loggers import logger
 from dat_core.connectors.destinations.loader import Loader
 from dat_core.connectors.destinations.utils import create_chunks
@@ -9,45 +12,223 @@ from dat_core.pydantic_models import (
     DatDocumentMessage, StreamMetadata,
     WriteSyncMode, DatCatalog
 )
+from verified_destinations.record_ids import ChunkIdGenerator
+from verified_destinations.pinecone.metadata import MetadataNormalizer
+from verified_destinations.pinecone.rate_limiter import AdaptiveRateLimiter
+from verified_destinations.pinecone.sparse import SparseVectors
+from verified_destinations.pinecone.upsert_scheduler import UpsertScheduler
 
-PINECONE_BATCH_SIZE = 100
-
+# Upsert requests in flight before the scheduler has learnt better
 PARALLELISM_LIMIT = 4
 
-METADATA_SIZE_LIMIT = 40  # 40KB
+# Upper bound of the JSON encoding of one float, e.g. -0.012345678901234567
+JSON_FLOAT_BYTES = 22
 
 MAX_IDS_PER_DELETE = 1000
 
+QUERY_TOP_K = 10000
+
+# Consecutive queries returning only already-deleted ids before they are deleted again
+MAX_STALE_QUERIES = 6
+
+# Times still-returned ids are deleted again before the delete fails
+MAX_REDELETES = 3
+
+# Deleted ids remembered so that lagging queries do not delete them again
+MAX_SEEN_IDS = 100000
+
+# Vector ids are prefixed with their stream, so that list() can enumerate a stream
+ID_PREFIX_SEPARATOR = "#"
+
 
 class PineconeLoader(Loader):
     def __init__(self, config: Any, embedding_dimensions: int):
         super().__init__(config)
         self.embedding_dimensions = int(embedding_dimensions)
-        self.pine = Pinecone(
-            api_key=config.connection_specification.pinecone_api_key)
+        self.pine = self._create_client()
+        self._build_hybrid_vector = self._hybrid_vector_builder()
+        self.ids = ChunkIdGenerator(config.connection_specification.id_strategy)
+        # REPLACE streams whose stale vectors are deleted after the sync, keyed by stream name
+        self._deferred_replace: Dict[str, Optional[str]] = {}
+        self.rate_limiter = AdaptiveRateLimiter()
+        self.stats = Counter()
+        # Deletes filter on the stream and the run id, so those fields are never dropped
+        self.metadata_normalizer = MetadataNormalizer(
+            overflow=config.connection_specification.metadata_overflow,
+            keep=(self.METADATA_DAT_STREAM_FIELD, self.METADATA_DAT_RUN_ID_FIELD),
+            stats=self.stats,
+        )
+        self._index = None
+        self._index_description = None
+        self._capacity_mode = None
+        self.upsert_scheduler = UpsertScheduler(
+            initial_window=min(PARALLELISM_LIMIT, config.connection_specification.max_upsert_concurrency),
+            max_window=config.connection_specification.max_upsert_concurrency,
+            stats=self.stats,
+        )
 
     def load(self, document_chunks: List[DatDocumentMessage], namespace: str, stream: str) -> None:
-        pinecone_index = self.pine.Index(
-            self.config.connection_specification.pinecone_index)
+        pinecone_index = self.index
+        sparse_field = self.config.connection_specification.sparse_vector_field
         pinecone_docs = []
+        sparse_values = []
         for document_chunk in document_chunks:
             metadata = document_chunk.data.metadata.model_dump()
-            metadata = self._normalize_metadata(metadata)
+            vector_id = (f"{self._id_prefix(metadata[self.METADATA_DAT_STREAM_FIELD]) or ''}"
+                         f"{self.ids.next_id(metadata, namespace)}")
+            sparse = metadata.pop(sparse_field, None) if sparse_field else None
+            metadata = self.metadata_normalizer.normalize(metadata, stream)
+            if metadata is None:
+                continue
             chunk = document_chunk.data.vectors
-            pinecone_docs.append((str(uuid.uuid4()), chunk, metadata))
-        serial_batches = create_chunks(
-            pinecone_docs, batch_size=PINECONE_BATCH_SIZE * PARALLELISM_LIMIT)
-        for batch in serial_batches:
-            async_results = [
-                pinecone_index.upsert(
-                    vectors=ids_vectors_chunk, async_req=True, show_progress=False, namespace=namespace)
-                for ids_vectors_chunk in create_chunks(batch, batch_size=PINECONE_BATCH_SIZE)
-            ]
-            [async_result.get() for async_result in async_results]
-
-    def determine_capacity_mode(self, index_name: str) -> str:
-        describe_index = self.pine.describe_index(index_name)
-        spec_keys = describe_index.get("spec", {})
+            pinecone_docs.append((vector_id, chunk, metadata))
+            sparse_values.append(sparse)
+        if sparse_field:
+            pinecone_docs = self._with_sparse_values(pinecone_docs, sparse_values)
+        self.upsert_scheduler.run(
+            self._upsert_batches(pinecone_docs),
+            lambda batch: pinecone_index.upsert(vectors=batch, show_progress=False, namespace=namespace)
+        )
+
+    def _with_sparse_values(self, pinecone_docs: List[Tuple[str, List[float], Dict[str, Any]]],
+                            sparse_values: List[Optional[Dict[str, Any]]]) -> List[Any]:
+        # Encoded and validated for the whole batch at once; vectors without
+        # sparse values stay tuples, which the client converts fastest
+        sparse_vectors = SparseVectors.encode(sparse_values, [doc[0] for doc in pinecone_docs])
+        hybrid_docs = []
+        for i, ((vector_id, values, metadata), sparse) in enumerate(
+                zip(pinecone_docs, sparse_vectors.rows())):
+            if i in sparse_vectors.errors:
+                # Skipped like records whose metadata does not fit, rather than failing the batch
+                self.stats["rejected_sparse_vectors"] += 1
+                logger.warning(f"Skipping a vector: {sparse_vectors.errors[i]}")
+                continue
+            if sparse is None:
+                hybrid_docs.append((vector_id, values, metadata))
+            else:
+                hybrid_docs.append(self._build_hybrid_vector(vector_id, values, metadata, *sparse))
+        return hybrid_docs
+
+    @staticmethod
+    def _estimate_payload_bytes(doc: Any) -> int:
+        # Metadata is measured exactly as the client serializes it; floats are bounded
+        if isinstance(doc, tuple):
+            (vector_id, values, metadata), sparse_bytes = doc, 0
+        elif isinstance(doc, dict):
+            vector_id, values, metadata = doc["id"], doc["values"], doc["metadata"]
+            sparse_bytes = SparseVectors.payload_bytes(doc["sparse_values"], JSON_FLOAT_BYTES)
+        else:
+            # A gRPC vector, measured exactly as it is sent
+            return doc.ByteSize()
+        return len(vector_id) + JSON_FLOAT_BYTES * len(values) + len(json.dumps(metadata)) + sparse_bytes
+
+    def _upsert_batches(self, pinecone_docs: List[Any]) -> Iterator[Tuple[List[Any], int]]:
+        """
+        Group vectors into upsert requests bounded both by vector count and
+        by the estimated payload size, under Pinecone's 2MB request limit.
+        """
+        max_vectors = self.config.connection_specification.upsert_batch_size
+        max_bytes = self.config.connection_specification.upsert_batch_bytes
+        batch, batch_bytes = [], 0
+        for doc in pinecone_docs:
+            doc_bytes = self._estimate_payload_bytes(doc)
+            if batch and (len(batch) >= max_vectors or batch_bytes + doc_bytes > max_bytes):
+                yield batch, batch_bytes
+                batch, batch_bytes = [], 0
+            batch.append(doc)
+            batch_bytes += doc_bytes
+        if batch:
+            yield batch, batch_bytes
+
+    def _create_client(self) -> Pinecone:
+        api_key = self.config.connection_specification.pinecone_api_key
+        if self.config.connection_specification.transport == "grpc":
+            try:
+                from pinecone.grpc import PineconeGRPC
+            except ModuleNotFoundError as e:
+                raise ModuleNotFoundError(
+                    "The Pinecone gRPC transport requires the grpc extra: pip install 'pinecone-client[grpc]'"
+                ) from e
+            return PineconeGRPC(api_key=api_key)
+        return Pinecone(api_key=api_key)
+
+    def _hybrid_vector_builder(self) -> Callable[[str, List[float], Dict[str, Any], List[int], List[float]], Any]:
+        """
+        Build vectors with sparse values in the form the transport converts
+        fastest. SparseVectors.encode already validated the sparse values,
+        so the REST type checks are skipped. gRPC vectors are built as the
+        client's protobuf Vector and filled in place: given a dict, the
+        client would copy the metadata and sparse values into it again.
+        """
+        if self.config.connection_specification.transport == "grpc":
+            from pinecone.core.grpc.protos.vector_service_pb2 import Vector as GRPCVector
+
+            def build_grpc(vector_id, values, metadata, sparse_indices, sparse_values):
+                vector = GRPCVector(id=vector_id, values=values)
+                vector.metadata.update(metadata)
+                vector.sparse_values.indices.extend(sparse_indices)
+                vector.sparse_values.values.extend(sparse_values)
+                return vector
+            return build_grpc
+        return lambda vector_id, values, metadata, sparse_indices, sparse_values: {
+            "id": vector_id, "values": values, "metadata": metadata,
+            "sparse_values": SparseValues(indices=sparse_indices, values=sparse_values, _check_type=False),
+        }
+
+    def close(self) -> None:
+        self.upsert_scheduler.close()
+        if self._index is not None and hasattr(self._index, "close"):
+            # Closes the gRPC channel; the REST index has nothing to close
+            self._index.close()
+            self._index = None
+        logger.debug(f"Pinecone loader stats: {dict(self.stats)}")
+
+    @property
+    def index_description(self):
+        """
+        describe_index() of the configured index, fetched from the control
+        plane once and cached for the lifetime of the loader.
+        """
+        if self._index_description is None:
+            self._index_description = self.pine.describe_index(
+                self.config.connection_specification.pinecone_index)
+            self.stats["control_plane_calls"] += 1
+        return self._index_description
+
+    @property
+    def index(self):
+        if self._index is None:
+            # Passing the host keeps the client from describing the index again
+            self._index = self.pine.Index(name=self.config.connection_specification.pinecone_index,
+                                          host=self.index_host)
+        return self._index
+
+    @property
+    def index_host(self) -> str:
+        return self.index_description.host
+
+    @property
+    def index_dimension(self) -> int:
+        return self.index_description.dimension
+
+    @property
+    def capacity_mode(self) -> str:
+        if self._capacity_mode is None:
+            self._capacity_mode = self.determine_capacity_mode(self.index_description)
+        return self._capacity_mode
+
+    def refresh_index_cache(self) -> None:
+        """
+        Forget the cached index handle and description, e.g. after the
+        index was recreated or scaled, so that they are resolved again.
+        """
+        self._index = None
+        self._index_description = None
+        self._capacity_mode = None
+
+    @staticmethod
+    def determine_capacity_mode(index_description) -> str:
+        spec_keys = index_description.get("spec", {})
         if "pod" in spec_keys:
             return "pod"
         elif "serverless" in spec_keys:
@@ -55,44 +236,189 @@ class PineconeLoader(Loader):
         else:
             raise ValueError("Unknown capacity mode")
 
-    def delete(self, filter: Dict[str, Any], namespace: str):
-        pinecone_index = self.pine.Index(
-            self.config.connection_specification.pinecone_index)
-        capacity_mode = self.determine_capacity_mode(
-            self.config.connection_specification.pinecone_index)
-        if capacity_mode in ["pod", "serverless"]:
-            top_k = 10000
-            self.delete_by_metadata(filter, top_k, namespace)
-        else:
-            pinecone_index.delete(filter=filter, namespace=namespace)
-
-    def delete_by_metadata(self, filter, top_k, namespace=None):
-        pinecone_index = self.pine.Index(
-            self.config.connection_specification.pinecone_index)
-        zero_vector = [0.0] * self.embedding_dimensions
-        query_result = pinecone_index.query(
-            vector=zero_vector, filter=filter, top_k=top_k, namespace=namespace)
-        while len(query_result.matches) > 0:
-            vector_ids = [doc.id for doc in query_result.matches]
-            if len(vector_ids) > 0:
-                batches = create_chunks(vector_ids, batch_size=MAX_IDS_PER_DELETE)
-                for batch in batches:
-                    pinecone_index.delete(ids=list(batch), namespace=namespace)
-                    print(f"Sleeping for 20 seconds")
-                    time.sleep(20)
-            query_result = pinecone_index.query(vector=zero_vector, filter=filter, top_k=top_k, namespace=namespace)
+    def delete(self, filter: Dict[str, Any], namespace: str) -> int:
+        pinecone_index = self.index
+        if self.capacity_mode == "pod":
+            # Pod indexes delete by metadata filter server-side, which reports no count,
+            # so the matching vectors are counted first
+            start = time.perf_counter()
+            index_stats = self.rate_limiter.call(pinecone_index.describe_index_stats, filter=filter)
+            namespace_stats = index_stats.namespaces.get(namespace or "")
+            deleted = namespace_stats.vector_count if namespace_stats else 0
+            self.rate_limiter.call(pinecone_index.delete, filter=filter, namespace=namespace)
+            self.stats["deleted_vectors"] += deleted
+            logger.info(f"Deleted {deleted} vectors matching {filter} server-side in "
+                        f"{time.perf_counter() - start:.1f}s")
+            return deleted
+        return self.delete_by_metadata(filter, namespace)
+
+    def delete_by_metadata(self, filter: Dict[str, Any], namespace: Optional[str] = None) -> int:
+        """
+        Delete the vectors matching filter from a serverless index, which
+        cannot delete by metadata. Ids are enumerated with list() when the
+        filter selects a whole stream, whose ids share a prefix, then with
+        filtered queries for everything else (and vectors written before
+        ids were prefixed). Batches are deleted in parallel, paced by the
+        adaptive rate limiter. Returns the number of vectors deleted.
+        """
+        pinecone_index = self.index
+        start = time.perf_counter()
+        seen = OrderedDict()
+        deleted = 0
+        prefix = self._stream_id_prefix(filter)
+        if prefix is not None:
+            deleted += self._delete_ids(
+                pinecone_index, self._list_ids(pinecone_index, prefix, namespace, seen), namespace, start)
+        deleted += self._delete_ids(
+            pinecone_index, self._query_ids(pinecone_index, filter, namespace, seen), namespace, start)
+        elapsed = time.perf_counter() - start
+        self.stats["deleted_vectors"] += deleted
+        logger.info(f"Deleted {deleted} vectors matching {filter} in {elapsed:.1f}s "
+                    f"({deleted / elapsed if elapsed else 0:.0f} vectors/s, "
+                    f"{self.rate_limiter.throttled} rate-limited requests)")
+        return deleted
+
+    def _stream_id_prefix(self, filter: Dict[str, Any]) -> Optional[str]:
+        # Only a plain stream filter can be answered from the id prefix alone
+        if set(filter) != {self.METADATA_DAT_STREAM_FIELD}:
+            return None
+        return self._id_prefix(filter[self.METADATA_DAT_STREAM_FIELD].get("$eq"))
+
+    @staticmethod
+    def _id_prefix(stream: Any) -> Optional[str]:
+        # Streams whose name holds the separator are not prefixed: the prefix of
+        # stream PDF would otherwise also match the ids of stream PDF#x
+        if not isinstance(stream, str) or ID_PREFIX_SEPARATOR in stream:
+            return None
+        return f"{stream}{ID_PREFIX_SEPARATOR}"
+
+    def _list_ids(self, pinecone_index, prefix: str, namespace: Optional[str],
+                  seen: OrderedDict) -> Iterator[Tuple[List[str], bool]]:
+        # Paged by hand rather than with index.list() so that every page goes
+        # through the rate limiter. Pages advance on the id, so deleting the
+        # ids already listed does not shift later pages.
+        pagination_token = None
+        while True:
+            page = self.rate_limiter.call(pinecone_index.list_paginated, prefix=prefix,
+                                          namespace=namespace, pagination_token=pagination_token)
+            # Ids written before streams holding the separator went unprefixed may
+            # share the prefix; the chunk id after it never holds the separator
+            ids = [vector.id for vector in page.vectors
+                   if ID_PREFIX_SEPARATOR not in vector.id[len(prefix):]]
+            if ids:
+                self._remember(seen, ids)
+                yield ids, False
+            if not page.pagination or not page.pagination.next:
+                return
+            pagination_token = page.pagination.next
+
+    def _query_ids(self, pinecone_index, filter: Dict[str, Any], namespace: Optional[str],
+                   seen: OrderedDict) -> Iterator[Tuple[List[str], bool]]:
+        """
+        Yield the ids of the vectors matching filter, with whether they were
+        deleted before, until a query matches none. Deletes become visible to queries eventually, so ids already
+        deleted are skipped while they are; ids queries keep returning are
+        deleted again, and after MAX_REDELETES rounds the delete fails.
+        """
+        # Any non-zero vector will do: with top_k this high every match is returned anyway
+        probe_vector = [1.0] + [0.0] * (self.embedding_dimensions - 1)
+        stale_queries = redeletes = 0
+        while True:
+            query_result = self.rate_limiter.call(
+                pinecone_index.query, vector=probe_vector, filter=filter, top_k=QUERY_TOP_K,
+                namespace=namespace, include_values=False, include_metadata=False)
+            if not query_result.matches:
+                return
+            matched_ids = [match.id for match in query_result.matches]
+            vector_ids = [vector_id for vector_id in matched_ids if vector_id not in seen]
+            if len(vector_ids) == len(matched_ids) < QUERY_TOP_K:
+                # Every match was returned and none was deleted before, so earlier deletes are visible
+                seen.clear()
+            if vector_ids:
+                stale_queries = redeletes = 0
+            elif stale_queries < MAX_STALE_QUERIES:
+                # Deletes are eventually consistent: wait for them to become visible
+                stale_queries += 1
+                time.sleep(min(0.5 * 2 ** stale_queries, 10))
+                continue
+            else:
+                redeletes += 1
+                if redeletes > MAX_REDELETES:
+                    raise RuntimeError(f"Queries for {filter} still return {len(matched_ids)} vectors "
+                                       f"deleted {MAX_REDELETES + 1} times")
+                logger.warning(f"Queries for {filter} still return {len(matched_ids)} deleted vectors, "
+                               f"deleting them again")
+                stale_queries = 0
+                self.stats["redeleted_vectors"] += len(matched_ids)
+                yield matched_ids, True
+                continue
+            self._remember(seen, vector_ids)
+            yield vector_ids, False
+
+    @staticmethod
+    def _remember(seen: OrderedDict, ids: List[str]) -> None:
+        # The oldest ids are forgotten first; their deletes are the likeliest to be visible
+        for vector_id in ids:
+            seen[vector_id] = None
+            seen.move_to_end(vector_id)
+        while len(seen) > MAX_SEEN_IDS:
+            seen.popitem(last=False)
+
+    def _delete_ids(self, pinecone_index, id_pages: Iterable[Tuple[List[str], bool]],
+                    namespace: Optional[str], start: float) -> int:
+        """
+        Delete the pages of ids, each with whether it deletes ids again.
+        Returns the number of vectors deleted, counting each id once.
+        """
+        max_in_flight = self.config.connection_specification.delete_concurrency
+        deleted = 0
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=max_in_flight,
+                                thread_name_prefix="pinecone-delete") as executor:
+            try:
+                for ids, redelete in id_pages:
+                    for batch in create_chunks(ids, batch_size=MAX_IDS_PER_DELETE):
+                        if len(in_flight) >= max_in_flight:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            deleted += sum(future.result() for future in done)
+                        in_flight.add(executor.submit(self._delete_batch, pinecone_index,
+                                                      list(batch), namespace, redelete))
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"Deleted {deleted} vectors so far "
+                                f"({deleted / elapsed if elapsed else 0:.0f} vectors/s)")
+                deleted += sum(future.result() for future in as_completed(in_flight))
+            except Exception:
+                for future in in_flight:
+                    future.cancel()
+                raise
+        return deleted
+
+    def _delete_batch(self, pinecone_index, ids: List[str], namespace: Optional[str],
+                      redelete: bool = False) -> int:
+        self.rate_limiter.call(pinecone_index.delete, ids=ids, namespace=namespace)
+        # Ids deleted again were counted the first time
+        return 0 if redelete else len(ids)
 
     def check(self) -> Optional[str]:
         try:
             indexes = self.pine.list_indexes()
+            self.stats["control_plane_calls"] += 1
             index = self.config.connection_specification.pinecone_index
             if index not in [i.name for i in indexes]:
                 return False, f"Index {index} does not exist in environment {self.config.connection_specification.pinecone_environment}."
-            description = self.pine.describe_index(index)
+            self.refresh_index_cache()
+            description = self.index_description
             if description.dimension != self.embedding_dimensions:
                 return (False,
                         (f"Index {index} has dimension {description.dimension} "
                          f"but configured dimension is {self.embedding_dimensions}."))
+            if (self.config.connection_specification.sparse_vector_field
+                    and description.metric != "dotproduct"):
+                return (False,
+                        (f"Index {index} uses the {description.metric} metric, but sparse "
+                         f"vectors can only be upserted to dotproduct indexes."))
+            # Reach the data plane over the configured transport, too
+            self.index.describe_index_stats()
         except Exception as e:
             return False, str(e)
         return True, description
@@ -100,6 +426,13 @@ class PineconeLoader(Loader):
     def initiate_sync(self, configured_catalog: DatCatalog):
         for stream in configured_catalog.document_streams:
             if stream.write_sync_mode == WriteSyncMode.REPLACE:
+                if self.ids.deterministic:
+                    # Re-sent chunks overwrite themselves, so only the vectors this
+                    # sync does not write need deleting, once it is done
+                    logger.info(f"Upsert mode set to 'REPLACE' for stream {stream.name}. "
+                                f"Deferring the delete of stale vectors to the end of the sync")
+                    self._deferred_replace[stream.name] = stream.namespace
+                    continue
                 _filter = self.prepare_metadata_filter(
                     {self.METADATA_DAT_STREAM_FIELD: stream.name})
                 logger.info(f"Upsert mode set to 'REPLACE' for stream {stream.name}."
@@ -107,6 +440,18 @@ class PineconeLoader(Loader):
                 self.delete(
                     filter=_filter, namespace=stream.namespace)
 
+    def finish_sync(self) -> None:
+        """
+        Called once every message of the sync has been handed to load().
+        Deletes the vectors of deferred REPLACE streams this sync did not write.
+        """
+        for stream_name, namespace in self._deferred_replace.items():
+            _filter = self.prepare_metadata_filter(self.ids.stale_filter(stream_name))
+            logger.info(f"Deleting vectors of stream {stream_name} not written by this sync "
+                        f"with filter: {_filter}")
+            self.delete(filter=_filter, namespace=namespace)
+        self._deferred_replace.clear()
+
     def prepare_metadata_filter(self, filter: Dict[str, Any]) -> Dict[str, Any]:
         filter_dict = {}
 
@@ -119,31 +464,3 @@ class PineconeLoader(Loader):
                 filter_dict[key] = {"$in": value}
 
         return filter_dict
-
-    def _normalize_metadata(self, metadata: dict) -> dict:
-        # Remove any key-value pairs with None values
-        normalized_metadata = {
-            key: value for key, value in metadata.items() if value is not None
-        }
-
-        # Filter out unsupported metadata types and normalize lists of strings
-        for key, value in list(normalized_metadata.items()):
-            if isinstance(value, (str, int, float, bool)):
-                # Supported types: keep them as-is
-                continue
-            elif isinstance(value, list):
-                # Ensure the list contains only strings
-                if all(isinstance(item, str) for item in value):
-                    normalized_metadata[key] = value
-                else:
-                    # Remove list if it contains non-string elements
-                    del normalized_metadata[key]
-            else:
-                # Remove unsupported metadata types
-                del normalized_metadata[key]
-
-        metadata_size = sum(len(str(k)) + len(str(v)) for k, v in normalized_metadata.items())
-        if metadata_size > METADATA_SIZE_LIMIT * 1024:
-            raise ValueError(f"Metadata exceeds the 40KB size limit, current size: {metadata_size} bytes")
-
-        return normalized_metadata
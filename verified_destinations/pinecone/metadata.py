@@ -0,0 +1,148 @@
+import math
+from collections import Counter
+from json.encoder import encode_basestring
+from typing import Any, Callable, Dict, Optional, Tuple
+from dat_core.loggers import logger
+
+# Pinecone's per-vector metadata limit, counted in bytes of UTF-8 JSON
+METADATA_SIZE_LIMIT = 40 * 1024
+
+METADATA_DOCUMENT_CHUNK_FIELD = "dat_document_chunk"
+
+# A value sizer returns the JSON byte size of a value, or None if Pinecone cannot store it
+ValueSizer = Callable[[Any], Optional[int]]
+
+
+def _str_bytes(value: str) -> int:
+    encoded = encode_basestring(value)
+    return len(encoded) if encoded.isascii() else len(encoded.encode("utf-8"))
+
+
+def _int_bytes(value: int) -> int:
+    return len(repr(int(value)))
+
+
+def _float_bytes(value: float) -> Optional[int]:
+    # NaN and Infinity are not valid JSON
+    return len(repr(float(value))) if math.isfinite(value) else None
+
+
+def _bool_bytes(value: bool) -> int:
+    return 4 if value else 5
+
+
+def _str_list_bytes(value: list) -> Optional[int]:
+    size = 1 + len(value)  # brackets and commas
+    for item in value:
+        if type(item) is not str:
+            return None
+        size += _str_bytes(item)
+    return size + (not value)
+
+
+def _unsupported(value: Any) -> None:
+    return None
+
+
+VALUE_SIZERS: Dict[type, ValueSizer] = {
+    str: _str_bytes,
+    int: _int_bytes,
+    float: _float_bytes,
+    bool: _bool_bytes,
+    list: _str_list_bytes,
+}
+
+
+class MetadataNormalizer:
+    """
+    Keeps the metadata fields Pinecone can store (strings, numbers, booleans
+    and lists of strings) and measures them in a single pass, exactly as
+    Pinecone counts them: bytes of compact UTF-8 JSON.
+
+    Each stream gets a plan that maps (field, value type) to the byte size
+    of the encoded key and the sizer of the value, compiled the first time
+    the pair is seen, so that a record costs one dict lookup per field.
+
+    Records over the limit are handled according to overflow: truncate
+    shortens dat_document_chunk, drop_fields drops the largest fields other
+    than keep, and reject skips the record. Records that still do not fit
+    are skipped with a warning rather than failing the whole batch.
+    """
+
+    def __init__(self, overflow: str = "truncate", limit: int = METADATA_SIZE_LIMIT,
+                 keep: Tuple[str, ...] = (), stats: Optional[Counter] = None):
+        self.overflow = overflow
+        self.limit = limit
+        self.keep = frozenset(keep)
+        self.stats = stats if stats is not None else Counter()
+        self._plans: Dict[str, Dict[Tuple[str, type], Tuple[int, ValueSizer]]] = {}
+
+    def normalize(self, metadata: Dict[str, Any], stream: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the storable fields of metadata, fitted under the limit, or
+        None if the record has to be skipped.
+        """
+        plan = self._plans.get(stream)
+        if plan is None:
+            plan = self._plans[stream] = {}
+        normalized = {}
+        size = 1  # the braces, less the comma the first field does not need
+        for key, value in metadata.items():
+            if value is None:
+                continue
+            step = plan.get((key, type(value)))
+            if step is None:
+                step = self._compile(plan, key, type(value))
+            value_bytes = step[1](value)
+            if value_bytes is None:
+                continue
+            normalized[key] = value
+            size += step[0] + value_bytes
+        if size > self.limit:
+            return self._fit(normalized, size, plan, stream)
+        return normalized
+
+    @staticmethod
+    def _compile(plan: Dict[Tuple[str, type], Tuple[int, ValueSizer]], key: str,
+                 value_type: type) -> Tuple[int, ValueSizer]:
+        # Subclasses, e.g. str enums, are sized like their base type
+        sizer = next((VALUE_SIZERS[base] for base in value_type.__mro__ if base in VALUE_SIZERS),
+                     _unsupported)
+        # The comma before the field and the colon after its key are counted with the key
+        step = (_str_bytes(key) + 2, sizer)
+        plan[(key, value_type)] = step
+        return step
+
+    def _field_bytes(self, plan, key: str, value: Any) -> int:
+        key_bytes, sizer = plan[(key, type(value))]
+        return key_bytes + sizer(value)
+
+    def _fit(self, metadata: Dict[str, Any], size: int, plan, stream: str) -> Optional[Dict[str, Any]]:
+        if self.overflow == "truncate":
+            chunk = metadata.get(METADATA_DOCUMENT_CHUNK_FIELD)
+            if isinstance(chunk, str):
+                excess = size - self.limit
+                # Escaped characters only take more JSON bytes than UTF-8 bytes,
+                # so cutting `excess` UTF-8 bytes frees at least `excess` JSON bytes
+                raw = chunk.encode("utf-8")
+                truncated = raw[:max(0, len(raw) - excess)].decode("utf-8", errors="ignore")
+                size -= _str_bytes(chunk) - _str_bytes(truncated)
+                metadata[METADATA_DOCUMENT_CHUNK_FIELD] = truncated
+                self.stats["truncated_metadata"] += 1
+        elif self.overflow == "drop_fields":
+            droppable = sorted(
+                ((self._field_bytes(plan, key, value), key)
+                 for key, value in metadata.items() if key not in self.keep),
+                reverse=True)
+            for field_bytes, key in droppable:
+                if size <= self.limit:
+                    break
+                del metadata[key]
+                size -= field_bytes
+                self.stats["dropped_metadata_fields"] += 1
+        if size > self.limit:
+            self.stats["rejected_vectors"] += 1
+            logger.warning(f"Skipping a vector of stream {stream}: its metadata takes {size} bytes, "
+                           f"over Pinecone's {self.limit} byte limit")
+            return None
+        return metadata
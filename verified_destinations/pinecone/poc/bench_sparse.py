@@ -0,0 +1,72 @@
+"""
+Benchmark of PineconeLoader upsert throughput for dense-only vectors
+against sparse-dense (hybrid) vectors, whose sparse values are encoded
+and validated per batch. Runs against the local stand-in servers of
+bench_transport, so the numbers are client-side cost only.
+
+    python -m verified_destinations.pinecone.poc.bench_sparse --vectors 20000 --nnz 100
+"""
+import argparse
+import multiprocessing
+import random
+import time
+from verified_destinations.pinecone.poc.bench_transport import _docs, _loader, _serve_grpc, _serve_rest
+
+SERVERS = {"rest": _serve_rest, "grpc": _serve_grpc}
+
+
+def _sparse_values(num_vectors: int, nnz: int):
+    rng = random.Random(7)
+    return [
+        {"indices": rng.sample(range(30000), nnz), "values": [rng.random() for _ in range(nnz)]}
+        for _ in range(num_vectors)
+    ]
+
+
+def _run(transport: str, port: int, docs, sparse_values, dim: int, batch_size: int) -> float:
+    loader = _loader(transport, port, dim)
+    index = loader.index
+    start = time.perf_counter()
+    # Batched like DataProcessor hands chunks to load()
+    for i in range(0, len(docs), batch_size):
+        batch = docs[i:i + batch_size]
+        if sparse_values is not None:
+            batch = loader._with_sparse_values(batch, sparse_values[i:i + batch_size])
+        loader.upsert_scheduler.run(
+            loader._upsert_batches(batch),
+            lambda vectors: index.upsert(vectors=vectors, show_progress=False, namespace="bench")
+        )
+    elapsed = time.perf_counter() - start
+    loader.close()
+    return len(docs) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--nnz", type=int, default=100, help="non-zero sparse values per vector")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--transport", choices=sorted(SERVERS), default="rest")
+    parser.add_argument("--port", type=int, default=50552)
+    args = parser.parse_args()
+
+    docs = _docs(args.vectors, args.dim)
+    sparse_values = _sparse_values(args.vectors, args.nnz)
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    server = ctx.Process(target=SERVERS[args.transport], args=(args.port, ready), daemon=True)
+    server.start()
+    ready.wait()
+    try:
+        dense = _run(args.transport, args.port, docs, None, args.dim, args.batch_size)
+        hybrid = _run(args.transport, args.port, docs, sparse_values, args.dim, args.batch_size)
+    finally:
+        server.terminate()
+        server.join()
+    print(f"dense-only {dense:>10.0f} vectors/s")
+    print(f"hybrid     {hybrid:>10.0f} vectors/s ({(hybrid / dense - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
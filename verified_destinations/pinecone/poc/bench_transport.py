@@ -0,0 +1,135 @@
+"""
+Benchmark of the PineconeLoader upsert path over the REST and gRPC
+transports, against local stand-in servers that accept upserts and
+discard them. Each stand-in runs in its own process, so the CPU time
+measured in this process is the client's alone: batching, serialization
+and the transport. Needs the pinecone-client[grpc] extra.
+
+    python -m verified_destinations.pinecone.poc.bench_transport --vectors 20000 --dim 1536
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+from verified_destinations.pinecone.loader import PineconeLoader
+from verified_destinations.pinecone.specs import PineconeSpecification
+
+TRANSPORTS = ("rest", "grpc")
+
+
+class _UpsertHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        payload = json.dumps({"upsertedCount": len(body["vectors"])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_rest(port: int, ready) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", port), _UpsertHandler)
+    ready.set()
+    server.serve_forever()
+
+
+def _serve_grpc(port: int, ready) -> None:
+    import grpc
+    from pinecone.core.grpc.protos import vector_service_pb2, vector_service_pb2_grpc
+
+    class VectorService(vector_service_pb2_grpc.VectorServiceServicer):
+        def Upsert(self, request, context):
+            return vector_service_pb2.UpsertResponse(upserted_count=len(request.vectors))
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=16),
+                         options=[("grpc.max_receive_message_length", 128 * 1024 * 1024)])
+    vector_service_pb2_grpc.add_VectorServiceServicer_to_server(VectorService(), server)
+    server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    ready.set()
+    server.wait_for_termination()
+
+
+def _loader(transport: str, port: int, dim: int) -> PineconeLoader:
+    loader = PineconeLoader(PineconeSpecification(
+        name='Pinecone',
+        connection_specification={
+            "pinecone_index": "bench",
+            "pinecone_environment": "local",
+            "pinecone_api_key": "bench",
+            "embedding_dimensions": dim,
+            "transport": transport,
+        },
+        module_name='pinecone',
+    ), dim)
+    # Skip the control plane: point the cached index handle at the stand-in
+    loader._index_description = MagicMock(host=f"http://127.0.0.1:{port}", dimension=dim)
+    if transport == "grpc":
+        from pinecone.grpc import GRPCClientConfig
+        loader._index = loader.pine.Index(name="bench", host=f"127.0.0.1:{port}",
+                                          grpc_config=GRPCClientConfig(secure=False),
+                                          _endpoint_override=f"127.0.0.1:{port}")
+    return loader
+
+
+def _docs(num_vectors: int, dim: int):
+    rng = random.Random(42)
+    return [
+        (f"PDF#{i}", [rng.uniform(-1, 1) for _ in range(dim)], {
+            "dat_source": "GoogleDrive",
+            "dat_document_chunk": f"chunk {i} " * 20,
+            "dat_stream": "PDF",
+            "dat_document_entity": f"/Apple/{i // 10}.pdf",
+            "dat_record_id": f"/Apple/{i // 10}.pdf",
+            "dat_run_id": "7c3f04fafccc4d6090e5c2ec94bd6c826",
+        })
+        for i in range(num_vectors)
+    ]
+
+
+def _run(transport: str, port: int, docs, dim: int):
+    loader = _loader(transport, port, dim)
+    index = loader.index
+    start, cpu_start = time.perf_counter(), time.process_time()
+    loader.upsert_scheduler.run(
+        loader._upsert_batches(docs),
+        lambda batch: index.upsert(vectors=batch, show_progress=False, namespace="bench")
+    )
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    loader.close()
+    return len(docs) / elapsed, cpu / len(docs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--port", type=int, default=50551)
+    args = parser.parse_args()
+
+    docs = _docs(args.vectors, args.dim)
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'transport':<10}{'vectors/sec':>14}{'CPU us/vector':>16}")
+    for transport, serve in zip(TRANSPORTS, (_serve_rest, _serve_grpc)):
+        ready = ctx.Event()
+        server = ctx.Process(target=serve, args=(args.port, ready), daemon=True)
+        server.start()
+        ready.wait()
+        try:
+            vectors_per_sec, cpu_per_vector = _run(transport, args.port, docs, args.dim)
+        finally:
+            server.terminate()
+            server.join()
+        print(f"{transport:<10}{vectors_per_sec:>14.0f}{cpu_per_vector * 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
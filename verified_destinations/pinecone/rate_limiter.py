@@ -0,0 +1,82 @@
+import time
+import threading
+from typing import Any, Callable, Optional
+from pinecone import PineconeApiException, PineconeException
+from dat_core.loggers import logger
+
+
+def error_code(e: Exception) -> Optional[str]:
+    """
+    HTTP status of a REST error, or the status code name of a gRPC error,
+    which the gRPC client wraps in a plain PineconeException.
+    """
+    if isinstance(e, PineconeApiException):
+        return str(e.status)
+    cause = e.__cause__
+    if isinstance(e, PineconeException) and cause is not None and hasattr(cause, "code"):
+        return cause.code().name
+    return None
+
+
+def is_rate_limited(e: Exception) -> bool:
+    return error_code(e) in ("429", "RESOURCE_EXHAUSTED")
+
+
+class AdaptiveRateLimiter:
+    """
+    Paces requests to the Pinecone data plane, tuning the rate with AIMD:
+    every successful request raises it by about `increase` requests/s per
+    second, every rate-limited (429) request multiplies it by `decrease`.
+    Safe to share between threads.
+    """
+
+    def __init__(self, rate: float = 10.0, min_rate: float = 0.5, max_rate: float = 200.0,
+                 increase: float = 1.0, decrease: float = 0.5, max_retries: int = 8,
+                 is_throttled: Callable[[Exception], bool] = is_rate_limited):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.is_throttled = is_throttled
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            # Push the next slot out so that in-flight callers back off too
+            self._next_slot = max(self._next_slot, time.monotonic() + 1 / self.rate)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call fn once the limiter allows it, retrying rate-limited calls up
+        to max_retries times at the reduced rate.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not self.is_throttled(e) or attempt == self.max_retries:
+                    raise
+                self.on_throttle()
+                logger.debug(f"Rate limited by Pinecone, slowing down to {self.rate:.1f} requests/s")
+                continue
+            self.on_success()
+            return result
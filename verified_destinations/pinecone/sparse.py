@@ -0,0 +1,120 @@
+from itertools import chain
+from collections.abc import Mapping, Sized
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Pinecone sparse indices are unsigned 32-bit integers
+MAX_SPARSE_INDEX = 2 ** 32 - 1
+
+
+def _is_array(value: Any) -> bool:
+    # Lists, tuples and numpy arrays; strings and mappings are sized but not vectors
+    return isinstance(value, Sized) and not isinstance(value, (str, bytes, Mapping))
+
+
+class SparseVectors:
+    """
+    Sparse vectors of a batch of chunks in CSR layout: the indices and
+    values of every chunk concatenated into one uint32 and one float64
+    array, with offsets[i]:offsets[i + 1] delimiting chunk i. Validation
+    runs on the whole arrays at once, and they are turned back into
+    Python lists once per batch, when the rows are built.
+    """
+
+    def __init__(self, indices: np.ndarray, values: np.ndarray, offsets: np.ndarray,
+                 errors: Optional[Dict[int, str]] = None):
+        self.indices = indices
+        self.values = values
+        self.offsets = offsets
+        # Why each invalid vector was left empty, by position in the batch
+        self.errors = errors or {}
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def rows(self) -> List[Optional[Tuple[List[int], List[float]]]]:
+        """
+        The indices and values of every chunk, or None for chunks without
+        sparse values and invalid ones.
+        """
+        indices, values, offsets = self.indices.tolist(), self.values.tolist(), self.offsets.tolist()
+        return [(indices[start:end], values[start:end]) if start != end else None
+                for start, end in zip(offsets, offsets[1:])]
+
+    @classmethod
+    def encode(cls, sparse_values: List[Optional[Mapping]], ids: Sequence[str]) -> "SparseVectors":
+        """
+        Encode and validate the sparse vectors of a batch, each a mapping of
+        "indices" and "values" lists or None. Invalid vectors, with indices
+        or values that are not lists, mismatched lengths, non-numeric
+        entries, an index outside uint32, a repeated index or a non-finite
+        value, are left empty and the reason is recorded in errors under
+        their position.
+        """
+        errors: Dict[int, str] = {}
+        lengths = np.zeros(len(sparse_values), dtype=np.int64)
+        part_rows, index_parts, value_parts = [], [], []
+        for i, sparse in enumerate(sparse_values):
+            if not sparse:
+                continue
+            if not isinstance(sparse, Mapping) or "indices" not in sparse or "values" not in sparse:
+                errors[i] = f"Sparse values of vector {ids[i]} must be a mapping of indices and values"
+                continue
+            indices, values = sparse["indices"], sparse["values"]
+            if not (_is_array(indices) and _is_array(values)):
+                errors[i] = f"Sparse values of vector {ids[i]} must hold lists of indices and values"
+                continue
+            if len(indices) != len(values):
+                errors[i] = (f"Sparse values of vector {ids[i]} have {len(indices)} indices "
+                             f"but {len(values)} values")
+                continue
+            lengths[i] = len(indices)
+            part_rows.append(i)
+            index_parts.append(indices)
+            value_parts.append(values)
+        try:
+            indices, values = cls._concatenate(index_parts, value_parts, int(lengths.sum()))
+        except (TypeError, ValueError, OverflowError):
+            # Only then are the vectors converted one by one, to find the bad ones
+            for row, row_indices, row_values in zip(part_rows, index_parts, value_parts):
+                try:
+                    cls._concatenate([row_indices], [row_values], len(row_indices))
+                except (TypeError, ValueError, OverflowError) as e:
+                    errors[row] = (f"Sparse values of vector {ids[row]} must be integer indices "
+                                   f"and numeric values: {e}")
+                    lengths[row] = 0
+            kept = [k for k, row in enumerate(part_rows) if row not in errors]
+            indices, values = cls._concatenate([index_parts[k] for k in kept], [value_parts[k] for k in kept],
+                                               int(lengths.sum()))
+
+        rows = np.repeat(np.arange(len(sparse_values)), lengths)
+        invalid = (indices < 0) | (indices > MAX_SPARSE_INDEX) | ~np.isfinite(values)
+        bad_rows, first = np.unique(rows[invalid], return_index=True)
+        for row, position in zip(bad_rows.tolist(), np.flatnonzero(invalid)[first].tolist()):
+            errors.setdefault(row, f"Sparse values of vector {ids[row]} hold index "
+                                   f"{indices[position]} with value {values[position]}")
+        # Each row and index packed into one key, so that a single sort brings repeats together.
+        # Indices outside uint32 are masked, at worst adding a repeat to a row already invalid
+        keys = np.sort((rows << 32) | (indices & MAX_SPARSE_INDEX))
+        for key in keys[1:][np.diff(keys) == 0].tolist():
+            row = key >> 32
+            errors.setdefault(row, f"Sparse values of vector {ids[row]} repeat index {key & MAX_SPARSE_INDEX}")
+
+        if errors:
+            kept = ~np.isin(rows, list(errors))
+            indices, values = indices[kept], values[kept]
+            lengths[list(errors)] = 0
+        offsets = np.zeros(len(sparse_values) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(indices.astype(np.uint32), values, offsets, errors)
+
+    @staticmethod
+    def _concatenate(index_parts: List[Sequence], value_parts: List[Sequence],
+                     total: int) -> Tuple[np.ndarray, np.ndarray]:
+        return (np.fromiter(chain.from_iterable(index_parts), dtype=np.int64, count=total),
+                np.fromiter(chain.from_iterable(value_parts), dtype=np.float64, count=total))
+
+    @staticmethod
+    def payload_bytes(sparse: Any, float_bytes: int) -> int:
+        # Up to 10 digits and a comma per index, plus the value and its comma
+        return len(sparse.indices) * (12 + float_bytes)
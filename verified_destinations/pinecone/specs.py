@@ -25,6 +25,52 @@ class ConnectionSpecificationModel(ConnectionSpecification):
     embedding_dimensions: int = Field(
         ..., description='Number of dimensions for the embeddings'
     )
+    id_strategy: Literal['random', 'deterministic'] = Field(
+        'random',
+        description=('random gives every chunk a new id; deterministic derives it from '
+                     'dat_record_id and the chunk\'s text, so re-sent chunks overwrite '
+                     'themselves and REPLACE streams only delete the rows a sync did not '
+                     'write, after the sync'),
+        title='ID Strategy'
+    )
+    transport: Literal['rest', 'grpc'] = Field(
+        'rest',
+        description=('Protocol of data-plane requests. grpc sends vectors as packed floats and '
+                     'requires the pinecone-client[grpc] extra'),
+        title='Transport'
+    )
+    metadata_overflow: Literal['truncate', 'drop_fields', 'reject'] = Field(
+        'truncate',
+        description=('What to do with a chunk whose metadata exceeds Pinecone\'s 40KB limit: '
+                     'truncate dat_document_chunk, drop the largest other fields, or skip the '
+                     'chunk. Chunks that still do not fit are skipped'),
+        title='Metadata Overflow'
+    )
+    sparse_vector_field: Optional[str] = Field(
+        None,
+        description=('Metadata field holding each chunk\'s sparse vector, e.g. BM25 weights, as '
+                     '{"indices": [...], "values": [...]}, upserted next to the dense vector. '
+                     'Requires an index with the dotproduct metric'),
+        title='Sparse Vector Field'
+    )
+    upsert_batch_size: int = Field(
+        100, description='Maximum number of vectors sent in a single upsert request',
+        title='Upsert Batch Size', gt=0, le=1000
+    )
+    upsert_batch_bytes: int = Field(
+        2 * 1000 * 1000,  # Pinecone rejects upsert requests over 2MB
+        description='Maximum estimated payload size (bytes) of a single upsert request',
+        title='Upsert Batch Bytes', gt=0, le=2 * 1024 * 1024
+    )
+    max_upsert_concurrency: int = Field(
+        16, description=('Upper bound of the number of upsert requests in flight at once; the '
+                         'actual number adapts to latency and rate limiting'),
+        title='Max Upsert Concurrency', gt=0
+    )
+    delete_concurrency: int = Field(
+        4, description='Maximum number of delete requests in flight at once when deleting by id',
+        title='Delete Concurrency', gt=0
+    )
 
 
 class PineconeSpecification(BaseModel):
@@ -18,6 +18,16 @@ def valid_connection_object(request):
     }
 
 
+@pytest.fixture(scope="class")
+def offline_connection_object(request):
+    yield {
+        "pinecone_index": "pytest-index",
+        "pinecone_environment": "us-east-1",
+        "pinecone_api_key": "pytest-api-key",
+        "embedding_dimensions": 4,
+    }
+
+
 @pytest.fixture(scope="class")
 def conf_catalog(request):
     conf_catalog = DatCatalog(
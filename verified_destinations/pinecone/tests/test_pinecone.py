@@ -1,4 +1,10 @@
+import json
+import pytest
 from typing import List
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from pinecone import PineconeApiException, PineconeException
+from pinecone.data.vector_factory import VectorFactory
 from dat_core.pydantic_models import (
     DatMessage, DatDocumentMessage,
     Data, DatStateMessage,
@@ -10,6 +16,11 @@ from dat_core.pydantic_models import (
 )
 from verified_destinations.pinecone.destination import Pinecone
 from verified_destinations.pinecone.specs import PineconeSpecification
+from verified_destinations.pinecone.loader import PineconeLoader
+from verified_destinations.pinecone.metadata import MetadataNormalizer
+from verified_destinations.pinecone.rate_limiter import AdaptiveRateLimiter, error_code, is_rate_limited
+from verified_destinations.pinecone.sparse import SparseVectors
+from verified_destinations.pinecone.upsert_scheduler import UpsertScheduler, is_congestion
 
 
 class TestPinecone:
@@ -25,6 +36,277 @@ class TestPinecone:
         assert isinstance(check_connection_tpl, DatConnectionStatus)
         assert check_connection_tpl.status.name == 'SUCCEEDED'
 
+    def test_serverless_delete(self, offline_connection_object):
+        """
+        GIVEN a serverless index
+        WHEN the vectors of a whole stream are deleted
+        THEN ids are listed by stream prefix, then by query, and each id is deleted once
+        """
+        loader = PineconeLoader(PineconeSpecification(
+            name='Pinecone',
+            connection_specification=offline_connection_object,
+            module_name='pinecone',
+        ), 4)
+        loader.pine = MagicMock()
+        loader.pine.describe_index.return_value.get.return_value = {"serverless": {}}
+        index = loader.pine.Index.return_value
+        index.list_paginated.side_effect = [
+            SimpleNamespace(vectors=[SimpleNamespace(id="PDF#1"), SimpleNamespace(id="PDF#2")],
+                            pagination=SimpleNamespace(next="token")),
+            SimpleNamespace(vectors=[SimpleNamespace(id="PDF#3")], pagination=None),
+        ]
+        # A lagging query still returns a listed id next to one written before ids were prefixed
+        index.query.side_effect = [
+            SimpleNamespace(matches=[SimpleNamespace(id="PDF#3"), SimpleNamespace(id="legacy")]),
+            SimpleNamespace(matches=[]),
+        ]
+
+        deleted = loader.delete(filter=loader.prepare_metadata_filter({"dat_stream": "PDF"}),
+                                namespace="pytest_namespace")
+        assert deleted == 4
+        assert index.list_paginated.call_args.kwargs["pagination_token"] == "token"
+        deleted_ids = sorted(id for call in index.delete.call_args_list for id in call.kwargs["ids"])
+        assert deleted_ids == ["PDF#1", "PDF#2", "PDF#3", "legacy"]
+
+    def test_lagging_delete(self, offline_connection_object):
+        """
+        GIVEN a serverless index whose queries keep returning a deleted vector
+        WHEN the vectors of a run-filtered stream are deleted
+        THEN the vector is deleted again after each round of stale queries, and the delete fails
+        """
+        loader = PineconeLoader(PineconeSpecification(
+            name='Pinecone',
+            connection_specification=offline_connection_object,
+            module_name='pinecone',
+        ), 4)
+        loader.pine = MagicMock()
+        loader.pine.describe_index.return_value.get.return_value = {"serverless": {}}
+        index = loader.pine.Index.return_value
+        index.query.return_value = SimpleNamespace(matches=[SimpleNamespace(id="PDF#1")])
+
+        with patch("verified_destinations.pinecone.loader.time.sleep"), pytest.raises(RuntimeError):
+            loader.delete(filter=loader.prepare_metadata_filter({"dat_stream": "PDF", "dat_run_id": "run-2"}),
+                          namespace="pytest_namespace")
+        index.list_paginated.assert_not_called()
+        # One query, then six stale queries before each of the three deletes again and the failure
+        assert index.query.call_count == 1 + 4 * 7
+        # The last delete may be cancelled by the failure
+        assert index.delete.call_count >= 3
+
+    def test_stream_prefixes(self, offline_connection_object):
+        """
+        GIVEN a serverless index holding streams PDF and PDF#x
+        WHEN the vectors of stream PDF are deleted, and queries return one of them twice
+        THEN PDF#x ids are neither prefixed nor listed, and each deleted vector is counted once
+        """
+        loader = PineconeLoader(PineconeSpecification(
+            name='Pinecone',
+            connection_specification=offline_connection_object,
+            module_name='pinecone',
+        ), 4)
+        assert loader._id_prefix("PDF#x") is None
+        loader.pine = MagicMock()
+        loader.pine.describe_index.return_value.get.return_value = {"serverless": {}}
+        index = loader.pine.Index.return_value
+        # PDF#x#2 was written before streams holding the separator went unprefixed
+        index.list_paginated.return_value = SimpleNamespace(
+            vectors=[SimpleNamespace(id="PDF#1"), SimpleNamespace(id="PDF#x#2")], pagination=None)
+        index.query.side_effect = [SimpleNamespace(matches=[SimpleNamespace(id="PDF#1")])] * 7 + [
+            SimpleNamespace(matches=[])]
+
+        with patch("verified_destinations.pinecone.loader.time.sleep"):
+            deleted = loader.delete(filter=loader.prepare_metadata_filter({"dat_stream": "PDF"}),
+                                    namespace="pytest_namespace")
+        assert deleted == 1
+        assert [call.kwargs["ids"] for call in index.delete.call_args_list] == [["PDF#1"], ["PDF#1"]]
+        assert loader.stats["redeleted_vectors"] == 1
+
+    def test_index_cache(self, offline_connection_object):
+        """
+        GIVEN a loader
+        WHEN several deletes run against the index
+        THEN the index is described and its handle created only once, until refreshed
+        """
+        loader = PineconeLoader(PineconeSpecification(
+            name='Pinecone',
+            connection_specification=offline_connection_object,
+            module_name='pinecone',
+        ), 4)
+        loader.pine = MagicMock()
+        description = loader.pine.describe_index.return_value
+        description.host = "pytest-index.svc.pinecone.io"
+        description.get.return_value = {"pod": {}}
+        index = loader.pine.Index.return_value
+        index.describe_index_stats.return_value = SimpleNamespace(
+            namespaces={"pytest_namespace": SimpleNamespace(vector_count=5)})
+        for _ in range(3):
+            assert loader.delete(filter={"dat_stream": {"$eq": "PDF"}}, namespace="pytest_namespace") == 5
+        assert loader.stats["control_plane_calls"] == 1
+        loader.pine.Index.assert_called_once_with(name="pytest-index", host="pytest-index.svc.pinecone.io")
+        assert index.delete.call_count == 3
+        assert loader.stats["deleted_vectors"] == 15
+
+        loader.refresh_index_cache()
+        assert loader.capacity_mode == "pod"
+        assert loader.stats["control_plane_calls"] == 2
+
+    def test_rate_limiter_backs_off(self):
+        """
+        GIVEN an adaptive rate limiter
+        WHEN a call is rate limited twice before succeeding
+        THEN it is retried and the rate is cut on each 429
+        """
+        limiter = AdaptiveRateLimiter(rate=1000.0, min_rate=1.0, decrease=0.5)
+        fn = MagicMock(side_effect=[PineconeApiException(status=429), PineconeApiException(status=429), "ok"])
+        assert limiter.call(fn) == "ok"
+        assert fn.call_count == 3
+        assert limiter.throttled == 2
+        assert limiter.rate < 300.0
+
+        fn = MagicMock(side_effect=PineconeApiException(status=400))
+        with pytest.raises(PineconeApiException):
+            limiter.call(fn)
+        assert fn.call_count == 1
+
+    def test_grpc_error_codes(self):
+        """
+        GIVEN errors raised by the REST and the gRPC clients
+        WHEN they are classified
+        THEN gRPC status codes are read from the wrapped RpcError
+        """
+        def grpc_error(code: str) -> PineconeException:
+            rpc_error = Exception(code)
+            rpc_error.code = lambda: SimpleNamespace(name=code)
+            error = PineconeException(f"gRPC call failed: {code}")
+            error.__cause__ = rpc_error
+            return error
+
+        assert error_code(PineconeApiException(status=429)) == "429"
+        assert error_code(grpc_error("RESOURCE_EXHAUSTED")) == "RESOURCE_EXHAUSTED"
+        assert error_code(ValueError("boom")) is None
+        assert is_rate_limited(grpc_error("RESOURCE_EXHAUSTED"))
+        assert is_congestion(grpc_error("UNAVAILABLE"))
+        assert is_congestion(PineconeApiException(status=503))
+        assert not is_congestion(grpc_error("INVALID_ARGUMENT"))
+        assert not is_congestion(PineconeApiException(status=400))
+
+    def test_metadata_normalizer(self):
+        """
+        GIVEN metadata with unsupported values and non-ASCII text
+        WHEN it is normalized under a 200 byte limit with each overflow mode
+        THEN it is sized exactly as compact UTF-8 JSON and fitted or skipped
+        """
+        metadata = {
+            "dat_stream": "PDF", "dat_run_id": "run-1", "page": 3, "score": 0.5, "ok": True,
+            "tags": ["a", "\"b\""], "mixed": ["a", 1], "nested": {"a": 1}, "missing": None,
+            "dat_document_chunk": "é" * 100,
+        }
+
+        def json_bytes(value):
+            return len(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+        normalizer = MetadataNormalizer(limit=1024)
+        normalized = normalizer.normalize(metadata, "PDF")
+        assert set(normalized) == {"dat_stream", "dat_run_id", "page", "score", "ok", "tags",
+                                   "dat_document_chunk"}
+        size = json_bytes(normalized)
+        assert MetadataNormalizer(overflow="reject", limit=size).normalize(metadata, "PDF") is not None
+        assert MetadataNormalizer(overflow="reject", limit=size - 1).normalize(metadata, "PDF") is None
+
+        truncated = MetadataNormalizer(overflow="truncate", limit=200).normalize(metadata, "PDF")
+        assert 190 < json_bytes(truncated) <= 200
+
+        normalizer = MetadataNormalizer(overflow="drop_fields", limit=200,
+                                        keep=("dat_stream", "dat_run_id"))
+        dropped = normalizer.normalize(metadata, "PDF")
+        assert "dat_document_chunk" not in dropped and "dat_stream" in dropped
+        assert normalizer.stats["dropped_metadata_fields"] == 1
+
+        normalizer = MetadataNormalizer(overflow="reject", limit=200)
+        assert normalizer.normalize(metadata, "PDF") is None
+        assert normalizer.stats["rejected_vectors"] == 1
+
+    def test_sparse_vectors(self, offline_connection_object):
+        """
+        GIVEN a batch of vectors, some with sparse values
+        WHEN their sparse values are encoded
+        THEN they are upserted as the client's SparseValues, and vectors with invalid ones are skipped
+        """
+        loader = PineconeLoader(PineconeSpecification(
+            name='Pinecone',
+            connection_specification={**offline_connection_object, "sparse_vector_field": "bm25"},
+            module_name='pinecone',
+        ), 4)
+        docs = [(f"PDF#{i}", [0.1] * 4, {"dat_stream": "PDF"}) for i in range(3)]
+        sparse_values = [{"indices": [7, 2], "values": [0.5, 0.25]}, None,
+                         {"indices": [1], "values": [1.0]}]
+        hybrid_docs = loader._with_sparse_values(docs, sparse_values)
+        assert hybrid_docs[1] == docs[1]
+        assert hybrid_docs[2]["sparse_values"].values == [1.0]
+        vector = VectorFactory.build(dict(hybrid_docs[0]))
+        assert vector.sparse_values.indices == [7, 2]
+        assert vector.sparse_values.values == [0.5, 0.25]
+
+        invalid = [{"indices": [1, 1], "values": [0.5, 0.5]},
+                   {"indices": [-1], "values": [0.5]},
+                   {"indices": [1], "values": [float("nan")]},
+                   {"indices": [1, 2], "values": [0.5]},
+                   {"indices": [1], "values": ["high"]},
+                   {"indices": 1, "values": 0.5},
+                   {"indices": "12", "values": [0.5, 0.5]},
+                   {"indices": None, "values": None}]
+        sparse_vectors = SparseVectors.encode([sparse_values[0], *invalid],
+                                              [f"PDF#{i}" for i in range(len(invalid) + 1)])
+        assert sorted(sparse_vectors.errors) == [1, 2, 3, 4, 5, 6, 7, 8]
+        assert all(f"PDF#{i}" in message for i, message in sparse_vectors.errors.items())
+        assert sparse_vectors.indices.tolist() == [7, 2]
+
+        docs = [(f"PDF#{i}", [0.1] * 4, {"dat_stream": "PDF"}) for i in range(3)]
+        hybrid_docs = loader._with_sparse_values(docs, [sparse_values[0], invalid[0], None])
+        assert [doc["id"] if isinstance(doc, dict) else doc[0] for doc in hybrid_docs] == ["PDF#0", "PDF#2"]
+        assert loader.stats["rejected_sparse_vectors"] == 1
+
+    def test_upsert_batches(self, offline_connection_object):
+        """
+        GIVEN a 1KB upsert payload limit
+        WHEN vectors with 300 byte metadata are batched
+        THEN every batch stays under the limit
+        """
+        loader = PineconeLoader(PineconeSpecification(
+            name='Pinecone',
+            connection_specification={**offline_connection_object, "upsert_batch_bytes": 1024},
+            module_name='pinecone',
+        ), 4)
+        docs = [(f"PDF#{i}", [0.1] * 4, {"dat_document_chunk": "x" * 300}) for i in range(10)]
+        batches = list(loader._upsert_batches(docs))
+        assert [len(batch) for batch, _ in batches] == [2, 2, 2, 2, 2]
+        assert all(batch_bytes <= 1024 for _, batch_bytes in batches)
+
+    def test_upsert_scheduler(self):
+        """
+        GIVEN an upsert scheduler with a window of 4
+        WHEN one request is rate limited
+        THEN its batch is retried, the window is halved and every batch is sent
+        """
+        scheduler = UpsertScheduler(initial_window=4, max_window=8)
+        sent = []
+        windows = []
+
+        def send(batch):
+            if batch == [3]:
+                windows.append(scheduler.window)
+                if len(windows) == 1:
+                    raise PineconeApiException(status=429)
+            sent.append(batch)
+
+        scheduler.run((([i], 10) for i in range(8)), send)
+        scheduler.close()
+        assert sorted(sent) == [[i] for i in range(8)]
+        assert scheduler.stats["upsert_retries"] == 1
+        assert scheduler.stats["upserted_vectors"] == 8
+        window_when_throttled, window_when_retried = windows
+        assert window_when_retried < window_when_throttled
+
     def test_write(self, valid_connection_object, conf_catalog, records):
         """
         GIVEN a valid connectionSpecification JSON config
@@ -0,0 +1,154 @@
+import time
+import statistics
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+from dat_core.loggers import logger
+from verified_destinations.pinecone.rate_limiter import error_code
+
+CONGESTION_CODES = {"429", "RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED"}
+
+
+def is_congestion(e: Exception) -> bool:
+    # Rate limiting and server-side overload, over REST or gRPC; anything else is a real error
+    code = error_code(e)
+    return code is not None and (code in CONGESTION_CODES or code.startswith("5"))
+
+
+class UpsertScheduler:
+    """
+    Sliding-window upsert scheduler: keeps up to `window` requests in flight
+    and sends the next batch as soon as any request completes, so that one
+    slow request does not stall the others.
+
+    The window is tuned with AIMD. It grows by one per window's worth of
+    completed requests, and is cut when a request is rate limited or fails
+    with a 5xx (halved; the batch is retried) or takes longer than
+    latency_target (by a quarter). Cuts happen at most once per window's
+    worth of completions, since one overload episode is reported by every
+    request in flight.
+    """
+
+    def __init__(self, initial_window: int = 4, max_window: int = 16, latency_target: float = 2.0,
+                 max_retries: int = 8, metrics_interval: float = 10.0,
+                 stats: Optional[Counter] = None):
+        self.window = float(initial_window)
+        self.max_window = max_window
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.metrics_interval = metrics_interval
+        self.stats = stats if stats is not None else Counter()
+        self._executor = None
+        # Let the very first congestion signal cut the window
+        self._completions_since_cut = initial_window
+        self._reset_metrics_window()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_window,
+                                                thread_name_prefix="pinecone-upsert")
+        return self._executor
+
+    def run(self, batches: Iterable[Tuple[List[Any], int]], send: Callable[[List[Any]], Any]) -> None:
+        """
+        Send every (batch, payload_bytes) of batches with send, returning
+        once all of them are acknowledged. Raises the first error that is
+        not congestion, or congestion that outlasted max_retries.
+        """
+        # Time between runs is spent upstream, not upserting
+        self._reset_metrics_window()
+        batches = iter(batches)
+        retries = deque()
+        in_flight = {}
+        exhausted = False
+        try:
+            while True:
+                while len(in_flight) < int(self.window):
+                    if retries:
+                        item = retries.popleft()
+                    elif not exhausted:
+                        try:
+                            batch, payload_bytes = next(batches)
+                        except StopIteration:
+                            exhausted = True
+                            continue
+                        item = (batch, payload_bytes, 0)
+                    else:
+                        break
+                    in_flight[self.executor.submit(self._send, send, item[0], item[2])] = item
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch, payload_bytes, attempt = in_flight.pop(future)
+                    try:
+                        latency = future.result()
+                    except Exception as e:
+                        if not is_congestion(e) or attempt >= self.max_retries:
+                            raise
+                        self.stats["upsert_retries"] += 1
+                        self._window_retries += 1
+                        self._cut(0.5, f"{error_code(e)} response")
+                        retries.append((batch, payload_bytes, attempt + 1))
+                        continue
+                    self._on_success(len(batch), payload_bytes, latency)
+                self._maybe_emit_metrics()
+        except Exception:
+            for future in in_flight:
+                future.cancel()
+            raise
+        self._maybe_emit_metrics(force=True)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @staticmethod
+    def _send(send: Callable[[List[Any]], Any], batch: List[Any], attempt: int) -> float:
+        if attempt:
+            time.sleep(min(0.25 * 2 ** attempt, 10))
+        start = time.perf_counter()
+        send(batch)
+        return time.perf_counter() - start
+
+    def _on_success(self, vectors: int, payload_bytes: int, latency: float) -> None:
+        self._completions_since_cut += 1
+        self.stats["upsert_requests"] += 1
+        self.stats["upserted_vectors"] += vectors
+        self.stats["upsert_bytes"] += payload_bytes
+        self._window_vectors += vectors
+        self._window_bytes += payload_bytes
+        self._window_latencies.append(latency)
+        if latency > self.latency_target:
+            self._cut(0.75, f"{latency:.1f}s latency")
+        else:
+            self.window = min(self.max_window, self.window + 1 / self.window)
+
+    def _cut(self, factor: float, reason: str) -> None:
+        if self._completions_since_cut < int(self.window):
+            return
+        self._completions_since_cut = 0
+        self.window = max(1.0, self.window * factor)
+        logger.debug(f"Upsert window cut to {self.window:.1f} after a {reason}")
+
+    def _reset_metrics_window(self) -> None:
+        self._window_start = time.perf_counter()
+        self._window_vectors = 0
+        self._window_bytes = 0
+        self._window_retries = 0
+        self._window_latencies = []
+
+    def _maybe_emit_metrics(self, force: bool = False) -> None:
+        elapsed = time.perf_counter() - self._window_start
+        if not self._window_latencies or (elapsed < self.metrics_interval and not force):
+            return
+        logger.info(f"Upserted {self._window_vectors} vectors in {elapsed:.1f}s: "
+                    f"{self._window_vectors / elapsed:.0f} vectors/s, "
+                    f"{self._window_bytes / elapsed / 1024 / 1024:.2f} MB/s, "
+                    f"window {self.window:.1f}, "
+                    f"p50 latency {statistics.median(self._window_latencies) * 1000:.0f}ms, "
+                    f"max latency {max(self._window_latencies) * 1000:.0f}ms, "
+                    f"{self._window_retries} retries")
+        self._reset_metrics_window()
@@ -27,4 +27,8 @@ class Qdrant(DestinationBase):
     def write(self, config: Mapping[str, Any], configured_catalog: DatCatalog, input_messages: Iterable[DatMessage]) -> Iterable[DatMessage]:
         self._init_loader(config)
         processor = DataProcessor(config, self.loader, BATCH_SIZE)
-        yield from processor.processor(configured_catalog, input_messages)
+        try:
+            yield from processor.processor(configured_catalog, input_messages)
+            self.loader.finish_sync()
+        finally:
+            self.loader.close()
@@ -1,7 +1,14 @@
-import uuid
+import hashlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from itertools import islice
+import grpc
+import httpx
 from qdrant_client import QdrantClient, models
+from qdrant_client.http.exceptions import ResponseHandlingException
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny, MatchExcept
-from typing import Any, List, Optional, Dict
+from typing import Any, Iterator, List, Optional, Dict, Tuple
 from dat_core.connectors.destinations.loader import Loader
 from qdrant_client.models import VectorParams, Distance
 from dat_core.pydantic_models import (
@@ -9,6 +16,30 @@ from dat_core.pydantic_models import (
     WriteSyncMode, StreamMetadata
 )
 from dat_core.loggers import logger
+from verified_destinations.record_ids import ChunkIdGenerator
+
+UPLOAD_MAX_RETRIES = 3
+# gRPC statuses of upserts that did not reach Qdrant or timed out, and may succeed when retried
+RETRYABLE_GRPC_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+# Qdrant's defaults, restored after a bulk load when neither the spec nor the
+# collection holds a setting to go back to
+DEFAULT_INDEXING_THRESHOLD = 20000
+DEFAULT_HNSW_M = 16
+GREEN_POLL_INTERVAL = 1
+
+# dat_* fields the REPLACE filters are built on, given keyword payload indexes
+PAYLOAD_INDEX_FIELDS = ("dat_stream", "dat_run_id", "dat_record_id")
+
+# Payload field holding the namespace in the payload namespace mode
+NAMESPACE_FIELD = "dat_namespace"
+# is_tenant lays every namespace's points out together; clients before 1.11
+# do not know it and get a plain keyword index
+NAMESPACE_INDEX_SCHEMA = (models.KeywordIndexParams(type="keyword", is_tenant=True)
+                          if hasattr(models, "KeywordIndexParams") else models.PayloadSchemaType.KEYWORD)
+
+# Hex digits of the namespace hash added to collection names rewritten in the collection mode
+NAMESPACE_HASH_LENGTH = 8
 
 DISTANCE_MAP = {
     "dot": Distance.DOT,
@@ -16,33 +47,186 @@ DISTANCE_MAP = {
     "euc": Distance.EUCLID,
 }
 
+QUANTIZATION_NAMES = {
+    models.ScalarQuantization: "scalar",
+    models.ProductQuantization: "product",
+    models.BinaryQuantization: "binary",
+}
+
 
 class QdrantLoader(Loader):
     def __init__(self, config: Any, embedding_dimensions: int):
         super().__init__(config)
         self.embedding_dimensions = int(embedding_dimensions)
+        self.ids = ChunkIdGenerator(config.connection_specification.id_strategy)
+        # REPLACE streams whose stale points are deleted after the sync, keyed by stream name
+        self._deferred_replace: Dict[str, Optional[str]] = {}
+        # Collections known to exist with the configured dimensions and payload indexes
+        self._known_collections = set()
+        # Index settings to restore after a bulk load, keyed by collection name
+        self._bulk_restore: Dict[str, Dict[str, Any]] = {}
+        self._executor = None
         self._create_client()
 
     def load(self, document_chunks: List[DatDocumentMessage], namespace: str, stream: str) -> None:
-        points = []
+        collection_name = self._collection_name(namespace)
+        if self._uses_collection_per_namespace:
+            self._create_or_use_collection(collection_name)
+        self._upload(collection_name, self._points(document_chunks, namespace))
+
+    def _points(self, document_chunks: List[DatDocumentMessage], namespace: str) -> Iterator[models.PointStruct]:
+        # Produced lazily, so only the batches being uploaded are ever held as points.
+        # The chunk's vector is already a validated list of floats: model_construct
+        # skips re-validating it, which would copy every vector
         for document_chunk in document_chunks:
             metadata = document_chunk.data.metadata.model_dump()
-            chunk = document_chunk.data.vectors
-            points.append(
-                models.PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector=chunk,
-                    payload=metadata
-                )
+            if self._uses_payload_namespace:
+                metadata[NAMESPACE_FIELD] = namespace
+            yield models.PointStruct.model_construct(
+                id=self.ids.next_id(metadata, namespace),
+                vector=document_chunk.data.vectors,
+                payload=metadata
             )
-        self._client.upload_points(
-            collection_name=self.config.connection_specification.collection_name,
-            points=points
-        )
+
+    def _upload(self, collection_name: str, points: Iterator[models.PointStruct]) -> None:
+        batch_size = self.config.connection_specification.upload_batch_size
+        parallel = self.config.connection_specification.parallel
+        if parallel == 1:
+            self._client.upload_points(collection_name=collection_name, points=points,
+                                       batch_size=batch_size)
+            return
+        # upload_points(parallel=N) starts N worker processes, each with its own client,
+        # on every call, which costs more than uploading a whole load; threads kept for
+        # the sync send the batches over the loader's client instead
+        in_flight = set()
+        try:
+            for batch in iter(lambda: list(islice(points, batch_size)), []):
+                if len(in_flight) >= parallel:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(self.executor.submit(self._upsert_batch, collection_name, batch))
+            for future in as_completed(in_flight):
+                future.result()
+        except Exception:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    def _upsert_batch(self, collection_name: str, points: List[models.PointStruct]) -> None:
+        # Only connection failures and timeouts are retried, with a growing wait; an
+        # upsert Qdrant rejected fails the same way again. Upserts are idempotent by
+        # point id, so a timed out one that was applied after all is harmless to resend
+        for attempt in range(UPLOAD_MAX_RETRIES):
+            if attempt:
+                time.sleep(min(0.5 * 2 ** attempt, 10))
+            try:
+                self._client.upsert(collection_name=collection_name, points=points, wait=False)
+                return
+            except Exception as e:
+                if attempt == UPLOAD_MAX_RETRIES - 1 or not self._is_transient(e):
+                    raise
+                logger.warning(f"Upload of {len(points)} points failed {attempt + 1} times, retrying: {e}")
+
+    @staticmethod
+    def _is_transient(e: Exception) -> bool:
+        # The REST client wraps httpx's connection and timeout errors in ResponseHandlingException
+        if isinstance(e, ResponseHandlingException):
+            return isinstance(e.source, httpx.TransportError)
+        return isinstance(e, grpc.RpcError) and e.code() in RETRYABLE_GRPC_CODES
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.config.connection_specification.parallel,
+                                                thread_name_prefix="qdrant-upload")
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._bulk_restore:
+            # The sync did not get to finish_sync()
+            logger.warning(f"Restoring the index settings of {list(self._bulk_restore)} after an unfinished bulk load")
+            try:
+                self._end_bulk_load(wait_for_green=None)
+            except Exception as e:
+                logger.error(f"Could not restore the index settings of {list(self._bulk_restore)}: {e}")
+
+    def _begin_bulk_load(self, collection_name: str) -> None:
+        """
+        Stop the collection from building its HNSW index while the sync
+        writes, remembering the setting to restore: the configured one, else
+        the collection's own, else Qdrant's default. The collection's is
+        not taken when it is 0, as a sync killed before close() leaves it.
+        """
+        self._create_or_use_collection(collection_name)
+        spec = self.config.connection_specification
+        config = self._client.get_collection(collection_name=collection_name).config
+        if spec.bulk_load == "indexing_threshold":
+            restore = spec.indexing_threshold
+            if restore is None:
+                restore = config.optimizer_config.indexing_threshold or DEFAULT_INDEXING_THRESHOLD
+            self._bulk_restore[collection_name] = {"optimizers_config": models.OptimizersConfigDiff(
+                indexing_threshold=restore)}
+            bulk_config = {"optimizers_config": models.OptimizersConfigDiff(indexing_threshold=0)}
+        else:
+            restore = spec.hnsw_m
+            if restore is None:
+                restore = config.hnsw_config.m or DEFAULT_HNSW_M
+            self._bulk_restore[collection_name] = {"hnsw_config": models.HnswConfigDiff(m=restore)}
+            bulk_config = {"hnsw_config": models.HnswConfigDiff(m=0)}
+        logger.info(f"Deferring indexing of collection {collection_name} until the end of the sync")
+        self._client.update_collection(collection_name=collection_name, **bulk_config)
+
+    def _restore_stale_bulk_load(self, collection_name: str, config: models.CollectionConfig) -> bool:
+        """
+        Restore the index setting a sync killed during a bulk load left at
+        0, which would otherwise be reported as drift and never indexed:
+        the configured one, else Qdrant's default. A 0 the specification
+        asks for is kept. Returns whether the collection was updated.
+        """
+        spec = self.config.connection_specification
+        if (spec.bulk_load == "indexing_threshold" and config.optimizer_config.indexing_threshold == 0
+                and spec.indexing_threshold != 0):
+            restore = {"optimizers_config": models.OptimizersConfigDiff(
+                indexing_threshold=spec.indexing_threshold or DEFAULT_INDEXING_THRESHOLD)}
+        elif spec.bulk_load == "hnsw_m" and config.hnsw_config.m == 0 and spec.hnsw_m != 0:
+            restore = {"hnsw_config": models.HnswConfigDiff(m=spec.hnsw_m or DEFAULT_HNSW_M)}
+        else:
+            return False
+        logger.warning(f"Collection {collection_name} was left in bulk load mode by an earlier sync, "
+                       f"restoring its index settings: {restore}")
+        self._client.update_collection(collection_name=collection_name, **restore)
+        return True
+
+    def _end_bulk_load(self, wait_for_green: Optional[int]) -> None:
+        while self._bulk_restore:
+            collection_name, restore = next(iter(self._bulk_restore.items()))
+            logger.info(f"Restoring the index settings of collection {collection_name}: {restore}")
+            self._client.update_collection(collection_name=collection_name, **restore)
+            del self._bulk_restore[collection_name]
+            if wait_for_green is not None:
+                self._wait_for_green(collection_name, wait_for_green)
+
+    def _wait_for_green(self, collection_name: str, timeout: int) -> None:
+        deadline = time.monotonic() + timeout
+        while self._client.get_collection(collection_name=collection_name).status != models.CollectionStatus.GREEN:
+            if time.monotonic() > deadline:
+                logger.warning(f"Collection {collection_name} is still indexing after {timeout}s, not waiting longer")
+                return
+            time.sleep(GREEN_POLL_INTERVAL)
+        logger.info(f"Collection {collection_name} is green")
 
     def delete(self, filter, namespace=None):
+        collection_name = self._collection_name(namespace)
+        if (self._uses_collection_per_namespace and collection_name not in self._known_collections
+                and not self._client.collection_exists(collection_name)):
+            logger.info(f"Collection {collection_name} does not exist, nothing to delete")
+            return
         self._client.delete(
-            collection_name=self.config.connection_specification.collection_name,
+            collection_name=collection_name,
             points_selector=models.FilterSelector(
                 filter=filter
             ),
@@ -54,43 +238,181 @@ class QdrantLoader(Loader):
                 return (False, "Qdrant is not alive")
             available_collections = [
                 collection.name for collection in self._client.get_collections().collections]
-            distance = DISTANCE_MAP.get(
-                self.config.connection_specification.distance.distance)
             collection_name = self.config.connection_specification.collection_name
-            if collection_name in available_collections:
-                description = self._client.get_collection(
-                    collection_name=collection_name)
-                if description.config.params.vectors.size != self.embedding_dimensions:
-                    return (False,
-                            f"Collection {collection_name} has dimension {description.config.params.size}, "
-                            f"but the configured dimension is {self.embedding_dimensions}.")
-            else:
-                self._client.create_collection(
-                    collection_name=self.config.connection_specification.collection_name,
-                    vectors_config=VectorParams(
-                        size=self.embedding_dimensions, distance=distance)
-                )
+            return self._prepare_collection(collection_name, collection_name in available_collections)
         except Exception as e:
             logger.error(f"Could not connect to Qdrant: {e}")
             raise e
+
+    def _prepare_collection(self, collection_name: str, exists: bool) -> Tuple[bool, Optional[str]]:
+        """
+        Check the dimensions and payload indexes of an existing collection,
+        or create it, and remember it as known.
+        """
+        if exists:
+            description = self._client.get_collection(
+                collection_name=collection_name)
+            if description.config.params.vectors.size != self.embedding_dimensions:
+                return (False,
+                        f"Collection {collection_name} has dimension {description.config.params.vectors.size}, "
+                        f"but the configured dimension is {self.embedding_dimensions}.")
+            if collection_name not in self._bulk_restore and self._restore_stale_bulk_load(
+                    collection_name, description.config):
+                description = self._client.get_collection(collection_name=collection_name)
+            drift = self._config_drift(description.config)
+            if drift:
+                return (False,
+                        f"Collection {collection_name} does not match the configured settings: "
+                        f"{'; '.join(drift)}")
+            self._create_payload_indexes(collection_name, description.payload_schema)
+        else:
+            logger.info(f"Creating collection {collection_name}")
+            spec = self.config.connection_specification
+            self._client.create_collection(
+                collection_name=collection_name,
+                vectors_config=VectorParams(
+                    size=self.embedding_dimensions,
+                    distance=DISTANCE_MAP.get(spec.distance.distance),
+                    on_disk=spec.on_disk),
+                hnsw_config=models.HnswConfigDiff(
+                    m=spec.hnsw_m, ef_construct=spec.hnsw_ef_construct, on_disk=spec.hnsw_on_disk),
+                optimizers_config=models.OptimizersConfigDiff(
+                    indexing_threshold=spec.indexing_threshold, memmap_threshold=spec.memmap_threshold),
+                quantization_config=self._quantization_config(),
+            )
+            self._create_payload_indexes(collection_name, {})
+        self._known_collections.add(collection_name)
         return True, None
 
+    def _quantization_config(self) -> Optional[models.QuantizationConfig]:
+        quantization = self.config.connection_specification.quantization
+        always_ram = self.config.connection_specification.quantization_always_ram
+        if quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=always_ram))
+        if quantization == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+        return None
+
+    def _config_drift(self, config: models.CollectionConfig) -> List[str]:
+        """
+        Storage and index settings of an existing collection that differ
+        from the configured ones. Optional settings left unset are not
+        compared, so they keep whatever the collection has.
+        """
+        spec = self.config.connection_specification
+        actual = {
+            "on_disk": bool(config.params.vectors.on_disk),
+            "quantization": QUANTIZATION_NAMES.get(type(config.quantization_config), "none"),
+            "hnsw_m": config.hnsw_config.m,
+            "hnsw_ef_construct": config.hnsw_config.ef_construct,
+            "hnsw_on_disk": bool(config.hnsw_config.on_disk),
+            "indexing_threshold": config.optimizer_config.indexing_threshold,
+            "memmap_threshold": config.optimizer_config.memmap_threshold,
+        }
+        return [f"{name} is {value} but {getattr(spec, name)} is configured"
+                for name, value in actual.items()
+                if getattr(spec, name) is not None and getattr(spec, name) != value]
+
+    def _create_or_use_collection(self, collection_name: str) -> None:
+        if collection_name in self._known_collections:
+            return
+        ok, message = self._prepare_collection(collection_name,
+                                               self._client.collection_exists(collection_name))
+        if not ok:
+            raise ValueError(message)
+
+    def _create_payload_indexes(self, collection_name: str, payload_schema: Dict[str, Any]) -> None:
+        # Without them every REPLACE delete scans the whole collection
+        field_schemas = {field_name: models.PayloadSchemaType.KEYWORD for field_name in PAYLOAD_INDEX_FIELDS}
+        if self._uses_payload_namespace:
+            field_schemas[NAMESPACE_FIELD] = NAMESPACE_INDEX_SCHEMA
+        for field_name, field_schema in field_schemas.items():
+            if field_name in payload_schema:
+                continue
+            logger.info(f"Creating keyword payload index on {field_name} of collection {collection_name}")
+            self._client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True,
+            )
+
+    @property
+    def _uses_payload_namespace(self) -> bool:
+        return self.config.connection_specification.namespace_mode == "payload"
+
+    @property
+    def _uses_collection_per_namespace(self) -> bool:
+        return self.config.connection_specification.namespace_mode == "collection"
+
+    def _collection_name(self, namespace: Optional[str]) -> str:
+        collection_name = self.config.connection_specification.collection_name
+        if not self._uses_collection_per_namespace or not namespace:
+            return collection_name
+        # Qdrant collection names may not hold path separators and the like. Namespaces
+        # that have to be rewritten get a hash suffix, so that a.b and a_b stay apart
+        sanitized = re.sub(r'[^A-Za-z0-9_-]', '_', namespace)
+        if sanitized != namespace:
+            sanitized = f"{sanitized}_{hashlib.sha1(namespace.encode('utf-8')).hexdigest()[:NAMESPACE_HASH_LENGTH]}"
+        return f"{collection_name}_{sanitized}"
+
     def _create_client(self):
         url = self.config.connection_specification.url
-        self._client = QdrantClient(url)
+        self._client = QdrantClient(
+            url,
+            api_key=self.config.connection_specification.api_key,
+            prefer_grpc=self.config.connection_specification.prefer_grpc,
+            grpc_port=self.config.connection_specification.grpc_port,
+        )
 
     def initiate_sync(self, configured_catalog: DatCatalog):
         for stream in configured_catalog.document_streams:
             if stream.write_sync_mode == WriteSyncMode.REPLACE:
+                if self.ids.deterministic:
+                    # Re-sent chunks overwrite themselves, so only the points this
+                    # sync does not write need deleting, once it is done
+                    logger.info(f"Upsert mode set to 'REPLACE' for stream {stream.name}. "
+                                f"Deferring the delete of stale points to the end of the sync")
+                    self._deferred_replace[stream.name] = stream.namespace
+                    continue
                 _filter = self.prepare_metadata_filter(
-                    {self.METADATA_DAT_STREAM_FIELD: stream.name})
+                    {self.METADATA_DAT_STREAM_FIELD: stream.name}, namespace=stream.namespace)
                 logger.info(f"Upsert mode set to 'REPLACE' for stream {stream.name}."
                             f" Deleting with filter: {_filter}")
                 self.delete(
                     filter=_filter, namespace=stream.namespace)
+        if self.config.connection_specification.bulk_load != "off":
+            # Only REPLACE streams rewrite their collection; indexing stays on for the others
+            for collection_name in {self._collection_name(stream.namespace)
+                                    for stream in configured_catalog.document_streams
+                                    if stream.write_sync_mode == WriteSyncMode.REPLACE}:
+                self._begin_bulk_load(collection_name)
+
+    def finish_sync(self) -> None:
+        """
+        Called once every message of the sync has been handed to load().
+        Deletes the points of deferred REPLACE streams this sync did not write,
+        then restores the index settings a bulk load changed.
+        """
+        for stream_name, namespace in self._deferred_replace.items():
+            _filter = self.prepare_metadata_filter(self.ids.stale_filter(stream_name), namespace=namespace)
+            logger.info(f"Deleting points of stream {stream_name} not written by this sync "
+                        f"with filter: {_filter}")
+            self.delete(filter=_filter, namespace=namespace)
+        self._deferred_replace.clear()
+        self._end_bulk_load(self.config.connection_specification.wait_for_green)
 
-    def prepare_metadata_filter(self, filter: Dict[str, Any]) -> Filter:
+    def prepare_metadata_filter(self, filter: Dict[str, Any], namespace: Optional[str] = None) -> Filter:
         conditions = []
+        if namespace is not None and self._uses_payload_namespace:
+            conditions.append(
+                FieldCondition(
+                    key=NAMESPACE_FIELD,
+                    match=MatchValue(value=namespace)
+                )
+            )
 
         for key, value in filter.items():
             if key == Loader.METADATA_DAT_RUN_ID_FIELD:
@@ -0,0 +1,95 @@
+"""
+Benchmark of peak memory and rows/sec of QdrantLoader.load(), which
+streams points into the upload, against the former path that built a
+validated PointStruct list for the whole batch first. Peak memory is the
+tracemalloc peak above the input chunks while one batch is loaded; rows/sec
+is measured in a separate pass without tracing. Uses the bench_upload
+stand-in unless --url is given.
+
+    python -m verified_destinations.qdrant.poc.bench_memory --dim 3072 --points 10000
+"""
+import argparse
+import multiprocessing
+import time
+import tracemalloc
+from qdrant_client import models
+from verified_destinations.qdrant.poc.bench_upload import LOAD_BATCH_SIZE, _chunks, _loader, _serve_stand_in
+
+
+def _load_materialized(loader, document_chunks, namespace: str, stream: str) -> None:
+    # QdrantLoader.load before points were streamed
+    points = []
+    for document_chunk in document_chunks:
+        metadata = document_chunk.data.metadata.model_dump()
+        points.append(models.PointStruct(
+            id=loader.ids.next_id(metadata, namespace),
+            vector=document_chunk.data.vectors,
+            payload=metadata
+        ))
+    loader._client.upload_points(
+        collection_name=loader.config.connection_specification.collection_name,
+        points=points,
+        batch_size=loader.config.connection_specification.upload_batch_size
+    )
+
+
+def _load_streamed(loader, document_chunks, namespace: str, stream: str) -> None:
+    loader.load(document_chunks, namespace, stream)
+
+
+def _peak_bytes(load, loader, chunks) -> int:
+    # Warm up first, so that lazy imports and connection set-up are not counted
+    load(loader, chunks[:1], "bench", "PDF")
+    tracemalloc.start()
+    try:
+        load(loader, chunks[:LOAD_BATCH_SIZE], "bench", "PDF")
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _rows_per_sec(load, loader, chunks) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(chunks), LOAD_BATCH_SIZE):
+        load(loader, chunks[i:i + LOAD_BATCH_SIZE], "bench", "PDF")
+    return len(chunks) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="Qdrant REST URL; the bench_upload stand-in is used when omitted")
+    parser.add_argument("--grpc-port", type=int, default=6334)
+    parser.add_argument("--collection-name", default="bench_memory")
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--prefer-grpc", action="store_true")
+    parser.add_argument("--stand-in-latency", type=float, default=10,
+                        help="milliseconds the stand-in takes per upsert")
+    args = parser.parse_args()
+
+    server = None
+    if not args.url:
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Event()
+        server = ctx.Process(target=_serve_stand_in, args=(args.stand_in_latency / 1000, ready), daemon=True)
+        server.start()
+        ready.wait()
+    chunks = _chunks(args.points, args.dim)
+    print(f"{'path':<14}{'peak MB/batch':>15}{'rows/sec':>12}")
+    try:
+        for name, load in (("materialized", _load_materialized), ("streamed", _load_streamed)):
+            loader = _loader(args, args.prefer_grpc, 1)
+            if args.url and not loader._client.collection_exists(args.collection_name):
+                loader.check()
+            peak = _peak_bytes(load, loader, chunks)
+            rows_per_sec = _rows_per_sec(load, loader, chunks)
+            print(f"{name:<14}{peak / 1024 / 1024:>15.1f}{rows_per_sec:>12.0f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark of REPLACE-style filtered deletes (dat_stream equals a stream,
+dat_run_id differs from the current run) on Qdrant collections with and
+without the keyword payload indexes QdrantLoader.check() creates. For
+every size, two collections are loaded with --streams streams of which
+half the points belong to an older run, then the older points of
+--deletes streams are deleted one stream at a time. Needs a running
+Qdrant; 10M points take a while to load, so vectors are kept tiny.
+
+    python -m verified_destinations.qdrant.poc.bench_payload_index --url http://localhost:6333 --sizes 1000000 10000000
+"""
+import argparse
+import random
+import statistics
+import time
+import numpy as np
+from verified_destinations.qdrant.loader import QdrantLoader
+from verified_destinations.qdrant.specs import QdrantSpecification
+
+RUN_IDS = ("previous-run", "current-run")
+
+
+def _loader(args, collection_name: str) -> QdrantLoader:
+    return QdrantLoader(QdrantSpecification(
+        name='Qdrant',
+        connection_specification={
+            "url": args.url,
+            "collection_name": collection_name,
+            "distance": {"distance": "cos"},
+            "embedding_dimensions": args.dim,
+            "prefer_grpc": True,
+            "grpc_port": args.grpc_port,
+        },
+        module_name='qdrant',
+    ), args.dim)
+
+
+def _payloads(num_points: int, num_streams: int):
+    for i in range(num_points):
+        yield {
+            "dat_stream": f"stream_{i % num_streams}",
+            "dat_run_id": RUN_IDS[(i // num_streams) % 2],
+            "dat_record_id": f"record_{i // 10}",
+            "dat_document_chunk": f"chunk {i}",
+        }
+
+
+def _fill(loader: QdrantLoader, collection_name: str, args, num_points: int, indexed: bool) -> None:
+    client = loader._client
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    loader.check()
+    if not indexed:
+        for field_name in client.get_collection(collection_name).payload_schema:
+            client.delete_payload_index(collection_name, field_name, wait=True)
+    rng = np.random.default_rng(42)
+    client.upload_collection(
+        collection_name=collection_name,
+        vectors=(rng.random(args.dim, dtype=np.float32) for _ in range(num_points)),
+        payload=_payloads(num_points, args.streams),
+        ids=range(num_points),
+        batch_size=1024,
+        parallel=args.parallel,
+        wait=True,
+    )
+
+
+def _delete_latencies(loader: QdrantLoader, args) -> list:
+    latencies = []
+    for stream in random.Random(7).sample(range(args.streams), args.deletes):
+        _filter = loader.prepare_metadata_filter({"dat_stream": f"stream_{stream}",
+                                                  "dat_run_id": RUN_IDS[1]})
+        start = time.perf_counter()
+        loader.delete(filter=_filter)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--grpc-port", type=int, default=6334)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--dim", type=int, default=4)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--deletes", type=int, default=5)
+    parser.add_argument("--parallel", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'points':>10}{'indexes':>9}{'p50 delete':>12}{'max delete':>12}")
+    for num_points in args.sizes:
+        for indexed in (False, True):
+            collection_name = f"bench_payload_index_{num_points}_{'indexed' if indexed else 'plain'}"
+            loader = _loader(args, collection_name)
+            _fill(loader, collection_name, args, num_points, indexed)
+            latencies = _delete_latencies(loader, args)
+            print(f"{num_points:>10}{'yes' if indexed else 'no':>9}"
+                  f"{statistics.median(latencies) * 1000:>10.0f}ms{max(latencies) * 1000:>10.0f}ms")
+            loader._client.delete_collection(collection_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark of QdrantLoader ingest over REST and gRPC, with one and with
+--workers concurrent upload requests. Runs against the Qdrant at --url, recreating
+the collection for every configuration, or, without --url, against a
+local stand-in that accepts upserts on both protocols and discards them.
+
+    docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant
+    python -m verified_destinations.qdrant.poc.bench_upload --url http://localhost:6333 --points 50000
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dat_core.pydantic_models import Data, DatDocumentMessage, DatDocumentStream, ReadSyncMode, WriteSyncMode
+from verified_destinations.qdrant.loader import QdrantLoader
+from verified_destinations.qdrant.specs import QdrantSpecification
+
+# Chunks handed to each load(), as by the destination's DataProcessor
+LOAD_BATCH_SIZE = 1000
+
+STAND_IN_PORT, STAND_IN_GRPC_PORT = 16333, 16334
+
+
+class _UpsertHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.latency)
+        payload = json.dumps({"result": {"operation_id": 0, "status": "acknowledged"},
+                              "status": "ok", "time": 0.0}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_stand_in(latency: float, ready) -> None:
+    import grpc
+    from qdrant_client import grpc as qdrant_grpc
+
+    class Points(qdrant_grpc.PointsServicer):
+        def Upsert(self, request, context):
+            time.sleep(latency)
+            return qdrant_grpc.PointsOperationResponse(
+                result=qdrant_grpc.UpdateResult(operation_id=0, status=qdrant_grpc.UpdateStatus.Acknowledged))
+
+    grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=16),
+                              options=[("grpc.max_receive_message_length", 128 * 1024 * 1024)])
+    qdrant_grpc.add_PointsServicer_to_server(Points(), grpc_server)
+    grpc_server.add_insecure_port(f"127.0.0.1:{STAND_IN_GRPC_PORT}")
+    grpc_server.start()
+    _UpsertHandler.latency = latency
+    rest_server = ThreadingHTTPServer(("127.0.0.1", STAND_IN_PORT), _UpsertHandler)
+    ready.set()
+    rest_server.serve_forever()
+
+
+def _loader(args, prefer_grpc: bool, parallel: int) -> QdrantLoader:
+    return QdrantLoader(QdrantSpecification(
+        name='Qdrant',
+        connection_specification={
+            "url": args.url or f"http://127.0.0.1:{STAND_IN_PORT}",
+            "collection_name": args.collection_name,
+            "distance": {"distance": "cos"},
+            "embedding_dimensions": args.dim,
+            "prefer_grpc": prefer_grpc,
+            "grpc_port": args.grpc_port if args.url else STAND_IN_GRPC_PORT,
+            "parallel": parallel,
+            "upload_batch_size": args.batch_size,
+        },
+        module_name='qdrant',
+    ), args.dim)
+
+
+def _chunks(num_points: int, dim: int):
+    rng = random.Random(42)
+    stream = DatDocumentStream(name="PDF", namespace="bench", read_sync_mode=ReadSyncMode.INCREMENTAL,
+                               write_sync_mode=WriteSyncMode.APPEND)
+    return [
+        DatDocumentMessage(
+            data=Data(
+                document_chunk=f"chunk {i} " * 20,
+                vectors=[rng.uniform(-1, 1) for _ in range(dim)],
+                metadata={
+                    "dat_source": "GoogleDrive",
+                    "dat_document_chunk": f"chunk {i} " * 20,
+                    "dat_stream": "PDF",
+                    "dat_document_entity": f"/Apple/{i // 10}.pdf",
+                    "dat_record_id": f"/Apple/{i // 10}.pdf",
+                    "dat_run_id": "7c3f04fafccc4d6090e5c2ec94bd6c826",
+                },
+            ),
+            namespace="bench",
+            stream=stream,
+        )
+        for i in range(num_points)
+    ]
+
+
+def _run(args, chunks, prefer_grpc: bool, parallel: int) -> float:
+    loader = _loader(args, prefer_grpc, parallel)
+    if args.url:
+        if loader._client.collection_exists(args.collection_name):
+            loader._client.delete_collection(args.collection_name)
+        loader.check()
+    start = time.perf_counter()
+    for i in range(0, len(chunks), LOAD_BATCH_SIZE):
+        loader.load(chunks[i:i + LOAD_BATCH_SIZE], namespace="bench", stream="PDF")
+    return len(chunks) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="Qdrant REST URL; a local stand-in is used when omitted")
+    parser.add_argument("--grpc-port", type=int, default=6334)
+    parser.add_argument("--collection-name", default="bench_upload")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--stand-in-latency", type=float, default=10,
+                        help="milliseconds the stand-in takes per upsert, like a server writing its WAL")
+    args = parser.parse_args()
+
+    server = None
+    if not args.url:
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Event()
+        server = ctx.Process(target=_serve_stand_in, args=(args.stand_in_latency / 1000, ready), daemon=True)
+        server.start()
+        ready.wait()
+    chunks = _chunks(args.points, args.dim)
+    print(f"{'transport':<10}{'workers':>8}{'points/sec':>14}")
+    try:
+        for prefer_grpc in (False, True):
+            for parallel in (1, args.workers):
+                points_per_sec = _run(args, chunks, prefer_grpc, parallel)
+                print(f"{'grpc' if prefer_grpc else 'rest':<10}{parallel:>8}{points_per_sec:>14.0f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -63,6 +63,96 @@ class ConnectionSpecificationModel(ConnectionSpecification):
     embedding_dimensions: int = Field(
         ..., description='Number of dimensions for the embeddings'
     )
+    id_strategy: Literal['random', 'deterministic'] = Field(
+        'random',
+        description=('random gives every chunk a new id; deterministic derives it from '
+                     'dat_record_id and the chunk\'s text, so re-sent chunks overwrite '
+                     'themselves and REPLACE streams only delete the rows a sync did not '
+                     'write, after the sync'),
+        title='ID Strategy'
+    )
+    api_key: Optional[str] = Field(
+        None, description='API key of the Qdrant server, e.g. for Qdrant Cloud', title='API Key',
+        json_schema_extra={
+            'ui-opts': {
+                'masked': True,
+            }
+        }
+    )
+    prefer_grpc: bool = Field(
+        False, description='Send data-plane requests over gRPC instead of REST', title='Prefer gRPC'
+    )
+    grpc_port: int = Field(
+        6334, description='gRPC port of the Qdrant server, used when prefer_grpc is set',
+        title='gRPC Port', gt=0, le=65535
+    )
+    parallel: int = Field(
+        1, description='Number of upload requests in flight at once',
+        title='Parallel Upload Workers', gt=0
+    )
+    upload_batch_size: int = Field(
+        64, description='Number of points sent in a single upload request',
+        title='Upload Batch Size', gt=0
+    )
+    namespace_mode: Literal['none', 'payload', 'collection'] = Field(
+        'none',
+        description=('none writes every namespace into the collection unscoped; payload stores '
+                     'the namespace in a dat_namespace field with a tenant keyword index and scopes '
+                     'deletes to it; collection writes each namespace into its own '
+                     '<collection_name>_<namespace> collection, created on first use'),
+        title='Namespace Mode'
+    )
+    on_disk: bool = Field(
+        False, description='Keep the original vectors on disk instead of in RAM',
+        title='Vectors on Disk'
+    )
+    quantization: Literal['none', 'scalar', 'binary'] = Field(
+        'none',
+        description=('Quantize the vectors searched in memory: scalar stores int8 (4x smaller), '
+                     'binary one bit per dimension (32x smaller, for high-dimensional embeddings)'),
+        title='Quantization'
+    )
+    quantization_always_ram: bool = Field(
+        True, description='Keep the quantized vectors in RAM even when the original vectors are on disk',
+        title='Quantized Vectors in RAM'
+    )
+    hnsw_m: Optional[int] = Field(
+        None, description='Edges per node of the HNSW graph; the server default (16) when not set',
+        title='HNSW m', ge=0
+    )
+    hnsw_ef_construct: Optional[int] = Field(
+        None, description='Neighbours considered while building the HNSW graph; the server default (100) when not set',
+        title='HNSW ef_construct', ge=4
+    )
+    hnsw_on_disk: bool = Field(
+        False, description='Keep the HNSW graph on disk instead of in RAM', title='HNSW on Disk'
+    )
+    indexing_threshold: Optional[int] = Field(
+        None,
+        description=('Segment size in kilobytes above which the optimizer builds the HNSW index; '
+                     '0 disables indexing. The server default when not set'),
+        title='Indexing Threshold', ge=0
+    )
+    memmap_threshold: Optional[int] = Field(
+        None,
+        description=('Segment size in kilobytes above which the optimizer moves vectors to '
+                     'memory-mapped storage. The server default when not set'),
+        title='Memmap Threshold', ge=0
+    )
+    bulk_load: Literal['off', 'indexing_threshold', 'hnsw_m'] = Field(
+        'off',
+        description=('Defer HNSW indexing while a sync writes REPLACE streams: indexing_threshold '
+                     'sets the threshold of their collections to 0, hnsw_m sets m to 0. The previous '
+                     'setting is restored when the sync ends, also when it fails, and at the start of '
+                     'the next sync if it was killed'),
+        title='Bulk Load'
+    )
+    wait_for_green: Optional[int] = Field(
+        None,
+        description=('Seconds to wait after a bulk load for the collection to finish indexing '
+                     '(status green); not waited for when unset'),
+        title='Wait for Green', gt=0
+    )
 
 
 class QdrantSpecification(BaseModel):
@@ -4,7 +4,7 @@ import pytest
 from dat_core.pydantic_models import (
     ConnectorSpecification, DatCatalog,
     DatDocumentStream, ReadSyncMode, WriteSyncMode,
-    Type,
+    Type, DatDocumentMessage, Data,
 )
 
 
@@ -18,6 +18,16 @@ def valid_connection_object(request):
     }
 
 
+@pytest.fixture(scope="class")
+def offline_connection_object(request):
+    yield {
+        "url": "http://localhost:6333",
+        "collection_name": "pytest_collection",
+        "distance": {"distance": "cos"},
+        "embedding_dimensions": 1536,
+    }
+
+
 @pytest.fixture(scope="class")
 def conf_catalog(request):
     conf_catalog = DatCatalog(
@@ -151,3 +161,13 @@ def records(request):
              }
         ],
     }
+
+
+@pytest.fixture(scope="class")
+def chunks(conf_catalog, records):
+    stream = conf_catalog.document_streams[1]
+    yield [
+        DatDocumentMessage(data=Data(**{k: record[k] for k in ("document_chunk", "vectors", "metadata")}),
+                           namespace=stream.namespace, stream=stream)
+        for record in records["PDF"] if record["type"] == Type.RECORD
+    ]
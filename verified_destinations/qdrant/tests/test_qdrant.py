@@ -1,17 +1,36 @@
 import os
+import httpx
+import pytest
 import yaml
 from typing import List
+from unittest.mock import MagicMock, patch
+from qdrant_client import models
+from qdrant_client.http.exceptions import ResponseHandlingException
 from dat_core.pydantic_models import (
     DatMessage, DatDocumentMessage,
     Data, DatStateMessage, StreamState,
     StreamStatus, DatDocumentStream,
     Type, DatCatalog, Status,
-    DatConnectionStatus,
+    DatConnectionStatus, WriteSyncMode,
 )
 from verified_destinations.qdrant.destination import Qdrant
+from verified_destinations.qdrant.loader import QdrantLoader
 from verified_destinations.qdrant.specs import QdrantSpecification
 
 
+def collection_config(on_disk=False, quantization_config=None) -> models.CollectionConfig:
+    return models.CollectionConfig(
+        params=models.CollectionParams(vectors=models.VectorParams(
+            size=1536, distance=models.Distance.COSINE, on_disk=on_disk)),
+        hnsw_config=models.HnswConfig(m=16, ef_construct=100, full_scan_threshold=10000),
+        optimizer_config=models.OptimizersConfig(deleted_threshold=0.2, vacuum_min_vector_number=1000,
+                                                 default_segment_number=0, flush_interval_sec=5,
+                                                 indexing_threshold=10000),
+        wal_config=models.WalConfig(wal_capacity_mb=32, wal_segments_ahead=0),
+        quantization_config=quantization_config,
+    )
+
+
 class TestQdrant:
 
 
@@ -26,6 +45,256 @@ class TestQdrant:
         assert isinstance(check_connection_tpl, DatConnectionStatus)
         assert check_connection_tpl.status.name == 'SUCCEEDED'
 
+    def test_payload_indexes(self, offline_connection_object):
+        """
+        GIVEN an existing collection with a payload index on dat_stream only
+        WHEN the connection is checked
+        THEN the missing keyword indexes on dat_run_id and dat_record_id are created
+        """
+        loader = QdrantLoader(QdrantSpecification(
+            name='Qdrant',
+            connection_specification=offline_connection_object,
+            module_name='qdrant',
+        ), 1536)
+        loader._client = MagicMock()
+        collection = MagicMock()
+        collection.name = "pytest_collection"
+        loader._client.get_collections.return_value.collections = [collection]
+        description = loader._client.get_collection.return_value
+        description.config = collection_config()
+        description.payload_schema = {"dat_stream": MagicMock()}
+
+        assert loader.check() == (True, None)
+        indexed = [call.kwargs["field_name"] for call in loader._client.create_payload_index.call_args_list]
+        assert indexed == ["dat_run_id", "dat_record_id"]
+
+    def test_collection_config(self, offline_connection_object):
+        """
+        GIVEN a connection specification with scalar quantization, on-disk vectors and HNSW m 32
+        WHEN the collection is created, and later checked against a collection built with m 16
+        THEN the settings are applied at creation, and the check reports the m drift
+        """
+        loader = QdrantLoader(QdrantSpecification(
+            name='Qdrant',
+            connection_specification={
+                **offline_connection_object,
+                "on_disk": True,
+                "quantization": "scalar",
+                "hnsw_m": 32,
+            },
+            module_name='qdrant',
+        ), 1536)
+        loader._client = MagicMock()
+        loader._client.get_collections.return_value.collections = []
+
+        assert loader.check() == (True, None)
+        kwargs = loader._client.create_collection.call_args.kwargs
+        assert kwargs["vectors_config"].on_disk is True
+        assert kwargs["hnsw_config"].m == 32
+        assert kwargs["quantization_config"].scalar.type == models.ScalarType.INT8
+
+        collection = MagicMock()
+        collection.name = "pytest_collection"
+        loader._client.get_collections.return_value.collections = [collection]
+        loader._client.get_collection.return_value.config = collection_config(
+            on_disk=True, quantization_config=kwargs["quantization_config"])
+        ok, message = loader.check()
+        assert not ok
+        assert "hnsw_m is 16 but 32 is configured" in message
+        assert "quantization" not in message
+
+    def test_bulk_load(self, offline_connection_object, conf_catalog):
+        """
+        GIVEN a loader in the indexing_threshold bulk load mode on a collection with threshold 10000
+        WHEN a sync is finished, another one stops before finish_sync(), a third starts
+            after one was killed, and a sync has no REPLACE stream
+        THEN indexing is disabled at initiate_sync and the threshold restored, never to 0,
+            the killed sync's 0 is restored before the collection is checked for drift,
+            and a sync without REPLACE streams leaves indexing on
+        """
+        connection_specification = {
+            **offline_connection_object,
+            "bulk_load": "indexing_threshold",
+            "wait_for_green": 60,
+        }
+        loader = QdrantLoader(QdrantSpecification(
+            name='Qdrant',
+            connection_specification=connection_specification,
+            module_name='qdrant',
+        ), 1536)
+        loader._client = MagicMock()
+        description = loader._client.get_collection.return_value
+        description.config = collection_config()
+        description.status = models.CollectionStatus.GREEN
+
+        for finished in (True, False):
+            loader._client.update_collection.reset_mock()
+            loader.initiate_sync(conf_catalog)
+            if finished:
+                loader.finish_sync()
+            loader.close()
+            thresholds = [call.kwargs["optimizers_config"].indexing_threshold
+                          for call in loader._client.update_collection.call_args_list]
+            assert thresholds == [0, 10000]
+
+        # The next process finds the collection at 0, which is no drift from the configured 10000
+        description.config.optimizer_config.indexing_threshold = 0
+        loader = QdrantLoader(QdrantSpecification(
+            name='Qdrant',
+            connection_specification={**connection_specification, "indexing_threshold": 10000},
+            module_name='qdrant',
+        ), 1536)
+        loader._client = MagicMock()
+        loader._client.get_collection.return_value = description
+        loader._client.update_collection.side_effect = lambda collection_name, optimizers_config: setattr(
+            description.config.optimizer_config, "indexing_threshold", optimizers_config.indexing_threshold)
+        loader.initiate_sync(conf_catalog)
+        loader.finish_sync()
+        thresholds = [call.kwargs["optimizers_config"].indexing_threshold
+                      for call in loader._client.update_collection.call_args_list]
+        assert thresholds == [10000, 0, 10000]
+
+        loader._client.update_collection.reset_mock()
+        append_catalog = DatCatalog(document_streams=[
+            stream.model_copy(update={"write_sync_mode": WriteSyncMode.APPEND})
+            for stream in conf_catalog.document_streams])
+        loader.initiate_sync(append_catalog)
+        loader.finish_sync()
+        loader._client.update_collection.assert_not_called()
+
+    def test_namespace_modes(self, offline_connection_object, conf_catalog, chunks):
+        """
+        GIVEN loaders in the payload and the collection namespace modes
+        WHEN a namespace's chunks are loaded and its stream is deleted
+        THEN the payload mode tags and filters points by dat_namespace, and the
+            collection mode writes to and deletes from the namespace's own collection
+        """
+        stream = conf_catalog.document_streams[1]
+        loaders = {}
+        for namespace_mode in ("payload", "collection"):
+            loader = QdrantLoader(QdrantSpecification(
+                name='Qdrant',
+                connection_specification={
+                    **offline_connection_object,
+                    "namespace_mode": namespace_mode,
+                },
+                module_name='qdrant',
+            ), 1536)
+            loader._client = MagicMock()
+            loader._client.collection_exists.return_value = False
+            loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+            loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+            _filter = loader.prepare_metadata_filter({"dat_stream": stream.name}, namespace=stream.namespace)
+            loader.delete(filter=_filter, namespace=stream.namespace)
+            loaders[namespace_mode] = loader
+
+        client = loaders["payload"]._client
+        points = list(client.upload_points.call_args.kwargs["points"])
+        assert all(point.payload["dat_namespace"] == stream.namespace for point in points)
+        assert client.delete.call_args.kwargs["collection_name"] == "pytest_collection"
+        conditions = client.delete.call_args.kwargs["points_selector"].filter.must
+        assert [condition.key for condition in conditions] == ["dat_namespace", "dat_stream"]
+        client.create_collection.assert_not_called()
+
+        client = loaders["collection"]._client
+        collection_name = "pytest_collection_pytest_unstructured_document"
+        client.create_collection.assert_called_once()
+        assert client.create_collection.call_args.kwargs["collection_name"] == collection_name
+        assert client.upload_points.call_args.kwargs["collection_name"] == collection_name
+        assert client.delete.call_args.kwargs["collection_name"] == collection_name
+        conditions = client.delete.call_args.kwargs["points_selector"].filter.must
+        assert [condition.key for condition in conditions] == ["dat_stream"]
+
+    def test_collection_names(self, offline_connection_object):
+        """
+        GIVEN a loader in the collection namespace mode
+        WHEN namespaces that sanitize to the same name get their collections
+        THEN they get different collections, and a clean namespace keeps its plain name
+        """
+        loader = QdrantLoader(QdrantSpecification(
+            name='Qdrant',
+            connection_specification={
+                **offline_connection_object,
+                "namespace_mode": "collection",
+            },
+            module_name='qdrant',
+        ), 1536)
+        names = {namespace: loader._collection_name(namespace) for namespace in ("a_b", "a.b", "a/b")}
+        assert names["a_b"] == "pytest_collection_a_b"
+        assert len(set(names.values())) == 3
+        assert names["a.b"].startswith("pytest_collection_a_b_")
+
+    def test_streamed_points(self, offline_connection_object, conf_catalog, chunks):
+        """
+        GIVEN a loader uploading with a single worker
+        WHEN a batch of chunks is loaded
+        THEN points are handed to upload_points lazily, sharing the chunks' vectors
+        """
+        loader = QdrantLoader(QdrantSpecification(
+            name='Qdrant',
+            connection_specification=offline_connection_object,
+            module_name='qdrant',
+        ), 1536)
+        loader._client = MagicMock()
+        stream = conf_catalog.document_streams[1]
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+        points = loader._client.upload_points.call_args.kwargs["points"]
+        assert not isinstance(points, list)
+        points = list(points)
+        assert len(points) == 3
+        assert all(point.vector is chunk.data.vectors for point, chunk in zip(points, chunks))
+        assert points[0].payload["dat_stream"] == "PDF"
+
+    def test_parallel_upload(self, offline_connection_object, conf_catalog, chunks):
+        """
+        GIVEN a loader with 2 parallel uploads of 2 points each
+        WHEN a batch of 3 chunks is loaded
+        THEN it is upserted in 2 batches over the loader's client
+        """
+        loader = QdrantLoader(QdrantSpecification(
+            name='Qdrant',
+            connection_specification={
+                **offline_connection_object,
+                "parallel": 2,
+                "upload_batch_size": 2,
+            },
+            module_name='qdrant',
+        ), 1536)
+        loader._client = MagicMock()
+        stream = conf_catalog.document_streams[1]
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+        loader.close()
+        loader._client.upload_points.assert_not_called()
+        batch_sizes = sorted(len(call.kwargs["points"]) for call in loader._client.upsert.call_args_list)
+        assert batch_sizes == [1, 2]
+
+    def test_upload_retries(self, offline_connection_object):
+        """
+        GIVEN a loader with parallel uploads
+        WHEN an upsert times out, or fails with an invalid request
+        THEN the timed out one is retried after a wait, and the invalid one is raised at once
+        """
+        loader = QdrantLoader(QdrantSpecification(
+            name='Qdrant',
+            connection_specification={
+                **offline_connection_object,
+                "parallel": 2,
+            },
+            module_name='qdrant',
+        ), 1536)
+        loader._client = MagicMock()
+        loader._client.upsert.side_effect = [ResponseHandlingException(httpx.ReadTimeout("timed out")), None]
+        with patch("verified_destinations.qdrant.loader.time.sleep") as sleep:
+            loader._upsert_batch("pytest_collection", [])
+        assert loader._client.upsert.call_count == 2
+        sleep.assert_called_once()
+
+        loader._client.upsert.reset_mock()
+        loader._client.upsert.side_effect = ResponseHandlingException(ValueError("invalid response"))
+        with patch("verified_destinations.qdrant.loader.time.sleep"), pytest.raises(ResponseHandlingException):
+            loader._upsert_batch("pytest_collection", [])
+        assert loader._client.upsert.call_count == 1
+
     def test_write(self, valid_connection_object, conf_catalog, records):
         """
         GIVEN a valid connectionSpecification JSON config
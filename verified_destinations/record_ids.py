@@ -0,0 +1,73 @@
+import uuid
+from typing import Any, Dict, Optional
+
+# Fixed UUIDv5 namespace, so that every destination derives the same id for
+# the same chunk. Never change it: existing vectors would stop being overwritten.
+DAT_CHUNK_NAMESPACE = uuid.UUID("5b0e3a52-8f0c-4d5e-9a57-2f7c1c6e0d41")
+
+METADATA_DAT_STREAM_FIELD = "dat_stream"
+METADATA_DAT_RECORD_ID_FIELD = "dat_record_id"
+METADATA_DAT_RUN_ID_FIELD = "dat_run_id"
+METADATA_DAT_DOCUMENT_CHUNK_FIELD = "dat_document_chunk"
+
+
+def chunk_uuid(namespace: Optional[str], stream: Optional[str], record_id: str, chunk: str) -> uuid.UUID:
+    """
+    Content-addressed id of the chunk of a source record with the text
+    chunk. Namespace and stream are part of the name because dat_record_id
+    is only unique within a stream.
+    """
+    return uuid.uuid5(DAT_CHUNK_NAMESPACE, f"{namespace}\x1f{stream}\x1f{record_id}\x1f{chunk}")
+
+
+class ChunkIdGenerator:
+    """
+    Hands out ids for document chunks according to the configured id_strategy.
+
+    random: a fresh uuid4 per chunk, so re-sent chunks are duplicated.
+    deterministic: a UUIDv5 of the namespace, stream, dat_record_id and the
+    chunk's text, so re-sent chunks overwrite themselves however they are
+    batched. Identical chunks of a record share an id and are stored once.
+    Chunks without a dat_record_id or text get a uuid4.
+
+    The generator also remembers the dat_run_id of each stream, so that a
+    REPLACE stream can be reconciled by deleting only the rows the sync did
+    not overwrite (see stale_filter).
+    """
+
+    def __init__(self, strategy: str = "random"):
+        self.strategy = strategy
+        self.run_ids: Dict[str, str] = {}
+
+    @property
+    def deterministic(self) -> bool:
+        return self.strategy == "deterministic"
+
+    def next_uuid(self, metadata: Dict[str, Any], namespace: Optional[str]) -> uuid.UUID:
+        stream = metadata.get(METADATA_DAT_STREAM_FIELD)
+        # Recorded for every chunk, keyed or not, so that stale_filter never matches rows this sync wrote
+        if stream is not None and metadata.get(METADATA_DAT_RUN_ID_FIELD) is not None:
+            self.run_ids[stream] = metadata[METADATA_DAT_RUN_ID_FIELD]
+        record_id = metadata.get(METADATA_DAT_RECORD_ID_FIELD)
+        chunk = metadata.get(METADATA_DAT_DOCUMENT_CHUNK_FIELD)
+        if not self.deterministic or record_id is None or chunk is None:
+            return uuid.uuid4()
+        return chunk_uuid(namespace, stream, record_id, chunk)
+
+    def next_id(self, metadata: Dict[str, Any], namespace: Optional[str]) -> str:
+        return str(self.next_uuid(metadata, namespace))
+
+    def next_int64(self, metadata: Dict[str, Any], namespace: Optional[str]) -> int:
+        # Top 63 bits, so the id is a non-negative INT64 primary key
+        return self.next_uuid(metadata, namespace).int >> 65
+
+    def stale_filter(self, stream: str) -> Dict[str, str]:
+        """
+        Metadata filter, for the loaders' prepare_metadata_filter, matching
+        the rows of stream left over from earlier syncs. Every row of the
+        stream is stale when this sync wrote none.
+        """
+        stale = {METADATA_DAT_STREAM_FIELD: stream}
+        if stream in self.run_ids:
+            stale[METADATA_DAT_RUN_ID_FIELD] = self.run_ids[stream]
+        return stale
@@ -0,0 +1,89 @@
+import uuid
+from verified_destinations.record_ids import ChunkIdGenerator, chunk_uuid
+
+
+def chunk_metadata(chunk: str, record_id: str = "/Apple/Orange.pdf", run_id: str = "run-2") -> dict:
+    return {
+        "dat_stream": "PDF",
+        "dat_record_id": record_id,
+        "dat_run_id": run_id,
+        "dat_document_chunk": chunk,
+    }
+
+
+class TestChunkIdGenerator:
+
+
+    def test_random_ids(self):
+        """
+        GIVEN the random id strategy
+        WHEN the same chunk is given an id twice
+        THEN it gets two different uuid4s
+        """
+        ids = ChunkIdGenerator()
+        first, second = (ids.next_uuid(chunk_metadata("first chunk"), "pytest") for _ in range(2))
+        assert first != second
+        assert first.version == 4
+
+    def test_retried_batch(self):
+        """
+        GIVEN the deterministic id strategy
+        WHEN a batch of a record's chunks is re-sent, in another order, by the same sync
+        THEN every chunk gets the id it got the first time
+        """
+        ids = ChunkIdGenerator("deterministic")
+        batch = [chunk_metadata(chunk) for chunk in ("first chunk", "second chunk", "third chunk")]
+        first = [ids.next_id(metadata, "pytest") for metadata in batch]
+        retried = [ids.next_id(metadata, "pytest") for metadata in reversed(batch)]
+        assert retried == list(reversed(first))
+        assert len(set(first)) == 3
+        assert first[0] == str(chunk_uuid("pytest", "PDF", "/Apple/Orange.pdf", "first chunk"))
+
+    def test_id_scope(self):
+        """
+        GIVEN the deterministic id strategy
+        WHEN the same chunk text is given an id in another namespace and for another record
+        THEN the ids differ, and a chunk without a dat_record_id gets a uuid4
+        """
+        ids = ChunkIdGenerator("deterministic")
+        chunk_ids = {
+            ids.next_uuid(chunk_metadata("chunk"), "pytest"),
+            ids.next_uuid(chunk_metadata("chunk"), "other_namespace"),
+            ids.next_uuid(chunk_metadata("chunk", record_id="/Apple/Banana.pdf"), "pytest"),
+        }
+        assert len(chunk_ids) == 3
+        assert ids.next_uuid({"dat_document_chunk": "chunk"}, "pytest").version == 4
+
+    def test_int64_ids(self):
+        """
+        GIVEN the deterministic id strategy
+        WHEN a chunk is given an INT64 primary key
+        THEN it is the non-negative top 63 bits of the chunk's UUID
+        """
+        ids = ChunkIdGenerator("deterministic")
+        primary_key = ids.next_int64(chunk_metadata("first chunk"), "pytest")
+        assert 0 <= primary_key < 2 ** 63
+        assert primary_key == uuid.UUID(ids.next_id(chunk_metadata("first chunk"), "pytest")).int >> 65
+
+    def test_stale_filter(self):
+        """
+        GIVEN chunks of the PDF stream written by run-2
+        WHEN the stale filters of PDF and of a stream the sync did not write are built
+        THEN PDF's matches other runs' rows, and the other's every row of its stream
+        """
+        ids = ChunkIdGenerator("deterministic")
+        ids.next_id(chunk_metadata("first chunk"), "pytest")
+        assert ids.stale_filter("PDF") == {"dat_stream": "PDF", "dat_run_id": "run-2"}
+        assert ids.stale_filter("CSV") == {"dat_stream": "CSV"}
+
+    def test_unkeyed_chunks(self):
+        """
+        GIVEN the deterministic id strategy
+        WHEN every chunk of a stream lacks a dat_record_id
+        THEN the chunks get uuid4s, but the stale filter still spares the rows of this run
+        """
+        ids = ChunkIdGenerator("deterministic")
+        metadata = chunk_metadata("first chunk")
+        del metadata["dat_record_id"]
+        assert ids.next_uuid(metadata, "pytest").version == 4
+        assert ids.stale_filter("PDF") == {"dat_stream": "PDF", "dat_run_id": "run-2"}
@@ -34,4 +34,8 @@ class Weaviate(DestinationBase):
     ) -> Iterable[DatMessage]:
         self._init_loader(config)
         processor = DataProcessor(config, self.loader, BATCH_SIZE)
-        yield from processor.processor(configured_catalog, input_messages)
+        try:
+            yield from processor.processor(configured_catalog, input_messages)
+            self.loader.finish_sync()
+        finally:
+            self.loader.close()
@@ -1,59 +1,360 @@
+import copy
 import re
-import uuid
+import time
+from collections import Counter
+from functools import lru_cache
+from urllib.parse import urlparse
 from dat_core.pydantic_models import DatCatalog, StreamMetadata
 import weaviate
-from weaviate.exceptions import UnexpectedStatusCodeException
-from typing import Any, List, Optional, Tuple, Dict
+from typing import Any, List, Optional, Set, Tuple, Dict
 from dat_core.pydantic_models.dat_message import DatDocumentMessage
 from dat_core.connectors.destinations.loader import Loader
-from dat_core.connectors.destinations.utils import create_chunks
 from dat_core.pydantic_models import WriteSyncMode
 from dat_core.loggers import logger
+from verified_destinations.record_ids import ChunkIdGenerator
 
-WEVIATE_BATCH_SIZE = 100
+# Namespaces whose class names are remembered
+CLASS_NAME_CACHE_SIZE = 1024
 
+# dat_* properties REPLACE deletes filter on, declared filterable and matched whole
+CLASS_PROPERTIES = ("dat_stream", "dat_run_id", "dat_record_id")
+
+# Longest tenant name Weaviate accepts
+TENANT_NAME_MAX_LENGTH = 64
+
+# Tenant activity statuses of the v3 (HOT/COLD/FROZEN) and v4 clients, by the name the spec uses
+TENANT_ACTIVITY = {
+    "HOT": "active", "ACTIVE": "active", "ONLOADING": "active",
+    "COLD": "inactive", "INACTIVE": "inactive",
+    "FROZEN": "offloaded", "OFFLOADED": "offloaded", "OFFLOADING": "offloaded",
+}
 
 class WeaviateLoader(Loader):
     def __init__(self, config: Any):
         super().__init__(config)
+        self.ids = ChunkIdGenerator(config.connection_specification.id_strategy)
+        # REPLACE streams whose stale objects are deleted after the sync, keyed by stream name
+        self._deferred_replace: Dict[str, Optional[str]] = {}
+        self.stats = Counter()
+        # Per-object batch errors by message, each logged the first time it is seen
+        self.batch_errors = Counter()
+        # Classes known to exist, created explicitly rather than by auto-schema
+        self._known_classes = set()
+        # Activity of the tenants of the tenant class, fetched on first use
+        self._tenant_activity: Optional[Dict[str, str]] = None
+        # Tenants written by this sync
+        self._synced_tenants: Set[str] = set()
+        self.client = None
 
     def load(self, document_chunks: List[DatDocumentMessage], namespace: str, stream: str) -> None:
-        chunks = create_chunks(document_chunks, batch_size=WEVIATE_BATCH_SIZE)
-        with self.client.batch as batch:
-            for data in chunks:
-                for document_chunk in data:
+        class_name = self._class_name(namespace)
+        self._get_or_create_class(class_name)
+        tenant = None
+        if self._uses_tenants:
+            tenant = self._tenant_name(namespace)
+            self._use_tenant(class_name, tenant, create=True)
+            self._synced_tenants.add(tenant)
+        start = time.perf_counter()
+        if self._uses_v4:
+            self._load_v4(document_chunks, namespace, class_name, tenant)
+        else:
+            # The batch was configured with the client; it sizes and sends the requests itself
+            with self.client.batch as batch:
+                for document_chunk in document_chunks:
                     metadata = document_chunk.data.metadata.model_dump()
+                    object_id = self.ids.next_id(metadata, namespace)
                     metadata = self._normalize_metadata(metadata)
-                    vectors = document_chunk.data.vectors
-                    class_name = self._namespace_to_class_name(namespace)
-                    object_id = str(uuid.uuid4())
                     batch.add_data_object(
                         data_object=metadata, class_name=class_name,
-                        uuid=object_id, vector=vectors
+                        uuid=object_id, vector=document_chunk.data.vectors, tenant=tenant
                     )
+        self.stats["batch_flushes"] += 1
+        self.stats["batch_seconds"] += time.perf_counter() - start
 
-    def delete(self, filter, namespace=None):
-        self._create_client()
-        object_ids = self._get_object_ids(filter, namespace)
-        if not object_ids:
+    def _load_v4(self, document_chunks: List[DatDocumentMessage], namespace: str, class_name: str,
+                 tenant: Optional[str] = None) -> None:
+        # Objects are streamed to Weaviate over gRPC, which the v4 batch retries by itself
+        collection = self._collection(class_name, tenant)
+        if self.config.connection_specification.dynamic:
+            batch_context = collection.batch.dynamic()
+        else:
+            batch_context = collection.batch.fixed_size(
+                batch_size=self.config.connection_specification.batch_size,
+                concurrent_requests=self.config.connection_specification.num_workers)
+        with batch_context as batch:
+            for document_chunk in document_chunks:
+                metadata = document_chunk.data.metadata.model_dump()
+                object_id = self.ids.next_id(metadata, namespace)
+                batch.add_object(
+                    properties=self._normalize_metadata(metadata),
+                    uuid=object_id, vector=document_chunk.data.vectors
+                )
+        self.stats["batch_objects"] += len(document_chunks)
+        for failed in collection.batch.failed_objects:
+            self._count_batch_error(failed.original_uuid, failed.message)
+
+    def _get_or_create_class(self, class_name: str) -> None:
+        """
+        Create class_name unless it exists, with no vectorizer, the
+        configured vector index and the CLASS_PROPERTIES, so that auto-schema
+        does not guess them on the first insert. Each class is looked up
+        once per loader. Raises ValueError when the tenant namespace mode
+        finds an existing class without multi-tenancy.
+        """
+        if class_name in self._known_classes:
+            self.stats["class_cache_hits"] += 1
             return
-        where_filter = {
-            "path": ["id"], "operator": "ContainsAny", "valueStringArray": object_ids}
-        self.client.batch.delete_objects(
-            class_name=self._namespace_to_class_name(namespace),
-            where=where_filter
+        self.stats["class_cache_misses"] += 1
+        if self._uses_v4:
+            if self.client.collections.exists(class_name):
+                config = self.client.collections.get(class_name).config.get()
+                vectorizer = config.vectorizer
+                multi_tenancy = config.multi_tenancy_config.enabled
+            else:
+                self._create_collection(class_name)
+                vectorizer, multi_tenancy = None, self._uses_tenants
+        elif self.client.schema.exists(class_name):
+            definition = self.client.schema.get(class_name)
+            vectorizer = definition.get("vectorizer")
+            multi_tenancy = definition.get("multiTenancyConfig", {}).get("enabled", False)
+        else:
+            logger.info(f"Creating class {class_name}")
+            self.client.schema.create_class(self._class_definition(class_name))
+            vectorizer, multi_tenancy = None, self._uses_tenants
+        if self._uses_tenants and not multi_tenancy:
+            raise ValueError(f"Class {class_name} does not have multi-tenancy enabled, "
+                             f"which the tenant namespace mode needs")
+        if vectorizer not in (None, "none"):
+            logger.warning(f"Class {class_name} has the {vectorizer} vectorizer, "
+                           f"but its objects are imported with their own vectors")
+        self._known_classes.add(class_name)
+
+    def _class_definition(self, class_name: str) -> Dict[str, Any]:
+        spec = self.config.connection_specification
+        vector_index_config = {}
+        if spec.hnsw_ef_construction is not None:
+            vector_index_config["efConstruction"] = spec.hnsw_ef_construction
+        if spec.hnsw_max_connections is not None:
+            vector_index_config["maxConnections"] = spec.hnsw_max_connections
+        if spec.pq:
+            vector_index_config["pq"] = {"enabled": True}
+            if spec.pq_segments is not None:
+                vector_index_config["pq"]["segments"] = spec.pq_segments
+        return {
+            "class": class_name,
+            "vectorizer": "none",
+            "vectorIndexType": "hnsw",
+            "vectorIndexConfig": vector_index_config,
+            "multiTenancyConfig": {"enabled": self._uses_tenants},
+            "properties": [
+                {"name": name, "dataType": ["text"], "indexFilterable": True,
+                 "indexSearchable": False, "tokenization": "field"}
+                for name in CLASS_PROPERTIES
+            ],
+        }
+
+    def _create_collection(self, class_name: str) -> None:
+        # The v4 equivalent of _class_definition
+        from weaviate.classes.config import Configure, DataType, Property, Tokenization
+        spec = self.config.connection_specification
+        logger.info(f"Creating class {class_name}")
+        self.client.collections.create(
+            class_name,
+            vectorizer_config=Configure.Vectorizer.none(),
+            vector_index_config=Configure.VectorIndex.hnsw(
+                ef_construction=spec.hnsw_ef_construction,
+                max_connections=spec.hnsw_max_connections,
+                quantizer=Configure.VectorIndex.Quantizer.pq(segments=spec.pq_segments) if spec.pq else None,
+            ),
+            multi_tenancy_config=Configure.multi_tenancy(enabled=self._uses_tenants),
+            properties=[
+                Property(name=name, data_type=DataType.TEXT, index_filterable=True,
+                         index_searchable=False, tokenization=Tokenization.FIELD)
+                for name in CLASS_PROPERTIES
+            ],
         )
 
+    def _use_tenant(self, class_name: str, tenant: str, create: bool) -> bool:
+        """
+        Make tenant of class_name active to be written to, creating it when
+        create is set. Returns whether it exists. Tenants are looked up once
+        per loader.
+        """
+        tenants = self._tenants(class_name)
+        if tenant not in tenants:
+            if not create:
+                return False
+            logger.info(f"Creating tenant {tenant} of class {class_name}")
+            if self._uses_v4:
+                from weaviate.classes.tenants import Tenant
+                self.client.collections.get(class_name).tenants.create([Tenant(name=tenant)])
+            else:
+                self.client.schema.add_class_tenants(class_name, [weaviate.Tenant(name=tenant)])
+            tenants[tenant] = "active"
+            self.stats["tenants_created"] += 1
+        elif tenants[tenant] != "active":
+            logger.info(f"Activating {tenants[tenant]} tenant {tenant} of class {class_name}")
+            self._update_tenants(class_name, [tenant], "active")
+        return True
+
+    def _tenants(self, class_name: str) -> Dict[str, str]:
+        if self._tenant_activity is None:
+            if self._uses_v4:
+                tenants = self.client.collections.get(class_name).tenants.get().values()
+            else:
+                tenants = self.client.schema.get_class_tenants(class_name)
+            self._tenant_activity = {
+                tenant.name: TENANT_ACTIVITY[tenant.activity_status.value] for tenant in tenants}
+        return self._tenant_activity
+
+    def _update_tenants(self, class_name: str, tenants: List[str], activity: str) -> None:
+        if self._uses_v4:
+            from weaviate.classes.tenants import Tenant, TenantActivityStatus
+            status = TenantActivityStatus[activity.upper()]
+            self.client.collections.get(class_name).tenants.update(
+                [Tenant(name=tenant, activity_status=status) for tenant in tenants])
+        else:
+            # The v3 client cannot offload tenants, which check() reports
+            status = {"active": weaviate.TenantActivityStatus.HOT,
+                      "inactive": weaviate.TenantActivityStatus.COLD}[activity]
+            self.client.schema.update_class_tenants(
+                class_name, [weaviate.Tenant(name=tenant, activity_status=status) for tenant in tenants])
+        for tenant in tenants:
+            self._tenants(class_name)[tenant] = activity
+
+    def _drop_replaced_tenants(self, configured_catalog: DatCatalog) -> Set[str]:
+        """
+        Remove the tenants only REPLACE streams of the catalog write to,
+        which is much cheaper than deleting their objects; load() creates
+        them again. Returns the namespaces of the dropped tenants.
+        """
+        replace_only = {}
+        for stream in configured_catalog.document_streams:
+            replace_only[stream.namespace] = (replace_only.get(stream.namespace, True)
+                                              and stream.write_sync_mode == WriteSyncMode.REPLACE)
+        class_name = self.config.connection_specification.tenant_class
+        self._get_or_create_class(class_name)
+        tenants = self._tenants(class_name)
+        dropped = set()
+        for namespace, replaced in replace_only.items():
+            if not replaced:
+                continue
+            tenant = self._tenant_name(namespace)
+            if tenant in tenants:
+                logger.info(f"Upsert mode set to 'REPLACE' for every stream of namespace {namespace}. "
+                            f"Dropping tenant {tenant} of class {class_name}")
+                if self._uses_v4:
+                    self.client.collections.get(class_name).tenants.remove([tenant])
+                else:
+                    self.client.schema.remove_class_tenants(class_name, [tenant])
+                del tenants[tenant]
+                self.stats["tenants_dropped"] += 1
+            dropped.add(namespace)
+        return dropped
+
+    def _batch_callback(self, results: Optional[List[Dict[str, Any]]]) -> None:
+        """
+        Called by the batch with the per-object results of every batch
+        request. Counts the objects and the errors Weaviate reported for them.
+        """
+        self.stats["batch_requests"] += 1
+        for result in results or []:
+            self.stats["batch_objects"] += 1
+            errors = result.get("result", {}).get("errors")
+            if not errors:
+                continue
+            for error in errors.get("error", []):
+                self._count_batch_error(result.get("id"), error.get("message"))
+
+    def _count_batch_error(self, object_id: Any, message: str) -> None:
+        self.stats["batch_object_errors"] += 1
+        self.batch_errors[message] += 1
+        if self.batch_errors[message] == 1:
+            logger.error(f"Batch import of object {object_id} failed: {message}")
+
+    def delete(self, filter, namespace=None) -> int:
+        """
+        Delete the objects of namespace's class, or tenant, matching filter
+        on the server. A batch delete removes at most QUERY_MAXIMUM_RESULTS
+        objects, so it is repeated until no more match. Returns the number
+        deleted.
+        """
+        self._create_client()
+        class_name = self._class_name(namespace)
+        if not self._class_exists(class_name):
+            logger.info(f"Class {class_name} does not exist, nothing to delete")
+            return 0
+        tenant = None
+        if self._uses_tenants:
+            tenant = self._tenant_name(namespace)
+            if not self._use_tenant(class_name, tenant, create=False):
+                logger.info(f"Tenant {tenant} of class {class_name} does not exist, nothing to delete")
+                return 0
+        deleted = 0
+        start = time.perf_counter()
+        while True:
+            if self._uses_v4:
+                matches, successful, limit = self._delete_batch_v4(filter, class_name, tenant)
+            else:
+                matches, successful, limit = self._delete_batch(filter, class_name, tenant)
+            deleted += successful
+            if successful < matches:
+                logger.error(f"Could not delete {matches - successful} of {matches} objects of class {class_name}")
+            # Fewer matches than the limit means none are left; nothing deleted means none will go
+            if matches == 0 or successful == 0 or (limit is not None and matches < limit):
+                break
+        elapsed = time.perf_counter() - start
+        self.stats["deleted_objects"] += deleted
+        self.stats["delete_seconds"] += elapsed
+        logger.info(f"Deleted {deleted} objects of class {class_name} in {elapsed:.1f}s "
+                    f"({deleted / elapsed if elapsed else 0:.0f} objects/sec)")
+        return deleted
+
+    def _delete_batch(self, filter: Dict[str, Any], class_name: str,
+                      tenant: Optional[str] = None) -> Tuple[int, int, Optional[int]]:
+        # delete_objects rewrites the where filter it is given in place
+        results = self.client.batch.delete_objects(
+            class_name=class_name,
+            where=copy.deepcopy(filter),
+            tenant=tenant
+        )["results"]
+        return results["matches"], results["successful"], results.get("limit")
+
+    def _delete_batch_v4(self, filter, class_name: str, tenant: Optional[str] = None) -> Tuple[int, int, Optional[int]]:
+        # The v4 result does not carry the server's limit
+        result = self._collection(class_name, tenant).data.delete_many(where=filter)
+        return result.matches, result.successful, None
+
+    def _collection(self, class_name: str, tenant: Optional[str] = None) -> Any:
+        collection = self.client.collections.get(class_name)
+        return collection.with_tenant(tenant) if tenant else collection
+
+    def _class_exists(self, class_name: str) -> bool:
+        if class_name in self._known_classes:
+            return True
+        if self._uses_v4:
+            return self.client.collections.exists(class_name)
+        return self.client.schema.exists(class_name)
+
     def check(self) -> Tuple[bool, Optional[str]]:
         # Check if the connection is valid by validating the client
+        spec = self.config.connection_specification
+        if self._uses_tenants and spec.tenant_activity_after_sync == "offloaded" and not self._uses_v4:
+            return False, "Offloading tenants needs the v4 client"
         try:
             self._create_client()
+            if self._uses_v4 and not self.client.is_ready():
+                return False, "Weaviate is not ready"
+            if self._uses_tenants and self._class_exists(spec.tenant_class):
+                self._get_or_create_class(spec.tenant_class)
             return True, None
         except Exception as e:
             logger.error(f"Error checking connection: {e}")
             return False, str(e)
 
-    def prepare_metadata_filter(self, filter: Dict[str, Any]) -> Dict[str, Any]:
+    def prepare_metadata_filter(self, filter: Dict[str, Any]) -> Any:
+        if self._uses_v4:
+            return self._prepare_v4_filter(filter)
         filter_expr = {
             "operator": "And",
             "operands": []
@@ -63,46 +364,58 @@ class WeaviateLoader(Loader):
             if key == self.METADATA_DAT_RUN_ID_FIELD:
                 filter_expr["operands"].append({
                     "operator": "NotEqual",
-                    "path": f"{key}",
+                    "path": [key],
                     "valueString": str(value)
                 })
             elif isinstance(value, str):
                 filter_expr["operands"].append({
                     "operator": "Equal",
-                    "path": f"{key}",
+                    "path": [key],
                     "valueString": value
                 })
             elif isinstance(value, list):
                 filter_expr["operands"].append({
                     "operator": "ContainsAny",
-                    "path": f"{key}",
-                    "valueStringList": value
+                    "path": [key],
+                    "valueStringArray": value
                 })
 
         return filter_expr
 
-    def _get_object_ids(self, combined_filter: dict, namespace: str) -> List[str]:
-        class_name = self._namespace_to_class_name(namespace)
-        query = (
-            self.client.query.get(
-                class_name,
-            )
-            .with_additional(["id"])
-            .with_where(combined_filter)
-        )
-        try:
-            result = query.do()
-            object_ids = [item["_additional"]["id"]
-                          for item in result["data"]["Get"][class_name]]
-            return object_ids
-        except (UnexpectedStatusCodeException, KeyError) as e:
-            logger.error(f"Error while fetching object ids: {e}")
-            return []
+    def _prepare_v4_filter(self, filter: Dict[str, Any]) -> Any:
+        from weaviate.classes.query import Filter
+        conditions = []
+
+        for key, value in filter.items():
+            if key == self.METADATA_DAT_RUN_ID_FIELD:
+                conditions.append(Filter.by_property(key).not_equal(str(value)))
+            elif isinstance(value, str):
+                conditions.append(Filter.by_property(key).equal(value))
+            elif isinstance(value, list):
+                conditions.append(Filter.by_property(key).contains_any(value))
+
+        return Filter.all_of(conditions)
 
     def initiate_sync(self, configured_catalog: DatCatalog) -> None:
         self._create_client()
+        dropped_namespaces = set()
+        if self._uses_tenants:
+            # Fail on a namespace that is not a valid tenant name before anything is dropped
+            for stream in configured_catalog.document_streams:
+                self._tenant_name(stream.namespace)
+        if self._uses_tenants and not self.ids.deterministic:
+            dropped_namespaces = self._drop_replaced_tenants(configured_catalog)
         for stream in configured_catalog.document_streams:
             if stream.write_sync_mode == WriteSyncMode.REPLACE:
+                if stream.namespace in dropped_namespaces:
+                    continue
+                if self.ids.deterministic:
+                    # Re-sent chunks overwrite themselves, so only the objects this
+                    # sync does not write need deleting, once it is done
+                    logger.info(f"Upsert mode set to 'REPLACE' for stream {stream.name}. "
+                                f"Deferring the delete of stale objects to the end of the sync")
+                    self._deferred_replace[stream.name] = stream.namespace
+                    continue
                 _filter = self.prepare_metadata_filter(
                     {self.METADATA_DAT_STREAM_FIELD: stream.name}
                 )
@@ -110,7 +423,54 @@ class WeaviateLoader(Loader):
                             f"Deleting with filter: {_filter}")
                 self.delete(filter=_filter, namespace=stream.namespace)
 
+    def finish_sync(self) -> None:
+        """
+        Called once every message of the sync has been handed to load().
+        Deletes the objects of deferred REPLACE streams this sync did not
+        write, then moves the tenants it wrote to the configured activity.
+        """
+        for stream_name, namespace in self._deferred_replace.items():
+            _filter = self.prepare_metadata_filter(self.ids.stale_filter(stream_name))
+            logger.info(f"Deleting objects of stream {stream_name} not written by this sync "
+                        f"with filter: {_filter}")
+            self.delete(filter=_filter, namespace=namespace)
+        self._deferred_replace.clear()
+        activity = self.config.connection_specification.tenant_activity_after_sync
+        if self._synced_tenants and activity != "active":
+            logger.info(f"Setting {len(self._synced_tenants)} tenants written by this sync {activity}")
+            self._update_tenants(self.config.connection_specification.tenant_class,
+                                 sorted(self._synced_tenants), activity)
+        self._synced_tenants.clear()
+        if self.stats["batch_seconds"]:
+            logger.info(f"Weaviate batch stats: {dict(self.stats)}, "
+                        f"{self.stats['batch_objects'] / self.stats['batch_seconds']:.0f} objects/sec, "
+                        f"errors by message: {dict(self.batch_errors)}")
+
+    def close(self) -> None:
+        # v3 clients hold no connection; v4 ones keep a gRPC channel open
+        if self._uses_v4 and self.client is not None:
+            self.client.close()
+            self.client = None
+
+    @property
+    def _uses_v4(self) -> bool:
+        return self.config.connection_specification.client_version == "v4"
+
+    @property
+    def _uses_tenants(self) -> bool:
+        return self.config.connection_specification.namespace_mode == "tenant"
+
+    def _class_name(self, namespace: str) -> str:
+        if self._uses_tenants:
+            return self.config.connection_specification.tenant_class
+        return self._namespace_to_class_name(namespace)
+
     def _create_client(self, ):
+        if self._uses_v4:
+            self._create_v4_client()
+            return
+        timeout_config = (self.config.connection_specification.connect_timeout,
+                          self.config.connection_specification.read_timeout)
         if self.config.connection_specification.authentication.authentication == "basic_authentication":
             auth = weaviate.AuthClientPassword(
                 username=self.config.connection_specification.authentication.username,
@@ -118,7 +478,8 @@ class WeaviateLoader(Loader):
             )
             self.client = weaviate.Client(
                 url=self.config.connection_specification.cluster_url,
-                auth_client_secret=auth
+                auth_client_secret=auth,
+                timeout_config=timeout_config
             )
         elif self.config.connection_specification.authentication.authentication == "api_key_authentication":
             auth = weaviate.AuthApiKey(
@@ -126,12 +487,51 @@ class WeaviateLoader(Loader):
             )
             self.client = weaviate.Client(
                 url=self.config.connection_specification.cluster_url,
-                auth_client_secret=auth
+                auth_client_secret=auth,
+                timeout_config=timeout_config
             )
         else:
             self.client = weaviate.Client(
-                url=self.config.connection_specification.cluster_url
+                url=self.config.connection_specification.cluster_url,
+                timeout_config=timeout_config
             )
+        self._configure_batch()
+
+    def _create_v4_client(self) -> None:
+        if self.client is not None and self.client.is_connected():
+            return
+        if not hasattr(weaviate, "connect_to_custom"):
+            raise ModuleNotFoundError("The v4 client needs weaviate-client 4, "
+                                      "install it with `pip install 'weaviate-client>=4.9,<4.10'`")
+        from weaviate.config import AdditionalConfig, Timeout
+        spec = self.config.connection_specification
+        url = urlparse(spec.cluster_url)
+        secure = url.scheme == "https"
+        auth = None
+        if spec.authentication.authentication == "basic_authentication":
+            auth = weaviate.AuthClientPassword(
+                username=spec.authentication.username,
+                password=spec.authentication.password
+            )
+        elif spec.authentication.authentication == "api_key_authentication":
+            auth = weaviate.AuthApiKey(api_key=spec.authentication.api_key)
+        self.client = weaviate.connect_to_custom(
+            http_host=url.hostname, http_port=url.port or (443 if secure else 80), http_secure=secure,
+            grpc_host=spec.grpc_host or url.hostname, grpc_port=spec.grpc_port, grpc_secure=secure,
+            auth_credentials=auth,
+            additional_config=AdditionalConfig(timeout=Timeout(
+                init=spec.connect_timeout, query=spec.read_timeout, insert=spec.read_timeout)),
+        )
+
+    def _configure_batch(self) -> None:
+        self.client.batch.configure(
+            batch_size=self.config.connection_specification.batch_size,
+            dynamic=self.config.connection_specification.dynamic,
+            num_workers=self.config.connection_specification.num_workers,
+            connection_error_retries=self.config.connection_specification.connection_error_retries,
+            timeout_retries=self.config.connection_specification.timeout_retries,
+            callback=self._batch_callback,
+        )
 
     def _normalize_metadata(self, metadata: dict) -> dict:
         for key, value in metadata.items():
@@ -139,11 +539,13 @@ class WeaviateLoader(Loader):
                 metadata[key] = ""  # Set value to empty string if None
         return metadata
 
-    def _namespace_to_class_name(self, namespace: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=CLASS_NAME_CACHE_SIZE)
+    def _namespace_to_class_name(namespace: str) -> str:
         """
         Converts a namespace string to a class name by removing spaces,
         replacing dashes with underscores, and capitalizing the first 
-        letter of each word.
+        letter of each word. Memoized, as it runs for every load.
 
         Example:
             'my-class name' -> 'My_ClassName'
@@ -160,10 +562,18 @@ class WeaviateLoader(Loader):
 
         return class_name
 
+    @staticmethod
+    def _tenant_name(namespace: Optional[str]) -> str:
+        # Tenant names are limited to letters, digits, underscores and dashes. Namespaces are
+        # not rewritten to fit, as two of them could then share a tenant and drop each other's
+        if namespace is None or not re.fullmatch(r'[A-Za-z0-9_-]{1,%d}' % TENANT_NAME_MAX_LENGTH, namespace):
+            raise ValueError(f"Namespace {namespace!r} is not a valid tenant name: it must be 1 to "
+                             f"{TENANT_NAME_MAX_LENGTH} letters, digits, underscores or dashes")
+        return namespace
+
 
 """
 TODO: Complete create_client to support all type of authentications
 TODO: Test _namespace_to_class_name method with different inputs
-TODO: Figure out Multi-tenancy support
 
 """
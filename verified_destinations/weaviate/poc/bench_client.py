@@ -0,0 +1,107 @@
+"""
+Benchmark of WeaviateLoader ingest with the v3 client, which imports
+batches over REST, against the v4 client, which imports them over gRPC,
+each with fixed-size and dynamic batches. Every configuration loads
+--points chunks into a freshly dropped class of the Weaviate at --url and
+reports objects/sec and the CPU seconds this process spent on them.
+
+    docker run -p 8080:8080 -p 50051:50051 cr.weaviate.io/semitechnologies/weaviate:1.26.1
+    python -m verified_destinations.weaviate.poc.bench_client --url http://localhost:8080 --points 20000
+"""
+import argparse
+import random
+import time
+from dat_core.pydantic_models import Data, DatDocumentMessage, DatDocumentStream, ReadSyncMode, WriteSyncMode
+from verified_destinations.weaviate.loader import WeaviateLoader
+from verified_destinations.weaviate.specs import WeaviateSpecification
+
+# Chunks handed to each load(), as by the destination's DataProcessor
+LOAD_BATCH_SIZE = 1000
+
+NAMESPACE = "bench_client"
+
+
+def _loader(args, client_version: str, dynamic: bool) -> WeaviateLoader:
+    loader = WeaviateLoader(WeaviateSpecification(
+        name='Weaviate',
+        connection_specification={
+            "cluster_url": args.url,
+            "authentication": {"authentication": "no_authentication"},
+            "client_version": client_version,
+            "grpc_port": args.grpc_port,
+            "batch_size": args.batch_size,
+            "dynamic": dynamic,
+            "num_workers": args.workers,
+        },
+        module_name='weaviate',
+    ))
+    loader._create_client()
+    return loader
+
+
+def _drop_class(loader: WeaviateLoader, class_name: str) -> None:
+    if loader.config.connection_specification.client_version == "v4":
+        loader.client.collections.delete(class_name)
+    elif loader.client.schema.exists(class_name):
+        loader.client.schema.delete_class(class_name)
+
+
+def _chunks(num_points: int, dim: int):
+    rng = random.Random(42)
+    stream = DatDocumentStream(name="PDF", namespace=NAMESPACE, read_sync_mode=ReadSyncMode.INCREMENTAL,
+                               write_sync_mode=WriteSyncMode.APPEND)
+    return [
+        DatDocumentMessage(
+            data=Data(
+                document_chunk=f"chunk {i} " * 20,
+                vectors=[rng.uniform(-1, 1) for _ in range(dim)],
+                metadata={
+                    "dat_source": "GoogleDrive",
+                    "dat_document_chunk": f"chunk {i} " * 20,
+                    "dat_stream": "PDF",
+                    "dat_document_entity": f"/Apple/{i // 10}.pdf",
+                    "dat_record_id": f"/Apple/{i // 10}.pdf",
+                    "dat_run_id": "7c3f04fafccc4d6090e5c2ec94bd6c826",
+                },
+            ),
+            namespace=NAMESPACE,
+            stream=stream,
+        )
+        for i in range(num_points)
+    ]
+
+
+def _run(args, chunks, client_version: str, dynamic: bool):
+    loader = _loader(args, client_version, dynamic)
+    try:
+        _drop_class(loader, loader._namespace_to_class_name(NAMESPACE))
+        start, start_cpu = time.perf_counter(), time.process_time()
+        for i in range(0, len(chunks), LOAD_BATCH_SIZE):
+            loader.load(chunks[i:i + LOAD_BATCH_SIZE], namespace=NAMESPACE, stream="PDF")
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+        return len(chunks) / elapsed, cpu, loader.stats["batch_object_errors"]
+    finally:
+        loader.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--grpc-port", type=int, default=50051)
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    chunks = _chunks(args.points, args.dim)
+    print(f"{'client':<8}{'batching':<10}{'objects/sec':>13}{'cpu sec':>9}{'errors':>8}")
+    for client_version in ("v3", "v4"):
+        for dynamic in (False, True):
+            objects_per_sec, cpu, errors = _run(args, chunks, client_version, dynamic)
+            print(f"{client_version:<8}{'dynamic' if dynamic else 'fixed':<10}"
+                  f"{objects_per_sec:>13.0f}{cpu:>9.1f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -72,6 +72,90 @@ class ConnectionSpecificationModel(ConnectionSpecification):
                   }
               }
               )
+    id_strategy: Literal['random', 'deterministic'] = Field(
+        'random',
+        description=('random gives every chunk a new id; deterministic derives it from '
+                     'dat_record_id and the chunk\'s text, so re-sent chunks overwrite '
+                     'themselves and REPLACE streams only delete the rows a sync did not '
+                     'write, after the sync'),
+        title='ID Strategy'
+    )
+    client_version: Literal['v3', 'v4'] = Field(
+        'v3',
+        description=('v3 imports batches over REST; v4 imports them over gRPC, which needs '
+                     'the gRPC port of the cluster to be reachable'),
+        title='Client Version'
+    )
+    grpc_host: Optional[str] = Field(
+        None, description='gRPC host of the cluster for the v4 client; the host of the cluster URL when not set',
+        title='gRPC Host'
+    )
+    grpc_port: int = Field(
+        50051, description='gRPC port of the cluster for the v4 client', title='gRPC Port', gt=0, le=65535
+    )
+    batch_size: int = Field(
+        100, description='Number of objects sent in a single batch request; the starting size when dynamic',
+        title='Batch Size', gt=0
+    )
+    dynamic: bool = Field(
+        True, description='Adapt the batch size to the throughput the cluster sustains',
+        title='Dynamic Batching'
+    )
+    num_workers: int = Field(
+        1, description='Number of batch requests in flight at once', title='Batch Workers', gt=0
+    )
+    connection_error_retries: int = Field(
+        3, description='Times a v3 batch request is retried after a connection error',
+        title='Connection Error Retries', ge=0
+    )
+    timeout_retries: int = Field(
+        3, description='Times a v3 batch request is retried after a read timeout',
+        title='Timeout Retries', ge=0
+    )
+    connect_timeout: float = Field(
+        10, description='Seconds to wait for a connection to the cluster', title='Connect Timeout', gt=0
+    )
+    read_timeout: float = Field(
+        60, description='Seconds to wait for the response to a request, e.g. a batch import',
+        title='Read Timeout', gt=0
+    )
+    hnsw_ef_construction: Optional[int] = Field(
+        None, description='Neighbours considered while building the HNSW index; the server default (128) when not set',
+        title='HNSW efConstruction', gt=0
+    )
+    hnsw_max_connections: Optional[int] = Field(
+        None, description='Edges per node of the HNSW index; the server default (32) when not set',
+        title='HNSW maxConnections', gt=0
+    )
+    pq: bool = Field(
+        False,
+        description=('Compress the vectors in memory with product quantization, trained '
+                     'once the class holds enough objects (Weaviate 1.23+ with ASYNC_INDEXING)'),
+        title='Product Quantization'
+    )
+    pq_segments: Optional[int] = Field(
+        None, description='Segments each vector is split into by product quantization; the server default when not set',
+        title='PQ Segments', gt=0
+    )
+    namespace_mode: Literal['class', 'tenant'] = Field(
+        'class',
+        description=('class writes each namespace into a class of its own; tenant writes every namespace '
+                     'into a tenant of the tenant class, which scales to thousands of namespaces and '
+                     'replaces a namespace by dropping its tenant. Tenant names are the namespaces, which '
+                     'must be 1 to 64 letters, digits, underscores or dashes'),
+        title='Namespace Mode'
+    )
+    tenant_class: str = Field(
+        'DatDocuments', description='Multi-tenant class holding the namespaces in the tenant namespace mode',
+        title='Tenant Class'
+    )
+    tenant_activity_after_sync: Literal['active', 'inactive', 'offloaded'] = Field(
+        'active',
+        description=('Activity status the tenants written by a sync are left in once it finishes; inactive '
+                     'frees their memory, offloaded moves them to cloud storage (v4 client, Weaviate 1.26+ '
+                     'with an offload module)'),
+        title='Tenant Activity After Sync'
+    )
 
 
 class WeaviateSpecification(BaseModel):
@@ -5,7 +5,7 @@ from dat_core.pydantic_models.connector_specification import ConnectorSpecificat
 from dat_core.pydantic_models import (
     DatCatalog, DatDocumentStream,
     ReadSyncMode, WriteSyncMode,
-    Type
+    Type, DatDocumentMessage, Data,
 )
 
 
@@ -17,6 +17,14 @@ def valid_connection_object(request):
     }
 
 
+@pytest.fixture(scope="class")
+def offline_connection_object(request):
+    yield {
+        "cluster_url": "http://localhost:8080",
+        "authentication": {"authentication": "no_authentication"},
+    }
+
+
 @pytest.fixture(scope="class")
 def conf_catalog(request):
     conf_catalog = DatCatalog(
@@ -151,3 +159,12 @@ def records(request):
         ],
     }
 
+
+@pytest.fixture(scope="class")
+def chunks(conf_catalog, records):
+    stream = conf_catalog.document_streams[0]
+    yield [
+        DatDocumentMessage(data=Data(**{k: record[k] for k in ("document_chunk", "vectors", "metadata")}),
+                           namespace=stream.namespace, stream=stream)
+        for record in records["PDF"] if record["type"] == Type.RECORD
+    ]
@@ -1,6 +1,8 @@
+import pytest
 import yaml
 import os
 from typing import List
+from unittest.mock import MagicMock
 from dat_core.pydantic_models import (
     DatMessage, DatDocumentMessage,
     Data, DatStateMessage,
@@ -9,6 +11,7 @@ from dat_core.pydantic_models import (
     DatCatalog, DatConnectionStatus,
 )
 from verified_destinations.weaviate.destination import Weaviate
+from verified_destinations.weaviate.loader import WeaviateLoader
 from verified_destinations.weaviate.specs import WeaviateSpecification
 from dat_core.loggers import logger
 
@@ -31,6 +34,214 @@ class TestWeaviate:
         assert isinstance(check_connection_tpl, DatConnectionStatus)
         assert check_connection_tpl.status.name == 'SUCCEEDED'
 
+    def test_batch_configuration(self, offline_connection_object, conf_catalog, chunks):
+        """
+        GIVEN a connection specification with a batch size of 200 and 2 workers
+        WHEN a batch of chunks is loaded and Weaviate reports an error for one object
+        THEN the batch is configured from the specification and the callback counts the error
+        """
+        loader = WeaviateLoader(WeaviateSpecification(
+            name='Weaviate',
+            connection_specification={
+                **offline_connection_object,
+                "batch_size": 200,
+                "num_workers": 2,
+            },
+            module_name='weaviate',
+        ))
+        loader.client = MagicMock()
+        loader._configure_batch()
+        configure = loader.client.batch.configure.call_args.kwargs
+        assert configure["batch_size"] == 200
+        assert configure["num_workers"] == 2
+        assert configure["dynamic"] is True
+
+        stream = conf_catalog.document_streams[0]
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+        batch = loader.client.batch.__enter__.return_value
+        assert batch.add_data_object.call_count == len(chunks)
+        assert {call.kwargs["class_name"] for call in batch.add_data_object.call_args_list} == {
+            "Pytest_unstructured_document"}
+
+        configure["callback"]([
+            {"id": "a", "result": {}},
+            {"id": "b", "result": {"errors": {"error": [{"message": "vector lengths don't match"}]}}},
+        ])
+        assert loader.stats["batch_requests"] == 1
+        assert loader.stats["batch_objects"] == 2
+        assert loader.stats["batch_object_errors"] == 1
+        assert loader.batch_errors == {"vector lengths don't match": 1}
+        assert loader.stats["batch_flushes"] == 1
+
+    def test_class_registry(self, offline_connection_object, conf_catalog, chunks):
+        """
+        GIVEN a cluster without the stream's class and a specification with PQ enabled
+        WHEN two batches of chunks are loaded
+        THEN the class is created once, without a vectorizer, with PQ and filterable dat_* properties
+        """
+        loader = WeaviateLoader(WeaviateSpecification(
+            name='Weaviate',
+            connection_specification={
+                **offline_connection_object,
+                "pq": True,
+            },
+            module_name='weaviate',
+        ))
+        loader.client = MagicMock()
+        loader.client.schema.exists.return_value = False
+        stream = conf_catalog.document_streams[0]
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+
+        loader.client.schema.exists.assert_called_once_with("Pytest_unstructured_document")
+        definition = loader.client.schema.create_class.call_args.args[0]
+        assert definition["class"] == "Pytest_unstructured_document"
+        assert definition["vectorizer"] == "none"
+        assert definition["vectorIndexConfig"]["pq"] == {"enabled": True}
+        assert {prop["name"]: prop["tokenization"] for prop in definition["properties"]} == {
+            "dat_stream": "field", "dat_run_id": "field", "dat_record_id": "field"}
+        assert loader.stats["class_cache_hits"] == 1
+
+    def test_delete_loop(self, offline_connection_object, conf_catalog):
+        """
+        GIVEN a class with 12500 objects of a REPLACE stream and a QUERY_MAXIMUM_RESULTS of 10000
+        WHEN the stream is deleted
+        THEN the server-side batch delete is repeated until fewer objects than the limit match
+        """
+        loader = WeaviateLoader(WeaviateSpecification(
+            name='Weaviate',
+            connection_specification=offline_connection_object,
+            module_name='weaviate',
+        ))
+        loader._create_client = MagicMock()
+        loader.client = MagicMock()
+        loader.client.batch.delete_objects.side_effect = [
+            {"results": {"matches": 10000, "successful": 10000, "failed": 0, "limit": 10000}},
+            {"results": {"matches": 2500, "successful": 2500, "failed": 0, "limit": 10000}},
+        ]
+        stream = conf_catalog.document_streams[0]
+        _filter = loader.prepare_metadata_filter({"dat_stream": stream.name})
+
+        assert loader.delete(filter=_filter, namespace=stream.namespace) == 12500
+        calls = loader.client.batch.delete_objects.call_args_list
+        assert len(calls) == 2
+        assert calls[0].kwargs["class_name"] == "Pytest_unstructured_document"
+        assert calls[0].kwargs["where"]["operands"][0]["path"] == ["dat_stream"]
+        assert loader.stats["deleted_objects"] == 12500
+
+    def test_tenant_mode(self, offline_connection_object, conf_catalog, chunks):
+        """
+        GIVEN a loader in the tenant namespace mode whose REPLACE stream's tenant already exists
+        WHEN a sync loads the stream's chunks
+        THEN the tenant is dropped instead of deleting its objects, created again
+            on load, written to, and left inactive once the sync finishes
+        """
+        loader = WeaviateLoader(WeaviateSpecification(
+            name='Weaviate',
+            connection_specification={
+                **offline_connection_object,
+                "namespace_mode": "tenant",
+                "tenant_activity_after_sync": "inactive",
+            },
+            module_name='weaviate',
+        ))
+        loader._create_client = MagicMock()
+        loader.client = MagicMock()
+        loader.client.schema.exists.return_value = True
+        loader.client.schema.get.return_value = {"vectorizer": "none", "multiTenancyConfig": {"enabled": True}}
+        stream = conf_catalog.document_streams[0]
+        loader.client.schema.get_class_tenants.return_value = [MagicMock(
+            activity_status=MagicMock(value="COLD"))]
+        loader.client.schema.get_class_tenants.return_value[0].name = stream.namespace
+
+        loader.initiate_sync(conf_catalog)
+        loader.client.schema.remove_class_tenants.assert_called_once_with("DatDocuments", [stream.namespace])
+        loader.client.batch.delete_objects.assert_not_called()
+
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+        loader.client.schema.add_class_tenants.assert_called_once()
+        batch = loader.client.batch.__enter__.return_value
+        assert {(call.kwargs["class_name"], call.kwargs["tenant"])
+                for call in batch.add_data_object.call_args_list} == {("DatDocuments", stream.namespace)}
+
+        loader.finish_sync()
+        class_name, tenants = loader.client.schema.update_class_tenants.call_args.args
+        assert class_name == "DatDocuments"
+        assert [(tenant.name, tenant.activity_status.value) for tenant in tenants] == [(stream.namespace, "COLD")]
+
+    def test_tenant_checks(self, offline_connection_object, conf_catalog):
+        """
+        GIVEN a loader in the tenant namespace mode
+        WHEN the tenant class exists without multi-tenancy, or a namespace is missing or not a valid tenant name
+        THEN check() fails, and the sync fails before any tenant is dropped
+        """
+        loader = WeaviateLoader(WeaviateSpecification(
+            name='Weaviate',
+            connection_specification={
+                **offline_connection_object,
+                "namespace_mode": "tenant",
+            },
+            module_name='weaviate',
+        ))
+        loader._create_client = MagicMock()
+        loader.client = MagicMock()
+        loader.client.schema.exists.return_value = True
+        loader.client.schema.get.return_value = {"vectorizer": "none", "multiTenancyConfig": {"enabled": False}}
+        status, message = loader.check()
+        assert status is False
+        assert "multi-tenancy" in message
+
+        loader.client.schema.get.return_value["multiTenancyConfig"]["enabled"] = True
+        loader._known_classes.clear()
+        assert loader.check() == (True, None)
+
+        for namespace in ("pytest.a", "pytest/a", "a" * 65, None):
+            stream = conf_catalog.document_streams[0].model_copy(update={"namespace": namespace})
+            with pytest.raises(ValueError):
+                loader.initiate_sync(DatCatalog(document_streams=[stream]))
+        loader.client.schema.remove_class_tenants.assert_not_called()
+
+    def test_v4_client(self, offline_connection_object, conf_catalog, chunks):
+        """
+        GIVEN a loader using the v4 client on a cluster without the stream's class
+        WHEN two batches of chunks are loaded and the stream is deleted
+        THEN the class is created once, objects go through the collection's batch
+            and the delete repeats delete_many with a v4 filter until nothing matches
+        """
+        loader = WeaviateLoader(WeaviateSpecification(
+            name='Weaviate',
+            connection_specification={
+                **offline_connection_object,
+                "client_version": "v4",
+            },
+            module_name='weaviate',
+        ))
+        loader.client = MagicMock()
+        loader.client.collections.exists.return_value = False
+        collection = loader.client.collections.get.return_value
+        collection.batch.failed_objects = []
+        stream = conf_catalog.document_streams[0]
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+        loader.load(chunks, namespace=stream.namespace, stream=stream.name)
+
+        loader.client.collections.create.assert_called_once()
+        assert loader.client.collections.create.call_args.args == ("Pytest_unstructured_document",)
+        batch = collection.batch.dynamic.return_value.__enter__.return_value
+        assert batch.add_object.call_count == 2 * len(chunks)
+        assert loader.stats["batch_objects"] == 2 * len(chunks)
+
+        loader.client.collections.exists.return_value = True
+        collection.data.delete_many.side_effect = [
+            MagicMock(matches=len(chunks), successful=len(chunks)), MagicMock(matches=0, successful=0)]
+        loader.delete(filter=loader.prepare_metadata_filter({"dat_stream": stream.name}),
+                      namespace=stream.namespace)
+        where = collection.data.delete_many.call_args.kwargs["where"]
+        assert where.target == "dat_stream" and where.value == stream.name
+
+        loader.close()
+        assert loader.client is None
+
     def test_write(self, valid_connection_object, conf_catalog, records):
         """
         GIVEN a valid connectionSpecification JSON config